@@ -0,0 +1,202 @@
+"""
+X-Spider 无界面批处理入口（适合 cron / systemd）
+从文件或标准输入读取任务，无头运行至全部结束，写出 JSON 运行报告并以退出码表示结果：
+  0 全部完成 / 1 有任务失败或部分完成 / 2 启动失败（未登录、无任务等） / 3 超时 / 130 被中断
+
+示例:
+  python batch_runner.py tasks.txt --concurrency 2 --set stop_thresh=100 --report report.json
+  echo "@ElonMusk MY_LIKES" | python batch_runner.py - --max-media 500
+"""
+import os
+import sys
+import re
+import json
+import time
+import argparse
+import threading
+from spider_core import CrawlerEngine, TaskRegistry, CFG, cprint, logged_in_profiles, PINNED_TASKS
+
+EXIT_OK, EXIT_TASK_FAILED, EXIT_SETUP, EXIT_TIMEOUT, EXIT_INTERRUPTED = 0, 1, 2, 3, 130
+_EXCLUDE = {'x', 'com', 'https', 'http', 'twitter', 'www', 'status', 'media'}
+_STATUS_URL = re.compile(r'\S*/status/\d+\S*')
+
+def parse_task_ids(text):
+    """与 add 指令相同的 ID 识别规则；# 之后为注释。
+    单条推文链接（/status/<id>）不是账号任务，整条跳过，避免把推文 ID 当成账号"""
+    ids = {}
+    for line in text.splitlines():
+        line = line.split("#", 1)[0]
+        for url in _STATUS_URL.findall(line):
+            cprint(f"⚠️ 跳过推文链接（批处理只接受账号 / 喜欢 / 书签）: {url}", "warning")
+        line = _STATUS_URL.sub(" ", line)
+        for i in re.findall(r'@?([a-zA-Z0-9_]+)', line):
+            if i in PINNED_TASKS or i.lower() not in _EXCLUDE: ids[i] = None
+    return list(ids)
+
+def parse_override(item):
+    """key=value，value 按 JSON 解析（数字 / true / false），解析失败按字符串处理"""
+    key, sep, raw = item.partition("=")
+    if not sep or key not in CFG.default_config:
+        raise argparse.ArgumentTypeError(f"未知配置项: {item}")
+    try: value = json.loads(raw)
+    except ValueError: value = raw
+    try: return key, CFG.coerce(key, value)
+    except ValueError as e: raise argparse.ArgumentTypeError(str(e))
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="X-Spider 无界面批处理")
+    parser.add_argument("tasks", help="任务列表文件（每行一个或多个 ID / 链接），- 表示从标准输入读取")
+    parser.add_argument("--set", dest="overrides", action="append", type=parse_override, default=[],
+                        metavar="KEY=VALUE", help="覆盖配置项（仅本次运行生效，不写回配置文件），可重复")
+    parser.add_argument("--concurrency", type=int, help="同时执行的任务数")
+    parser.add_argument("--save-path", help="保存根目录")
+    parser.add_argument("--headed", action="store_true", help="显示浏览器窗口（默认无头）")
+    parser.add_argument("--timeout", type=float, default=0, help="整体超时(秒)，0 为不限")
+    parser.add_argument("--max-media", type=int, default=0, help="单任务最多下载数")
+    parser.add_argument("--max-mb", type=float, default=0, help="单任务最多写入 MB")
+    parser.add_argument("--max-minutes", type=float, default=0, help="单任务最长运行分钟")
+    parser.add_argument("--report", default="batch_report.json", help="运行报告路径")
+    return parser
+
+class BatchRun:
+    """驱动一个引擎跑完给定任务，并按任务记录耗时 / 下载数 / 字节 / 失败原因"""
+    def __init__(self, tids, budget=None):
+        self.tids = tids
+        self.budget = budget
+        self.registry = TaskRegistry()
+        self.idle = threading.Event()
+        self.settled = set()  # 已有结果（完成 / 部分完成 / 失败）的任务
+        self.stats = {tid: {"id": tid, "state": "pending", "media": 0, "bytes": 0, "duration": 0.0, "error": None} for tid in tids}
+        self.running_since = {}
+        self.armed = False  # 入队之后才判断是否全部结束
+        self.engine = CrawlerEngine({'on_progress': self._on_progress, 'on_task_finished': self._on_finished}, registry=self.registry)
+        self.registry.subscribe(self._on_change)
+
+    def _on_progress(self, tid, count):
+        if tid in self.stats: self.stats[tid]["media"] = count
+
+    def _on_finished(self, tid):
+        if tid not in self.stats: return
+        self.stats[tid]["state"] = "finished"
+        self.settled.add(tid)
+        self._check_done()
+
+    def _check_done(self):
+        """全部任务都有结果才算结束：登记表移除完成任务早于 on_task_finished，不能按登记表变空判断"""
+        if self.armed and len(self.settled) == len(self.stats): self.idle.set()
+
+    def _on_change(self, changes):
+        now = time.monotonic()
+        for tid, old, new in changes:
+            st = self.stats.get(tid)
+            if st is None: continue
+            if new == "running": self.running_since[tid] = now
+            elif old == "running" and tid in self.running_since:
+                st["duration"] += now - self.running_since.pop(tid)
+            if new is not None:
+                st["state"] = new
+                st["error"] = self.registry.errors.get(tid)
+                if new in ("partial", "error"): self.settled.add(tid)
+                else: self.settled.discard(tid)
+        self._check_done()
+        # 引擎意外停止时剩余任务退回待启动，不会再有结果，直接结束等待
+        if self.armed and not self.engine.is_running and not any(self.registry.count(s) for s in ("queued", "launching", "running")):
+            self.idle.set()
+
+    def run(self, timeout=0):
+        """返回 True 表示全部任务结束，False 表示超时"""
+        self.engine.start()
+        deadline = time.monotonic() + 120
+        while self.engine.is_running and not self.engine.engine_ready_event.is_set() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        if not self.engine.engine_ready_event.is_set():
+            raise RuntimeError("引擎启动失败（请确认已登录账号）")
+        self.registry.add(self.tids, budget=self.budget)
+        self.armed = True
+        self.engine.add_tasks_to_queue(self.tids)
+        return self.idle.wait(timeout or None)
+
+    def shutdown(self):
+        if self.engine.is_running:
+            self.engine.manual_shutdown = True
+            self.engine.stop()
+        if self.engine.thread: self.engine.thread.join(timeout=60)
+        self.engine.log_sink.flush()
+
+    def report(self, started, elapsed, exit_code, overrides):
+        dl = self.engine.dl_manager
+        now = time.monotonic()
+        for tid, since in self.running_since.items():
+            self.stats[tid]["duration"] += now - since
+        tasks = []
+        for tid, st in self.stats.items():
+            st = dict(st, bytes=dl.bytes_done.get(tid, 0) if dl else 0, duration=round(st["duration"], 1))
+            tasks.append(st)
+        media = sum(t["media"] for t in tasks)
+        size = sum(t["bytes"] for t in tasks)
+        count = lambda state: sum(1 for t in tasks if t["state"] == state)
+        return {
+            "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started)),
+            "duration": round(elapsed, 1),
+            "exit_code": exit_code,
+            "overrides": dict(overrides),
+            "totals": {
+                "tasks": len(tasks), "finished": count("finished"), "partial": count("partial"),
+                "failed": count("error"), "unfinished": len(tasks) - count("finished") - count("partial") - count("error"),
+                "media": media, "bytes": size,
+                "media_per_sec": round(media / elapsed, 3) if elapsed else 0,
+                "mb_per_sec": round(size / 1024 / 1024 / elapsed, 3) if elapsed else 0,
+            },
+            "tasks": tasks,
+        }
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # 配置覆盖只改内存中的配置，不写回 spider_config.json
+    overrides = list(args.overrides)
+    overrides.append(("headless", not args.headed))
+    if args.concurrency: overrides.append(("concurrency", args.concurrency))
+    if args.save_path: overrides.append(("save_path", os.path.abspath(args.save_path)))
+    for key, value in overrides: CFG.override(key, value)
+
+    try:
+        text = sys.stdin.read() if args.tasks == "-" else open(args.tasks, "r", encoding="utf-8").read()
+    except OSError as e:
+        cprint(f"❌ 无法读取任务列表: {e}", "danger")
+        return EXIT_SETUP
+    tids = parse_task_ids(text)
+    if not tids:
+        cprint("❌ 任务列表为空", "danger")
+        return EXIT_SETUP
+    if not logged_in_profiles():
+        cprint("❌ 未检测到登录信息，请先在图形界面或 CLI 中执行 login", "danger")
+        return EXIT_SETUP
+
+    budget = {"max_media": args.max_media, "max_bytes": int(args.max_mb * 1024 * 1024), "max_seconds": int(args.max_minutes * 60)}
+    cprint(f"📦 批处理开始: {len(tids)} 个任务 (并发 {CFG.get('concurrency')})", "info")
+    batch = BatchRun(tids, budget)
+    started, t0 = time.time(), time.monotonic()
+    try:
+        code = EXIT_OK if batch.run(args.timeout) else EXIT_TIMEOUT
+    except KeyboardInterrupt:
+        code = EXIT_INTERRUPTED
+    except RuntimeError as e:
+        cprint(f"❌ {e}", "danger")
+        code = EXIT_SETUP
+    batch.shutdown()
+
+    report = batch.report(started, time.monotonic() - t0, code, overrides)
+    if code == EXIT_OK and (report["totals"]["failed"] or report["totals"]["partial"] or report["totals"]["unfinished"]):
+        code = report["exit_code"] = EXIT_TASK_FAILED
+    try:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        cprint(f"⚠️ 报告写入失败: {e}", "warning")
+    t = report["totals"]
+    cprint(f"🏁 完成 {t['finished']} / 部分 {t['partial']} / 失败 {t['failed']}，下载 {t['media']} 个 ({t['mb_per_sec']} MB/s)，报告: {args.report}",
+           "success" if code == EXIT_OK else "warning")
+    return code
+
+if __name__ == "__main__":
+    sys.exit(main())
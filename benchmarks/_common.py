@@ -0,0 +1,80 @@
+"""
+基准测试公共工具：导入路径、运行环境信息、资源采样与结果输出（JSON Lines，便于跨版本对比）
+"""
+import os
+import sys
+import json
+import time
+import platform
+import threading
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+def environment():
+    """运行环境与代码版本（git 提交号），写入每条结果"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception:
+        commit = ""
+    return {"commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+def percentile(values, p):
+    if not values: return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+def _proc_status():
+    """Linux /proc/self/status 中的常驻内存(KB)与线程数，其他平台返回 (0, 0)"""
+    rss = threads = 0
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"): rss = int(line.split()[1])
+                elif line.startswith("Threads:"): threads = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, threads
+
+class ResourceSampler:
+    """后台采样峰值常驻内存与线程数（基准运行期间）"""
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_rss_kb = 0
+        self.peak_threads = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def _sample(self):
+        rss, threads = _proc_status()
+        self.peak_rss_kb = max(self.peak_rss_kb, rss)
+        self.peak_threads = max(self.peak_threads, threads)
+
+    def _run(self):
+        while not self._stop.wait(self.interval): self._sample()
+
+def write_results(rows, out=None):
+    """打印结果表，并以 JSON Lines 追加写入 out 文件"""
+    env = environment()
+    for row in rows:
+        print("  ".join(f"{k}={v}" for k, v in row.items()))
+    if out:
+        with open(out, "a", encoding="utf-8") as f:
+            for row in rows: f.write(json.dumps({**env, **row}, ensure_ascii=False) + "\n")
+        print(f"结果已写入 {out}")
+
+def csv_list(cast):
+    return lambda text: [cast(x) for x in text.split(",") if x]
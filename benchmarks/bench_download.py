@@ -0,0 +1,179 @@
+"""
+下载吞吐基准：本地 HTTP 服务模拟媒体 CDN（合成图片 / mp4，可配置延迟、带宽与错误注入），
+端到端驱动 DownloadManager，报告 files/s、MB/s、单文件耗时 p50/p99、峰值内存与线程数。
+完全离线运行，结果以 JSON Lines 追加写入，便于对比不同版本与参数。
+
+示例:
+  python benchmarks/bench_download.py --threads 4,16,32 --chunk 16384,65536 --out bench_download.jsonl
+  python benchmarks/bench_download.py --latency 80 --bandwidth 2 --errors 0.05 --tmp 0,1
+"""
+import os
+import time
+import math
+import random
+import asyncio
+import argparse
+import tempfile
+import itertools
+import threading
+import shutil
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from _common import ResourceSampler, percentile, write_results, csv_list
+from spider_core import DownloadManager, CFG
+
+PATTERN = os.urandom(1 << 16)  # 响应体用重复的随机块拼出，避免为每个文件分配内存
+
+def build_catalog(images, videos, seed=42):
+    """按对数正态分布生成文件大小：图片中位数约 250KB，视频中位数约 1.5MB"""
+    rng = random.Random(seed)
+    catalog = {}
+    for i in range(images):
+        catalog[f"img{i:06d}.jpg"] = ("img", int(min(max(rng.lognormvariate(math.log(250_000), 0.6), 20_000), 4_000_000)))
+    for i in range(videos):
+        catalog[f"vid{i:06d}.mp4"] = ("vid", int(min(max(rng.lognormvariate(math.log(1_500_000), 0.8), 200_000), 20_000_000)))
+    return catalog
+
+def make_handler(catalog, latency_ms, bandwidth_mbps, error_rate, seed=7):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    block = 16384
+
+    class CdnHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _lookup(self):
+            name = self.path.split("?")[0].rsplit("/", 1)[-1]
+            return catalog.get(name)
+
+        def _headers(self, size):
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp4" if self.path.split("?")[0].endswith(".mp4") else "image/jpeg")
+            self.send_header("Content-Length", str(size))
+            self.end_headers()
+
+        def do_HEAD(self):
+            entry = self._lookup()
+            if not entry: return self.send_error(404)
+            self._headers(entry[1])
+
+        def do_GET(self):
+            entry = self._lookup()
+            if not entry: return self.send_error(404)
+            if latency_ms: time.sleep(latency_ms / 1000 * (0.5 + rng.random()))
+            with lock: roll = rng.random()
+            if roll < error_rate / 2:
+                return self.send_error(503)
+            size = entry[1]
+            self._headers(size)
+            # 另一半错误：发送一半后断开连接
+            cut = size // 2 if roll < error_rate else size
+            pace = block / (bandwidth_mbps * 1024 * 1024) if bandwidth_mbps else 0
+            sent = 0
+            try:
+                while sent < cut:
+                    n = min(block, cut - sent)
+                    offset = sent % len(PATTERN)
+                    chunk = PATTERN[offset:offset + n]
+                    if len(chunk) < n: chunk += PATTERN[:n - len(chunk)]
+                    self.wfile.write(chunk)
+                    sent += n
+                    if pace: time.sleep(pace)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            if cut < size: self.close_connection = True
+
+    return CdnHandler
+
+def start_server(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def run_once(base_url, catalog, threads, workers, chunk, use_tmp):
+    root = tempfile.mkdtemp(prefix="xspider_bench_")
+    for key, value in {"save_path": root, "use_tmp_files": use_tmp, "download_chunk_size": chunk,
+                       "max_video_size": 0, "create_link_file": False, "timeout": 30}.items():
+        CFG.override(key, value)
+    dm = DownloadManager({}, max_threads=threads, log_sink=None)
+    dm._emit_log = lambda *a, **k: None
+
+    latencies = []
+    sync_download = dm._sync_download
+    def timed(url, path, tid, marks=None):
+        t = time.perf_counter()
+        ok = sync_download(url, path, tid, marks)
+        if ok: latencies.append(time.perf_counter() - t)
+        return ok
+    dm._sync_download = timed
+
+    tid = "bench"
+    try:
+        with ResourceSampler() as sampler:
+            await dm.start_workers(count=workers)
+            dm.register_task(tid)
+            t0 = time.perf_counter()
+            for name, (kind, _) in catalog.items():
+                url = f"{base_url}/media/{name}"
+                sub = "图片" if kind == "img" else "Gif"
+                await dm.submit_job(url, os.path.join(root, sub, name), tid, "bench", kind, url, None)
+            await dm.wait_drained(tid)
+            elapsed = time.perf_counter() - t0
+            await dm.stop_workers()
+            dm.executor.shutdown(wait=True)
+        done = dm.session_counters.get(tid, 0)
+        size = sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files if not f.endswith((".tmp", ".txt")))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return {
+        "threads": threads, "workers": workers, "chunk": chunk, "use_tmp": use_tmp,
+        "files": len(catalog), "ok": done, "failed": len(catalog) - done,
+        "seconds": round(elapsed, 3),
+        "files_per_sec": round(done / elapsed, 2),
+        "mb_per_sec": round(size / 1024 / 1024 / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "peak_rss_mb": round(sampler.peak_rss_kb / 1024, 1),
+        "peak_threads": sampler.peak_threads,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DownloadManager 下载吞吐基准")
+    parser.add_argument("--images", type=int, default=300, help="合成图片数量")
+    parser.add_argument("--videos", type=int, default=20, help="合成视频数量")
+    parser.add_argument("--threads", type=csv_list(int), default=[4, 16], help="download_threads，逗号分隔多组")
+    parser.add_argument("--workers", type=csv_list(int), default=[12], help="下载调度协程数，逗号分隔多组")
+    parser.add_argument("--chunk", type=csv_list(int), default=[16384, 65536], help="写盘分块字节数，逗号分隔多组")
+    parser.add_argument("--tmp", type=csv_list(lambda x: x not in ("0", "false", "off")), default=[True], help="use_tmp_files，如 0,1")
+    parser.add_argument("--latency", type=float, default=20, help="服务端平均首字节延迟(ms)")
+    parser.add_argument("--bandwidth", type=float, default=0, help="单连接带宽上限(MB/s)，0 为不限")
+    parser.add_argument("--errors", type=float, default=0.01, help="错误注入比例（一半 503，一半传输中断开）")
+    parser.add_argument("--repeat", type=int, default=1, help="每组参数重复次数")
+    parser.add_argument("--out", help="结果追加写入的 JSON Lines 文件")
+    args = parser.parse_args(argv)
+
+    catalog = build_catalog(args.images, args.videos)
+    total_mb = sum(size for _, size in catalog.values()) / 1024 / 1024
+    server = start_server(make_handler(catalog, args.latency, args.bandwidth, args.errors))
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"本地 CDN: {base_url}  文件 {len(catalog)} 个 / {total_mb:.1f} MB  延迟 {args.latency}ms  带宽 {args.bandwidth or '不限'}  错误率 {args.errors}")
+
+    rows = []
+    try:
+        for threads, workers, chunk, use_tmp in itertools.product(args.threads, args.workers, args.chunk, args.tmp):
+            for _ in range(args.repeat):
+                row = asyncio.run(run_once(base_url, catalog, threads, workers, chunk, use_tmp))
+                row.update(latency_ms=args.latency, bandwidth_mbps=args.bandwidth, error_rate=args.errors)
+                rows.append(row)
+                print(f"threads={threads} workers={workers} chunk={chunk} tmp={use_tmp}: {row['files_per_sec']} files/s, {row['mb_per_sec']} MB/s")
+    finally:
+        server.shutdown()
+    print()
+    write_results(rows, args.out)
+
+if __name__ == "__main__":
+    main()
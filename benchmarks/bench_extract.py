@@ -0,0 +1,252 @@
+"""
+时间线处理微基准：生成仿真的 UserMedia / Likes / Bookmarks GraphQL 响应（模块条目、引用推文、
+多图与多码率视频、可见性包装），逐阶段测量 api_handler 热路径——
+JSON 解析、游标 / 水位线扫描、媒体提取 (pinpoint_extract)、历史去重——的单响应与单媒体耗时及内存分配，
+覆盖多种页面大小与历史集合规模。结果以 JSON Lines 追加写入，便于发现回归。
+
+示例:
+  python benchmarks/bench_extract.py --kinds UserMedia,Likes --entries 20,100 --history 0,100000
+  python benchmarks/bench_extract.py --pages 50 --out bench_extract.jsonl
+"""
+import os
+import gc
+import json
+import time
+import random
+import argparse
+import tempfile
+import itertools
+import shutil
+import tracemalloc
+
+from _common import percentile, write_results, csv_list
+from spider_core import (CrawlerEngine, TaskRegistry, pinpoint_extract, media_file_id, find_timeline_cursor,
+                         scan_timeline_marks, count_timeline_items)
+
+KINDS = ("UserMedia", "Likes", "Bookmarks")
+
+# ================= 仿真响应生成 =================
+class PayloadGenerator:
+    """按真实响应的嵌套结构生成时间线页面；media_ids 记录生成过的媒体 ID，供构造历史集合"""
+    def __init__(self, seed=1):
+        self.rng = random.Random(seed)
+        self.next_id = 1790000000000000000
+        self.media_ids = []
+
+    def _id(self):
+        self.next_id += self.rng.randint(1, 10 ** 12)
+        return str(self.next_id)
+
+    def _media_key(self):
+        key = "".join(self.rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-") for _ in range(15))
+        self.media_ids.append(key)
+        return key
+
+    def _user(self):
+        name = f"user_{self.rng.randint(1, 50000)}"
+        return {"user_results": {"result": {
+            "__typename": "User", "rest_id": self._id(), "is_blue_verified": self.rng.random() < 0.3,
+            "legacy": {"screen_name": name, "name": name.title(), "followers_count": self.rng.randint(0, 10 ** 6),
+                       "description": "bio " * self.rng.randint(1, 20),
+                       "profile_image_url_https": f"https://pbs.twimg.com/profile_images/{self._id()}/avatar_normal.jpg",
+                       "profile_banner_url": f"https://pbs.twimg.com/profile_banners/{self._id()}/1700000000"}}}}
+
+    def _photo(self):
+        key = self._media_key()
+        return {"id_str": self._id(), "media_key": f"3_{self._id()}", "type": "photo",
+                "media_url_https": f"https://pbs.twimg.com/media/{key}.jpg",
+                "url": "https://t.co/abc", "display_url": "pic.x.com/abc", "expanded_url": "https://x.com/i/status/1/photo/1",
+                "original_info": {"width": 1200, "height": 900, "focus_rects": [{"x": 0, "y": 0, "w": 1200, "h": 672}] * 4},
+                "sizes": {s: {"w": 1200, "h": 900, "resize": "fit"} for s in ("large", "medium", "small", "thumb")}}
+
+    def _video(self, gif=False):
+        key = self._media_key()
+        thumb = self._id()
+        variants = [] if gif else [{"content_type": "application/x-mpegURL", "url": f"https://video.twimg.com/ext_tw_video/{thumb}/pu/pl/{key}.m3u8"}]
+        rates = [0] if gif else self.rng.sample([256000, 632000, 950000, 2176000, 10368000], 3)
+        for rate in rates:
+            folder = "tweet_video" if gif else f"ext_tw_video/{thumb}/pu/vid/avc1/720x1280"
+            variants.append({"bitrate": rate, "content_type": "video/mp4", "url": f"https://video.twimg.com/{folder}/{key}.mp4?tag=12"})
+        return {"id_str": self._id(), "media_key": f"7_{self._id()}", "type": "animated_gif" if gif else "video",
+                "media_url_https": f"https://pbs.twimg.com/{'tweet_video_thumb' if gif else 'ext_tw_video_thumb'}/{thumb}/pu/img/{key}.jpg",
+                "original_info": {"width": 720, "height": 1280},
+                "video_info": {"aspect_ratio": [9, 16], "duration_millis": self.rng.randint(1000, 140000), "variants": variants}}
+
+    def _tweet(self, depth=0):
+        roll = self.rng.random()
+        if roll < 0.55: media = [self._photo() for _ in range(self.rng.choice((1, 1, 1, 2, 3, 4)))]
+        elif roll < 0.8: media = [self._video()]
+        elif roll < 0.88: media = [self._video(gif=True)]
+        else: media = []
+        t_id = self._id()
+        legacy = {"id_str": t_id, "created_at": "Wed Oct 10 20:19:24 +0000 2024", "full_text": "text " * self.rng.randint(3, 50),
+                  "favorite_count": self.rng.randint(0, 10 ** 5), "retweet_count": self.rng.randint(0, 10 ** 4), "lang": "en",
+                  "entities": {"hashtags": [], "urls": [], "user_mentions": [], "media": [dict(m) for m in media]},
+                  "extended_entities": {"media": media}}
+        result = {"__typename": "Tweet", "rest_id": t_id, "core": self._user(), "legacy": legacy,
+                  "views": {"count": str(self.rng.randint(0, 10 ** 7)), "state": "EnabledWithCount"},
+                  "edit_control": {"edit_tweet_ids": [t_id], "editable_until_msecs": "1700000000000", "edits_remaining": "5"}}
+        if depth == 0 and self.rng.random() < 0.15:
+            result["quoted_status_result"] = {"result": self._tweet(depth + 1)}
+        if self.rng.random() < 0.1:
+            result = {"__typename": "TweetWithVisibilityResults", "tweet": result, "tweetInterstitial": {"text": {"text": "..."}}}
+        return result
+
+    def _item(self):
+        return {"itemType": "TimelineTweet", "__typename": "TimelineTweet",
+                "tweet_results": {"result": self._tweet()}, "tweetDisplayType": "Tweet"}
+
+    def _cursors(self):
+        return [{"entryId": f"cursor-{d.lower()}-{self._id()}", "sortIndex": self._id(),
+                 "content": {"entryType": "TimelineTimelineCursor", "cursorType": d, "value": f"DAAH{self._id()}"}}
+                for d in ("Top", "Bottom")]
+
+    def page(self, kind, entries, first=True):
+        """生成一页响应：UserMedia 以模块条目（首页 profile-grid 模块 / 后续页 AddToModule）承载，喜欢 / 书签为独立推文条目"""
+        if kind == "UserMedia":
+            items = []
+            for i in range(entries):
+                tweet_id = self._id()
+                items.append({"entryId": f"profile-grid-0-tweet-{tweet_id}", "item": {"itemContent": self._item()}})
+            if first:
+                instructions = [{"type": "TimelineClearCache"},
+                                {"type": "TimelineAddEntries", "entries": [
+                                    {"entryId": "profile-grid-0", "sortIndex": self._id(),
+                                     "content": {"entryType": "TimelineTimelineModule", "displayType": "VerticalGrid", "items": items}}
+                                ] + self._cursors()}]
+            else:
+                instructions = [{"type": "TimelineAddToModule", "moduleEntryId": "profile-grid-0", "moduleItems": items},
+                                {"type": "TimelineAddEntries", "entries": self._cursors()}]
+            timeline = {"timeline": {"instructions": instructions, "metadata": {"scribeConfig": {"page": "profileMedia"}}}}
+            return {"data": {"user": {"result": {"__typename": "User", "timeline_v2": timeline}}}}
+
+        tweet_entries = []
+        for _ in range(entries):
+            tweet_id = self._id()
+            tweet_entries.append({"entryId": f"tweet-{tweet_id}", "sortIndex": self._id(),
+                                  "content": {"entryType": "TimelineTimelineItem", "__typename": "TimelineTimelineItem",
+                                              "itemContent": self._item()}})
+        timeline = {"timeline": {"instructions": [{"type": "TimelineAddEntries", "entries": tweet_entries + self._cursors()}]}}
+        if kind == "Bookmarks":
+            return {"data": {"bookmark_timeline_v2": timeline}}
+        return {"data": {"user": {"result": {"__typename": "User", "timeline_v2": timeline}}}}
+
+# ================= 分阶段测量 =================
+def dedup(media_list, history):
+    """与 process_timeline_json 相同的去重步骤（不投递下载）"""
+    new = 0
+    for item in media_list:
+        f_id = media_file_id(item['url'].split("?")[0])
+        if f_id in history: continue
+        history.add(f_id)
+        new += 1
+    return new
+
+def stages(raw, history, by_sort_index):
+    data = json.loads(raw)
+    yield "parse", data
+    find_timeline_cursor(data)
+    scan_timeline_marks(data, by_sort_index)
+    count_timeline_items(data)
+    yield "scan", None
+    media = pinpoint_extract(data)
+    yield "extract", media
+    yield "dedup", dedup(media, history)
+
+def time_page(raw, history, by_sort_index):
+    out, media = {}, 0
+    t = time.perf_counter()
+    for name, value in stages(raw, history, by_sort_index):
+        now = time.perf_counter()
+        out[name] = now - t
+        if name == "extract": media = len(value)
+        t = time.perf_counter()
+    return out, media
+
+def alloc_page(raw, history, by_sort_index):
+    """各阶段相对阶段开始时的峰值分配 (KB)"""
+    out = {}
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        for name, _ in stages(raw, history, by_sort_index):
+            current, peak = tracemalloc.get_traced_memory()
+            out[name] = (peak - base) / 1024
+            base = current
+            tracemalloc.reset_peak()
+    finally:
+        tracemalloc.stop()
+    return out
+
+def bench_history_load(history_ids):
+    """读取 history.txt 构建去重集合的耗时（任务启动时一次）"""
+    root = tempfile.mkdtemp(prefix="xspider_bench_")
+    try:
+        with open(os.path.join(root, "history.txt"), "w", encoding="utf-8") as f:
+            f.writelines(i + "\n" for i in history_ids)
+        engine = CrawlerEngine(registry=TaskRegistry())
+        t = time.perf_counter()
+        history = engine._get_local_history(root)
+        return time.perf_counter() - t, history
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def run_case(kind, entries, history_size, pages, overlap, seed):
+    gen = PayloadGenerator(seed)
+    raws = [json.dumps(gen.page(kind, entries, first=(i == 0)), separators=(",", ":")) for i in range(pages)]
+    # 历史集合：一部分是页面中出现过的媒体（命中去重），其余为无关 ID
+    rng = random.Random(seed)
+    seen = rng.sample(gen.media_ids, int(len(gen.media_ids) * overlap))
+    filler = max(0, history_size - len(seen))
+    history_ids = seen[:history_size] + [f"H{rng.getrandbits(60):015x}" for _ in range(filler)]
+    load_s, history = bench_history_load(history_ids)
+
+    by_sort_index = kind != "UserMedia"
+    timings = {s: [] for s in ("parse", "scan", "extract", "dedup")}
+    media_total = 0
+    gc.collect()
+    for raw in raws:
+        t, media = time_page(raw, set(history), by_sort_index)
+        for k, v in t.items(): timings[k].append(v)
+        media_total += media
+    allocs = [alloc_page(raw, set(history), by_sort_index) for raw in raws[:min(3, len(raws))]]
+
+    total = [sum(ts) for ts in zip(*timings.values())]
+    per_media = sum(total) / media_total if media_total else 0
+    row = {"kind": kind, "entries": entries, "history": len(history), "pages": pages,
+           "payload_kb": round(sum(map(len, raws)) / len(raws) / 1024, 1),
+           "media_per_page": round(media_total / pages, 1),
+           "history_load_ms": round(load_s * 1000, 2)}
+    for name, ts in timings.items():
+        row[f"{name}_ms"] = round(sum(ts) / len(ts) * 1000, 3)
+    row["page_p50_ms"] = round(percentile(total, 50) * 1000, 3)
+    row["page_p99_ms"] = round(percentile(total, 99) * 1000, 3)
+    row["per_media_us"] = round(per_media * 1e6, 2)
+    for name in timings:
+        row[f"{name}_peak_kb"] = round(max(a[name] for a in allocs), 1)
+    return row
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="时间线处理热路径微基准")
+    parser.add_argument("--kinds", type=csv_list(str), default=list(KINDS), help="响应类型，逗号分隔: " + ",".join(KINDS))
+    parser.add_argument("--entries", type=csv_list(int), default=[20, 100], help="每页条目数，逗号分隔多组")
+    parser.add_argument("--history", type=csv_list(int), default=[0, 10000, 200000], help="历史集合规模，逗号分隔多组")
+    parser.add_argument("--pages", type=int, default=20, help="每组生成的页面数")
+    parser.add_argument("--overlap", type=float, default=0.3, help="页面媒体中已在历史中的比例")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="结果追加写入的 JSON Lines 文件")
+    args = parser.parse_args(argv)
+
+    unknown = [k for k in args.kinds if k not in KINDS]
+    if unknown: parser.error(f"未知响应类型: {','.join(unknown)}")
+
+    rows = []
+    for kind, entries, history in itertools.product(args.kinds, args.entries, args.history):
+        row = run_case(kind, entries, history, args.pages, args.overlap, args.seed)
+        rows.append(row)
+        print(f"{kind} entries={entries} history={history}: {row['page_p50_ms']} ms/页, {row['per_media_us']} µs/媒体")
+    print()
+    write_results(rows, args.out)
+
+if __name__ == "__main__":
+    main()
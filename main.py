@@ -15,68 +15,41 @@ import shutil
 import tkinter as tk
 from tkinter import filedialog
 import ctypes  # 用于单实例保护
+import multiprocessing
 # 导入核心爬虫模块
-from spider_core import CrawlerEngine, CFG, find_system_browser
-import json
+from spider_core import CrawlerEngine, TaskRegistry, Watchlist, LogSink, LoopDiagnostics, LayoutMigrator, CFG, find_system_browser, DEFAULT_PROFILE, configured_profiles, profile_data_dir
+from spider_shard import ShardCoordinator
+import re
+import time
 
 # ================= 全局变量 =================
 engine: CrawlerEngine = None
+coordinator: ShardCoordinator = None  # 多进程分片运行（shard_workers > 1 时取代单进程引擎）
 playwright_loop: asyncio.AbstractEventLoop = None
 playwright_thread: threading.Thread = None
+loop_ready = threading.Event()  # 事件循环真正运行后置位
 # 全局浏览器实例，实现跨引擎重启持久化
 global_pw_instance = None
-global_browser_context = None
-# 预加入队列（引擎启动前添加的任务）
-pending_tasks = []
-TASKS_FILE = "tasks.json"
+global_profile_contexts = {}  # 多账号上下文池 {profile: context}
+# 任务登记表（引擎与界面共用：引擎启动前添加的任务处于 pending 状态）
+registry = TaskRegistry()
+# 定时同步列表（同时负责任务列表的持久化，取代 tasks.json）
+watchlist = Watchlist(registry)
 
 def save_tasks():
-    """保存当前任务列表到文件"""
-    tasks_to_save = list(pending_tasks)
-    if engine and engine.is_running:
-        # 如果引擎在运行，还需要获取引擎中的队列和运行中任务
-        # 这里简化处理：我们只保存 pending_tasks 和 queue 中的任务
-        # 运行中的任务如果保存，下次启动也应该是 pending 状态
-        try:
-            # 获取引擎队列快照 (注意：这是异步队列，这里只能近似获取)
-            # 更稳妥的方式是让引擎提供 keys
-            pass 
-        except:
-            pass
-    
-    # 简单起见，我们只持久化 pending_tasks 
-    # (注意：用户要求重启后任务列表还在。如果引擎正在运行的任务，重启后应该变回待启动)
-    # 我们需要在 engine 关闭或软件退出时，把 queue 里的东西倒出来存进去
-    
-    # 重新实现：
-    # 1. 收集 pending_tasks
-    # 2. 如果 engine 存在，收集 engine.queue 和 engine.running_tasks
-    
-    all_tasks = list(pending_tasks)
-    if engine:
-        # 获取引擎中的任务（需要线程安全访问，或者在 shutdown 时统一处理）
-        # 为防止复杂并发问题，我们在 save 时主要关注 pending。
-        # 在 on_close 时，我们会停止引擎，此时可以将任务导出。
-        pass
-        
+    """保存未完成任务与定时同步列表（原子写入 watchlist.json）"""
     try:
-        with open(TASKS_FILE, "w", encoding="utf-8") as f:
-            json.dump(all_tasks, f, ensure_ascii=False, indent=2)
+        watchlist.save()
     except Exception as e:
         print(f"保存任务列表失败: {e}")
 
 def load_tasks():
-    """从文件加载任务列表"""
-    global pending_tasks
-    if os.path.exists(TASKS_FILE):
-        try:
-            with open(TASKS_FILE, "r", encoding="utf-8") as f:
-                saved_tasks = json.load(f)
-                if isinstance(saved_tasks, list):
-                    pending_tasks = saved_tasks
-                    print(f"已加载 {len(pending_tasks)} 个任务")
-        except Exception as e:
-            print(f"加载任务列表失败: {e}")
+    """加载任务列表与定时同步列表（首次运行时自动迁移旧版 tasks.json）"""
+    try:
+        watchlist.load()
+        print(f"已加载 {len(registry)} 个任务，{len(watchlist)} 个定时同步账号")
+    except Exception as e:
+        print(f"加载任务列表失败: {e}")
 
 # ================= Playwright 工作线程 =================
 def start_playwright_thread():
@@ -84,6 +57,7 @@ def start_playwright_thread():
     global playwright_loop
     playwright_loop = asyncio.new_event_loop()
     asyncio.set_event_loop(playwright_loop)
+    playwright_loop.call_soon(loop_ready.set)
     playwright_loop.run_forever()
 def run_async_nowait(coro):
     """在 Playwright 线程中异步运行协程（不等待结果，不阻塞）"""
@@ -99,13 +73,86 @@ def run_async(coro, timeout=60):
             print(f"异步操作超时或失败: {e}")
             return None
     return None
+# ================= 界面推送总线 =================
+class UiEventBus:
+    """收集任务状态变化与进度增量，按固定频率合并成增量批次推送到前端（取代轮询）"""
+    def __init__(self, max_hz=8):
+        self.interval = 1.0 / max_hz
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._dirty = set()     # 状态有变化的任务
+        self._progress = {}     # 仅进度变化的任务 {tid: count}
+        self._full = False      # 下一批推送完整列表
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def mark(self, tids=None):
+        """标记任务状态变化；tids 为 None 时下一批推送全量"""
+        with self._lock:
+            if tids is None: self._full = True
+            else: self._dirty.update(tids)
+        self._wake.set()
+
+    def progress(self, tid, count):
+        with self._lock:
+            self._progress[tid] = count
+        self._wake.set()
+
+    def on_registry_change(self, changes):
+        self.mark(tid for tid, _, _ in changes)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)  # 合并窗口：窗口内的变化合成一批
+            self._wake.clear()
+            try: self._flush()
+            except Exception as e: print(f"界面推送失败: {e}")
+
+    def _flush(self):
+        with self._lock:
+            full, dirty, progress = self._full, self._dirty, self._progress
+            self._full, self._dirty, self._progress = False, set(), {}
+        if full:
+            eel.onTaskDelta({"full": _status_items()})
+            return
+        items = _status_items(dirty) if dirty else []
+        present = {item["id"] for item in items}
+        delta = {
+            "upsert": items,
+            "remove": [tid for tid in dirty if tid not in present],
+            "progress": {tid: n for tid, n in progress.items() if tid not in present},
+        }
+        if delta["upsert"] or delta["remove"] or delta["progress"]:
+            eel.onTaskDelta(delta)
+
+def _status_items(tids=None):
+    """任务状态条目（tids 为 None 时返回全部）"""
+    source = coordinator if coordinator and coordinator.is_running else engine
+    if source:
+        return source.get_queue_status() if tids is None else source.get_task_status(tids)
+    # 引擎尚未创建：登记表中只有待启动 / 失败的任务
+    pairs = registry.snapshot() if tids is None else [(t, registry.state(t)) for t in tids]
+    return [{"id": tid, "status": st, "state": st, "progress": 0} for tid, st in pairs if st]
+
+ui_bus = UiEventBus()
+registry.subscribe(ui_bus.on_registry_change)
+
 # ================= 回调函数 =================
 def on_log(msg, level="info"):
-    """推送日志到前端"""
+    """推送日志到前端（只入队，由日志管道批量投递）"""
+    log_sink.emit(msg, level)
+def on_logs(batch):
+    """日志管道的投递回调：一批日志一次推送，不等待前端返回"""
     try:
-        eel.onLog(msg, level)()
+        eel.onLogs(batch)
     except:
         pass
+log_sink = LogSink({'on_logs': on_logs})
+diagnostics = LoopDiagnostics(on_log)  # 跨引擎重启保留（内存快照需要与上一次对比）
+migrator = LayoutMigrator(on_log)      # 切换目录分层后在后台迁移已有文件
+CFG.subscribe(lambda changed: "dir_layout" in changed and migrator.start(changed["dir_layout"]))
 def on_task_update(task_list):
     """推送任务列表更新到前端"""
     try:
@@ -113,11 +160,8 @@ def on_task_update(task_list):
     except:
         pass
 def on_progress(task_id, count):
-    """推送下载进度到前端"""
-    try:
-        eel.onProgress(task_id, count)()
-    except:
-        pass
+    """下载进度交给推送总线合并，避免每个文件一条消息"""
+    ui_bus.progress(task_id, count)
 def on_engine_status(running):
     """推送引擎状态到前端"""
     try:
@@ -125,18 +169,16 @@ def on_engine_status(running):
     except:
         pass
 def on_task_finished(tid):
-    """任务完成回调：从预列表中移除并保存"""
-    global pending_tasks
-    if tid in pending_tasks:
-        pending_tasks.remove(tid)
-        save_tasks()
-        on_log(f"💾 任务 [{tid}] 完成并已从列表中移除", "success")
+    """任务完成回调：从登记表中移除并保存"""
+    registry.remove(tid)
+    save_tasks()
+    on_log(f"💾 任务 [{tid}] 完成并已从列表中移除", "success")
 
 # ================= Eel 暴露的 API =================
 @eel.expose
 def check_login_status():
-    """检查登录状态"""
-    return os.path.exists("my_browser_data")
+    """检查登录状态（任意账号已登录即可）"""
+    return any(os.path.exists(profile_data_dir(p)) for p in configured_profiles())
 @eel.expose
 def check_save_path():
     """检查保存路径是否有效"""
@@ -152,6 +194,14 @@ def update_setting(key, value):
     CFG.set(key, value)
     return True
 @eel.expose
+def update_settings(changes):
+    """批量更新配置（设置页一次提交）：快照只替换一次，写盘合并为一次；运行中的引擎通过配置订阅即时响应"""
+    try:
+        CFG.update(changes or {})
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    return {"success": True}
+@eel.expose
 def select_folder():
     """调用系统文件夹选择对话框"""
     root = tk.Tk()
@@ -166,7 +216,7 @@ def select_folder():
 @eel.expose
 def start_engine():
     """启动爬虫引擎（异步，不阻塞）"""
-    global engine, pending_tasks
+    global engine
     
     # 前置校验
     if not check_login_status():
@@ -175,32 +225,37 @@ def start_engine():
     if not check_save_path():
         return {"success": False, "error": "请先设置有效的保存路径"}
     
-    if engine and engine.is_running:
+    if engine and engine.is_running or coordinator and coordinator.is_running:
         return {"success": False, "error": "引擎已在运行中"}
+
+    # 多进程分片模式：任务分给多个工作进程（各自独立的引擎与浏览器），状态经 IPC 汇总回来
+    if int(CFG.get("shard_workers") or 1) > 1:
+        return start_sharded()
     
     # 创建引擎并注入回调
     callbacks = {
         'on_log': on_log,
         'on_progress': on_progress,
         'on_task_update': on_task_update,
+        'on_task_dirty': ui_bus.mark,
         'on_task_finished': lambda tid: playwright_loop.call_soon_threadsafe(on_task_finished, tid)
     }
-    engine = CrawlerEngine(callbacks)
+    engine = CrawlerEngine(callbacks, registry=registry, log_sink=log_sink, watchlist=watchlist)
     engine.loop = playwright_loop
+    engine.diagnostics = diagnostics
     
-    # 注入全局浏览器实例（实现 Detachment 修复）
-    global global_pw_instance, global_browser_context
+    # 注入全局浏览器实例（实现 Detachment 修复），账号池字典由引擎原地维护
+    global global_pw_instance, global_profile_contexts
     engine.pw_instance = global_pw_instance
-    engine.browser_context = global_browser_context
+    engine.profile_contexts = global_profile_contexts
     
     # 异步启动引擎
     async def do_start():
-        global engine, global_pw_instance, global_browser_context
+        global engine, global_pw_instance
         await engine._engine_lifecycle()
         
         # 实时更新全局引用 (若 engine 内部发现了失效并重置，这里也会跟着更新)
         global_pw_instance = engine.pw_instance
-        global_browser_context = engine.browser_context
     
     # 强制重置标志位
     engine.is_running = True
@@ -209,114 +264,108 @@ def start_engine():
     
     on_engine_status(True)
     
-    # 处理预加入队列的任务
-    if pending_tasks:
-        for tid in pending_tasks:
-            engine.add_task_to_queue(tid)
-        # 变更：不再清空 pending_tasks，而是保留作为持久化记录
-        # 只有当任务完成 (on_task_finished) 或手动删除时才移除
-        save_tasks() 
+    # 处理预加入队列（及上次失败）的任务；任务只有完成或手动删除时才从登记表移除
+    waiting = registry.ids(("pending", "error"))
+    if waiting:
+        engine.add_tasks_to_queue(waiting)
     
     return {"success": True}
+def start_sharded():
+    """以多进程分片方式执行登记表中待启动 / 部分完成 / 失败的任务"""
+    global coordinator
+    callbacks = {
+        'on_log': on_log,
+        'on_progress': on_progress,
+        'on_task_finished': on_task_finished,
+        'on_done': lambda results: on_engine_status(False),
+    }
+    coordinator = ShardCoordinator(callbacks, registry=registry, watchlist=watchlist)
+    if not coordinator.start():
+        return {"success": False, "error": "没有可执行的任务"}
+    on_engine_status(True)
+    return {"success": True}
 @eel.expose
 def stop_engine():
     """停止爬虫引擎（仅停止爬取，不关闭浏览器）"""
     global engine
+    if coordinator and coordinator.is_running:
+        coordinator.stop()
+        return {"success": True}
     if engine:
         # 新逻辑：只停止爬取，不关闭浏览器
         engine.stop_crawling_only()
         on_engine_status(False)
     return {"success": True}
 @eel.expose
-def add_tasks(input_str):
-    """批量添加任务（支持预加入队列）"""
-    global engine, pending_tasks
+def add_tasks(input_str, budget=None):
+    """批量添加任务（支持预加入队列）；budget 为可选的单任务预算 {max_media, max_bytes, max_seconds, max_steps}"""
+    global engine
     
-    import re
     ids = re.findall(r'@?([a-zA-Z0-9_]+)', input_str)
-    final_ids = set()
+    final_ids = {}
     exclude = {'x', 'com', 'https', 'http', 'twitter', 'www'}
     for i in ids:
         if i.lower() not in exclude:
-            final_ids.add(i)
+            final_ids[i] = None
     
     if not final_ids:
         return {"success": False, "error": "未识别到有效的用户 ID"}
     
     # 允许预加入队列
     if engine and engine.is_running:
-        added_count = 0
-        for tid in final_ids:
-            if engine.add_task_to_queue(tid):
-                added_count += 1
-        
+        added_count = len(engine.add_tasks_to_queue(final_ids, budget=budget))
         if added_count == 0:
             return {"success": False, "error": "所选任务已在运行或排队中，请勿重复添加"}
-            
+        save_tasks()
         return {"success": True, "count": added_count, "info": f"成功添加 {added_count} 个任务"}
     else:
-        # 引擎未启动，加入预队列
-        changed = False
-        duplicate_count = 0
-        for tid in final_ids:
-            if tid in pending_tasks:
-                duplicate_count += 1
-                continue
-            pending_tasks.append(tid)
-            on_log(f"➕ 任务 [{tid}] 已加入预队列，待引擎启动后执行", "info")
-            changed = True
-        if changed:
+        # 引擎未启动，加入预队列（登记表 O(1) 查重）
+        added = registry.add(final_ids, budget=budget)
+        duplicate_count = len(final_ids) - len(added)
+        if len(added) == 1:
+            on_log(f"➕ 任务 [{added[0]}] 已加入预队列，待引擎启动后执行", "info")
+        elif added:
+            on_log(f"➕ {len(added)} 个任务已加入预队列，待引擎启动后执行", "info")
+        if added:
             save_tasks()
         
-        msg = f"成功添加 {len(final_ids) - duplicate_count} 个任务"
+        msg = f"成功添加 {len(added)} 个任务"
         if duplicate_count > 0:
             msg += f" (忽略 {duplicate_count} 个重复项)"
             
-        if len(final_ids) == duplicate_count:
+        if not added:
              return {"success": False, "error": "所选任务均已在列表中，请勿重复添加"}
              
-        return {"success": True, "count": len(final_ids) - duplicate_count, "info": msg}
+        return {"success": True, "count": len(added), "info": msg}
 @eel.expose
 def add_my_likes():
     """添加我的喜欢任务"""
-    global engine, pending_tasks
-    
-    if engine and engine.is_running:
-        if not engine.add_task_to_queue("MY_LIKES"):
-            return {"success": False, "error": "任务已在队列中"}
-    else:
-        if "MY_LIKES" not in pending_tasks:
-            pending_tasks.append("MY_LIKES")
-            on_log("➕ 任务 [我的喜欢] 已加入预队列", "info")
-            save_tasks()
-        else:
-            return {"success": False, "error": "任务已在预队列中"}
-    return {"success": True}
+    return _add_pinned_task("MY_LIKES", "我的喜欢")
 
 @eel.expose
 def add_my_bookmarks():
     """添加我的书签任务"""
-    global engine, pending_tasks
-    
+    return _add_pinned_task("MY_BOOKMARKS", "我的书签")
+
+def _add_pinned_task(tid, label):
+    global engine
     if engine and engine.is_running:
-        if not engine.add_task_to_queue("MY_BOOKMARKS"):
+        if not engine.add_task_to_queue(tid):
             return {"success": False, "error": "任务已在队列中"}
     else:
-        if "MY_BOOKMARKS" not in pending_tasks:
-            pending_tasks.append("MY_BOOKMARKS")
-            on_log("➕ 任务 [我的书签] 已加入预队列", "info")
-            save_tasks()
-        else:
+        if not registry.add([tid]):
             return {"success": False, "error": "任务已在预队列中"}
+        on_log(f"➕ 任务 [{label}] 已加入预队列", "info")
+    save_tasks()
     return {"success": True}
 @eel.expose
 def delete_task(task_id):
     """删除任务（异步执行，不阻塞）"""
-    global engine, pending_tasks
+    global engine
     
-    # 先从预队列移除
-    if task_id in pending_tasks:
-        pending_tasks.remove(task_id)
+    # 预队列中的任务直接移除
+    if registry.state(task_id) == "pending":
+        registry.remove(task_id)
         on_log(f"🗑️ 已从预队列移除: [{task_id}]", "warning")
         save_tasks()
         return {"success": True}
@@ -327,14 +376,11 @@ def delete_task(task_id):
         # 但 delete_task 是异步的，我们需要尽量让操作排队
         run_async_nowait(engine.delete_task(task_id))
 
-    # 无论引擎是否运行，都要确保从 pending_tasks 移除并保存
-    # (重复检查是为了防止多线程竞争导致的未移除)
-    if task_id in pending_tasks:
-        try:
-            pending_tasks.remove(task_id)
-            save_tasks()
-        except: pass
-        
+    # 立即从登记表移除并保存（引擎侧的删除是幂等的）；删除定时同步账号的任务即取消其定时
+    registry.remove(task_id)
+    if watchlist.unwatch(task_id):
+        on_log(f"⏰ 已取消定时同步: [{task_id}]", "warning")
+    save_tasks()
     return {"success": True}
 @eel.expose
 def start_single_task(task_id):
@@ -379,56 +425,78 @@ def resume_all():
         engine.resume_all()
     return {"success": True}
 @eel.expose
+def set_task_priority(task_id, priority):
+    """设置任务优先级（越大越先执行，引擎未启动时同样生效）"""
+    try: priority = int(priority)
+    except: return {"success": False, "error": "优先级必须是整数"}
+    ok = engine.set_task_priority(task_id, priority) if engine else registry.set_priority(task_id, priority)
+    if not ok:
+        return {"success": False, "error": "任务不存在"}
+    save_tasks()
+    return {"success": True}
+@eel.expose
 def clear_all_tasks():
     """清空所有任务"""
-    global engine, pending_tasks
-    pending_tasks.clear()
+    global engine
+    # 清空的任务中属于定时同步的，本轮跳过，下个间隔再运行
+    watchlist.skip(registry.ids())
+    registry.clear()
     save_tasks()
     if engine:
         run_async_nowait(engine.clear_all_tasks())
     return {"success": True}
 @eel.expose
+def watch_accounts(input_str, interval_hours=None):
+    """加入定时同步列表（间隔留空使用设置中的默认值），到期后由引擎按速率错开自动入队"""
+    ids = [i for i in dict.fromkeys(re.findall(r'@?([a-zA-Z0-9_]+)', input_str))
+           if i.lower() not in {'x', 'com', 'https', 'http', 'twitter', 'www'}]
+    if not ids:
+        return {"success": False, "error": "未识别到有效的用户 ID"}
+    watchlist.watch(ids, interval_hours)
+    save_tasks()
+    hours = interval_hours or CFG.get("watch_interval_hours")
+    on_log(f"⏰ {len(ids)} 个账号已加入定时同步 (每 {hours} 小时)", "info")
+    return {"success": True, "count": len(ids)}
+
+@eel.expose
+def unwatch_account(task_id):
+    """取消定时同步"""
+    if not watchlist.unwatch(task_id):
+        return {"success": False, "error": "该账号不在定时同步列表中"}
+    save_tasks()
+    return {"success": True}
+
+@eel.expose
+def get_watchlist():
+    """定时同步列表（按下次到期时间排序）"""
+    return watchlist.snapshot()
+
+def on_watchlist_change():
+    try: eel.onWatchlist(len(watchlist), watchlist.next_due_in())()
+    except: pass
+
+@eel.expose
 def get_queue_status():
-    """获取任务队列状态（包含预队列）"""
-    global engine, pending_tasks
-    status_list = []
-    
-    # 1. 获取引擎内部状态
-    engine_status = []
-    tracked_ids = set()
-    if engine:
-        engine_status = engine.get_queue_status()
-        for item in engine_status:
-            tracked_ids.add(item['id'])
-    
-    # 2. 添加尚未进入引擎或引擎未追踪的预队列任务
-    for tid in pending_tasks:
-        if tid in tracked_ids:
-            continue
-        status_list.append({
-            "id": tid,
-            "status": "pending",  # 待启动
-            "progress": 0
-        })
-    
-    # 3. 合并引擎状态
-    status_list.extend(engine_status)
-    
-    return status_list
+    """获取任务队列状态（包含预队列，仅首次加载时调用，之后由推送总线增量更新）"""
+    return _status_items()
 @eel.expose
-def run_login():
-    """启动登录向导（异步执行，不阻塞 UI）"""
+def run_login(profile=None):
+    """启动登录向导（异步执行，不阻塞 UI），profile 为空时登录默认账号"""
     global engine
     
     # 如果引擎在运行则先停止
     if engine and engine.is_running:
         return {"success": False, "error": "请先停止引擎再登录"}
     
+    profile = profile or DEFAULT_PROFILE
+    if not re.fullmatch(r"[A-Za-z0-9_-]+", profile):
+        return {"success": False, "error": "账号名仅支持字母、数字、_ 和 -"}
+    
     # 在后台线程执行登录
     def do_login_thread():
         async def login_async():
-            temp_engine = CrawlerEngine({'on_log': on_log})
-            await temp_engine.run_login()
+            temp_engine = CrawlerEngine({'on_log': on_log}, log_sink=log_sink)
+            await temp_engine.run_login(profile)
         
         if playwright_loop and playwright_loop.is_running():
             future = asyncio.run_coroutine_threadsafe(login_async(), playwright_loop)
@@ -537,19 +605,48 @@ def clear_all_history():
     except Exception as e:
         return {"success": False, "error": str(e)}
 @eel.expose
-def export_cookies():
+def export_cookies(profile=None):
     """导出 Cookie（异步执行）"""
     global engine
     if engine and engine.is_running:
         return {"success": False, "error": "请先停止引擎"}
+    profile = profile or DEFAULT_PROFILE
+    if profile not in configured_profiles():
+        return {"success": False, "error": "账号不存在"}
     
     def do_export():
         temp_engine = CrawlerEngine()
-        temp_engine.export_cookies()
+        temp_engine.export_cookies(profile)
     
     threading.Thread(target=do_export, daemon=True).start()
     return {"success": True}
 @eel.expose
+def get_profiles():
+    """获取账号列表（含登录状态与所有者标记）"""
+    owner = CFG.get("owner_profile") or DEFAULT_PROFILE
+    return [{
+        "name": p,
+        "logged_in": os.path.exists(profile_data_dir(p)),
+        "owner": p == owner
+    } for p in configured_profiles()]
+@eel.expose
+def add_profile(name):
+    """新增账号（登录后即可参与采集）"""
+    if not name or not re.fullmatch(r"[A-Za-z0-9_-]+", name):
+        return {"success": False, "error": "账号名仅支持字母、数字、_ 和 -"}
+    profiles = configured_profiles()
+    if name in profiles:
+        return {"success": False, "error": "账号已存在"}
+    CFG.set("profiles", profiles + [name])
+    return {"success": True}
+@eel.expose
+def set_owner_profile(name):
+    """设置喜欢/书签所属账号"""
+    if name not in configured_profiles():
+        return {"success": False, "error": "账号不存在"}
+    CFG.set("owner_profile", name)
+    return {"success": True}
+@eel.expose
 def get_stats():
     """获取统计数据"""
     save_path = CFG.get("save_path")
@@ -588,8 +685,25 @@ def get_stats():
 def get_engine_status():
     """获取引擎运行状态"""
     global engine
+    if coordinator and coordinator.is_running: return True
     return engine.is_running if engine else False
 @eel.expose
+def get_diagnostics():
+    """诊断模式状态：循环延迟分位数与阻塞最多的调用位置"""
+    return diagnostics.status()
+@eel.expose
+def capture_profile(seconds=10):
+    """对引擎事件循环做 N 秒 cProfile 采样，完成后写入诊断目录（立即返回输出路径）"""
+    if not (engine and engine.is_running):
+        return {"success": False, "error": "引擎未运行"}
+    path = diagnostics.capture_profile(seconds)
+    return {"success": bool(path), "path": path, "error": None if path else "采样进行中"}
+@eel.expose
+def capture_memory_snapshot():
+    """tracemalloc 内存快照；首次调用只开启追踪"""
+    path = diagnostics.capture_memory()
+    return {"success": True, "path": path, "started": path is None}
+@eel.expose
 def get_finished_tasks():
     """获取已完成的任务列表"""
     global engine
@@ -600,26 +714,24 @@ def get_finished_tasks():
 # ================= 窗口关闭处理 =================
 def on_close(route, websockets):
     """窗口关闭时清理资源"""
-    global engine, playwright_loop, pending_tasks
+    global engine, playwright_loop
     
     print("正在清理资源...")
 
-    # 持久化策略变更：pending_tasks 始终包含所有未完成任务
-    # 因此不需要再从 engine "回收" 任务，只需要保存当前的 pending_tasks
-    # 但为了保险起见，如果 engine 运行期间添加了任务但没同步到 pending (理论上 add_tasks 已同步)，
-    # 这里可以做一次最后的同步检查，但主要依赖运行时的实时同步。
-    
+    # 登记表始终包含所有未完成任务（引擎与界面共用），直接保存即可
     save_tasks()
-    print(f"已保存任务列表 ({len(pending_tasks)} 个)")
+    print(f"已保存任务列表 ({len(registry)} 个)")
 
     # 停止引擎
     if engine and engine.is_running:
         engine.stop()
+    if coordinator and coordinator.is_running:
+        coordinator.stop()
         
     # 彻底关闭全局浏览器（软件退出时）
-    global global_pw_instance, global_browser_context
-    if global_browser_context:
-        try: playwright_loop.call_soon_threadsafe(lambda: asyncio.create_task(global_browser_context.close()))
+    global global_pw_instance, global_profile_contexts
+    for ctx in list(global_profile_contexts.values()):
+        try: playwright_loop.call_soon_threadsafe(lambda c=ctx: asyncio.create_task(c.close()))
         except: pass
     if global_pw_instance:
         try: playwright_loop.call_soon_threadsafe(lambda: asyncio.create_task(global_pw_instance.stop()))
@@ -663,9 +775,8 @@ def main():
     playwright_thread = threading.Thread(target=start_playwright_thread, daemon=True)
     playwright_thread.start()
     
-    # 等待事件循环启动
-    import time
-    time.sleep(0.5)
+    # 等待事件循环就绪（就绪探测，取代固定等待）
+    loop_ready.wait(timeout=5)
     
     # 初始化 Eel
     web_dir = os.path.join(os.path.dirname(__file__), "web")
@@ -674,6 +785,10 @@ def main():
     # 加载任务
     load_tasks()
     
+    # 启动界面推送总线（任务状态 / 进度增量批量推送）
+    ui_bus.start()
+    watchlist.subscribe(on_watchlist_change)
+    
     # 确定使用的浏览器
     browser_type = CFG.get("browser_type").lower()
     browser_path = find_system_browser(browser_type)
@@ -698,4 +813,5 @@ def main():
         print("尝试使用默认浏览器...")
         eel.start('index.html', mode='default', host='localhost', port=8080, close_callback=on_close)
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # 打包后分片工作进程的入口
     main()
@@ -6,11 +6,18 @@ import asyncio
 import threading
 import re
 import json
-import requests
 import shutil
-import winreg
+import heapq
+import hashlib
+import atexit
+import logging
+import cProfile
+import pstats
+import tracemalloc
+from collections import OrderedDict, deque, namedtuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 from concurrent.futures import ThreadPoolExecutor
-from playwright.async_api import async_playwright
+from spider_pack import pack_store, has_packs, member_name
 
 # ================= 终端颜色配置 =================
 class Colors:
@@ -34,32 +41,121 @@ def cprint(msg, level="info"):
     print(f"{Colors.GREY}[{ts}]{Colors.RESET} {color}{msg}{Colors.RESET}")
 
 # ================= 浏览器路径自动寻找工具 =================
+BROWSER_CACHE_FILE = ".browser_cache.json"
+_browser_cache = {}
+
+def _async_playwright():
+    """延迟导入 Playwright：只有真正需要浏览器时才加载驱动"""
+    from playwright.async_api import async_playwright
+    return async_playwright()
+
+def _probe_browser(browser_type):
+    """按平台探测浏览器可执行文件（注册表 -> PATH -> 常见安装位置）"""
+    if sys.platform == "win32":
+        import winreg
+        reg_key = r"SOFTWARE\Microsoft\Windows\CurrentVersion\App Paths\msedge.exe" if browser_type == "edge" else r"SOFTWARE\Microsoft\Windows\CurrentVersion\App Paths\chrome.exe"
+        try:
+            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, reg_key) as key:
+                exe_path, _ = winreg.QueryValueEx(key, "")
+                if os.path.exists(exe_path): return exe_path
+        except:
+            pass
+
+    if browser_type == "edge":
+        names = ["msedge", "microsoft-edge", "microsoft-edge-stable"]
+        paths = [
+            r"C:\Program Files (x86)\Microsoft\Edge\Application\msedge.exe",
+            r"C:\Program Files\Microsoft\Edge\Application\msedge.exe",
+            os.path.expanduser(r"~\AppData\Local\Microsoft\Edge\Application\msedge.exe"),
+            "/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge",
+            "/opt/microsoft/msedge/msedge",
+        ]
+    else:
+        names = ["chrome", "google-chrome", "google-chrome-stable", "chromium", "chromium-browser"]
+        paths = [
+            r"C:\Program Files\Google\Chrome\Application\chrome.exe",
+            r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
+            os.path.expanduser(r"~\AppData\Local\Google\Chrome\Application\chrome.exe"),
+            "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+            "/opt/google/chrome/chrome",
+        ]
+    for name in names:
+        which_path = shutil.which(name)
+        if which_path: return which_path
+    for path in paths:
+        if os.path.exists(path): return path
+    return None
+
 def find_system_browser(browser_type="edge"):
+    """查找浏览器路径；结果缓存在内存与 .browser_cache.json 中，缓存失效时重新探测"""
     browser_type = browser_type.lower()
-    reg_key = r"SOFTWARE\Microsoft\Windows\CurrentVersion\App Paths\msedge.exe" if browser_type == "edge" else r"SOFTWARE\Microsoft\Windows\CurrentVersion\App Paths\chrome.exe"
+    cached = _browser_cache.get(browser_type)
+    if cached and os.path.exists(cached): return cached
+
+    if not _browser_cache and os.path.exists(BROWSER_CACHE_FILE):
+        try:
+            with open(BROWSER_CACHE_FILE, "r", encoding="utf-8") as f:
+                _browser_cache.update(json.load(f))
+        except: pass
+        cached = _browser_cache.get(browser_type)
+        if cached and os.path.exists(cached): return cached
+
+    exe_path = _probe_browser(browser_type)
+    if exe_path:
+        _browser_cache[browser_type] = exe_path
+        try:
+            with open(BROWSER_CACHE_FILE, "w", encoding="utf-8") as f:
+                json.dump(_browser_cache, f, ensure_ascii=False, indent=2)
+        except: pass
+    return exe_path
+
+# ================= 多账号 Profile =================
+DEFAULT_PROFILE = "default"
+PINNED_TASKS = ("MY_LIKES", "MY_BOOKMARKS")  # 必须在所有者账号上执行的任务
+
+_profile_suffix = ""  # 分片工作进程使用各自的账号数据副本（如 _shard1），主进程为空
+
+def set_profile_suffix(suffix):
+    global _profile_suffix
+    _profile_suffix = suffix or ""
+
+def profile_data_dir(profile=DEFAULT_PROFILE):
+    """Profile 对应的浏览器数据目录（default 沿用 my_browser_data）"""
+    if not profile or profile == DEFAULT_PROFILE: return os.path.abspath("my_browser_data" + _profile_suffix)
+    return os.path.abspath(f"my_browser_data_{profile}" + _profile_suffix)
+
+def configured_profiles():
+    profiles = CFG.get("profiles") or [DEFAULT_PROFILE]
+    return list(dict.fromkeys(profiles))
+
+def logged_in_profiles():
+    return [p for p in configured_profiles() if os.path.exists(profile_data_dir(p))]
+
+def task_save_dir(tid, root=None):
+    """任务的保存目录（喜欢 / 书签 / 博主图集）"""
+    root = root or CFG.snap.save_path
+    return os.path.join(root, "我的喜欢" if tid == "MY_LIKES" else "我的书签" if tid == "MY_BOOKMARKS" else f"博主图集/{tid}")
+
+def last_finished_at(tid):
+    """任务目录 sync_state.json 中记录的上次完成时间（时间戳），没有记录返回 0"""
     try:
-        with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, reg_key) as key:
-            exe_path, _ = winreg.QueryValueEx(key, "")
-            if os.path.exists(exe_path): return exe_path
+        with open(os.path.join(task_save_dir(tid), "sync_state.json"), "r", encoding="utf-8") as f:
+            finished = json.load(f).get("last_run", {}).get("finished")
+        return time.mktime(time.strptime(finished, "%Y-%m-%d %H:%M:%S")) if finished else 0.0
     except:
-        pass
-    which_path = shutil.which(browser_type)
-    if which_path: return which_path
-    
-    edge_paths = [
-        r"C:\Program Files (x86)\Microsoft\Edge\Application\msedge.exe",
-        r"C:\Program Files\Microsoft\Edge\Application\msedge.exe",
-        os.path.expanduser(r"~\AppData\Local\Microsoft\Edge\Application\msedge.exe"),
-    ]
-    chrome_paths = [
-        r"C:\Program Files\Google\Chrome\Application\chrome.exe",
-        r"C:\Program Files (x86)\Google\Chrome\Application\chrome.exe",
-        os.path.expanduser(r"~\AppData\Local\Google\Chrome\Application\chrome.exe"),
-    ]
-    target_paths = edge_paths if browser_type == "edge" else chrome_paths
-    for path in target_paths:
-        if os.path.exists(path): return path
-    return None
+        return 0.0
+
+BUDGET_KEYS = ("max_media", "max_bytes", "max_seconds", "max_steps")
+
+def normalize_budget(budget):
+    """单任务预算：只保留正数的 max_media / max_bytes / max_seconds / max_steps，空预算返回 None"""
+    if not isinstance(budget, dict): return None
+    clean = {}
+    for k in BUDGET_KEYS:
+        try: v = int(float(budget.get(k) or 0))
+        except: v = 0
+        if v > 0: clean[k] = v
+    return clean or None
 
 # ================= 配置文件管理 =================
 class ConfigManager:
@@ -69,6 +165,8 @@ class ConfigManager:
             "save_path": os.path.join(os.getcwd(), "Download"), 
             "concurrency": 3,
             "download_threads": 16,
+            "download_workers": 12,   # 下载调度协程数（HEAD 预检与排队调度，真正的传输在下载线程中）
+            "download_chunk_size": 16384, # 下载写盘的分块大小(字节)
             "max_scrolls": 1000,
             "stop_thresh": 300,      # 旧图阈值默认 300
             "max_video_size": 5,
@@ -81,60 +179,666 @@ class ConfigManager:
             "headless": False,
             "theme": "system",        # UI 主题: system, light, dark
             "timeout": 60,          # 超时时间(秒)
-            "use_tmp_files": True   # 是否使用临时文件下载
+            "use_tmp_files": True,  # 是否使用临时文件下载
+            "api_pagination": True, # 免滚动游标翻页 (捕获失败时自动回退滚动)
+            "min_page_delay": 1.5,  # 翻页最小礼貌间隔(秒)
+            "scroll_wait_timeout": 15, # 滚动后等待下一批数据的超时(秒)
+            "incremental_sync": True, # 增量同步：越过上次水位线即停止
+            "mem_guard": True,        # 长时间滚动的页面内存保护
+            "mem_check_every": 10,    # 每滚动 N 次采样一次页面内存
+            "mem_heap_limit_mb": 768, # JS 堆上限(MB)
+            "mem_dom_limit": 60000,   # DOM 节点数上限
+            "profiles": ["default"],  # 已配置的登录账号
+            "owner_profile": "default", # 喜欢/书签所属账号
+            "page_pool_max_uses": 20, # 页面复用次数上限，达到后回收
+            "page_pool_mem_mb": 400,  # 归还时 JS 堆超过该值(MB)则回收
+            "page_pool_prewarm": 1,   # 每个账号启动时预热的页面数
+            "log_level": "secondary", # 最低日志级别: secondary/info/success/warning/danger
+            "log_buffer_size": 2000,  # 日志环形缓冲容量，溢出时丢弃最早的日志
+            "log_dedupe_window": 2.0, # 相同日志在该时间窗口(秒)内只输出一次
+            "log_file": "",           # 日志文件路径（留空不写文件，适合无界面运行时开启）
+            "log_file_max_mb": 5,     # 单个日志文件上限(MB)，超过后滚动
+            "log_file_backups": 3,    # 保留的历史日志文件数
+            "schedule_policy": "fifo", # 调度策略: fifo 先进先出 / sjf 预计耗时短的任务优先
+            "schedule_aging": 1.0,    # sjf 老化系数：每排队 1 秒抵扣的预计耗时(秒)，防止大任务饿死
+            "schedule_default_cost": 300, # 没有历史记录的任务的预计耗时(秒)
+            "watch_interval_hours": 24, # 定时同步的默认间隔(小时)
+            "watch_rate_per_hour": 60,  # 定时同步每小时最多启动的任务数（到期任务按此速率均匀错开）
+            "watch_jitter": 0.1,        # 下次到期时间的随机抖动比例，避免账号再次扎堆到期
+            "shard_workers": 1,         # 多进程分片的工作进程数（1 = 单进程）
+            "resume_checkpoints": True, # 中断的任务从上次的时间线游标继续，而不是从头滚动
+            "checkpoint_every": 5,      # 每翻 N 页落盘一次断点
+            "diagnostics": False,       # 诊断模式：开启事件循环 debug，定位阻塞循环的慢回调并持续采样循环延迟
+            "slow_callback_ms": 100,    # 单次回调执行超过该值(ms)即记为阻塞
+            "lag_sample_interval": 0.5, # 循环延迟采样间隔(秒)
+            "diag_dir": "diagnostics",  # cProfile / tracemalloc 快照输出目录
+            "trace_file": "",           # 追踪输出文件（.json 为 Chrome trace 格式，.jsonl 为逐行事件；留空不追踪）
+            "storage_mode": "files",    # 存储方式: files 每个媒体一个文件 / pack 追加写入按任务滚动的 tar 包
+            "pack_max_mb": 1024,        # 单个 tar 包上限(MB)，写满后换下一个包
+            "dir_layout": "flat"        # 媒体目录分层: flat 平铺 / hash 文件名哈希两级前缀目录 / date 推文年/月
         }
+        self.Snapshot = namedtuple("ConfigSnapshot", self.default_config)
+        self.overrides = {}  # 仅本次运行生效的覆盖值（批处理命令行参数），不写回配置文件
+        self.lock = threading.RLock()
+        self.save_delay = 0.5  # 写盘防抖(秒)：连续修改合并为一次写入
+        self._save_timer = None
+        self._listeners = []
         self.data = self.load()
+        self.snap = self._build_snapshot()  # 只读的类型化快照，热路径直接读属性；配置变化时整体替换
+        atexit.register(self.flush)
+
+    def coerce(self, key, value):
+        """按默认值的类型转换配置值（数字字符串 / 开关字符串等），无法转换时抛出 ValueError"""
+        default = self.default_config.get(key)
+        try:
+            if isinstance(default, bool):
+                if isinstance(value, str): return value.strip().lower() in ("1", "true", "on", "yes")
+                return bool(value)
+            if isinstance(default, (int, float)):
+                number = float(value)
+                if isinstance(default, float) or not number.is_integer(): return number
+                return int(number)
+            if isinstance(default, str): return "" if value is None else str(value)
+            if isinstance(default, list): return list(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"配置项 {key} 的值无效: {value!r}")
+        return value
 
     def load(self):
+        data = dict(self.default_config)
         if os.path.exists(self.config_file):
             try:
                 with open(self.config_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    if "auto_phoenix_restart" in data: del data["auto_phoenix_restart"]
-                    # 补全可能缺失的配置
-                    if "stop_thresh" not in data: data["stop_thresh"] = 300
-                    if "timeout" not in data: data["timeout"] = 60
-                    if "use_tmp_files" not in data: data["use_tmp_files"] = True
-                    if "create_link_file" not in data: data["create_link_file"] = True
-                    return {**self.default_config, **data}
+                    saved = json.load(f)
+                if "auto_phoenix_restart" in saved: del saved["auto_phoenix_restart"]
+                # 缺失或类型无效的配置项使用默认值
+                for key, value in saved.items():
+                    try: data[key] = self.coerce(key, value)
+                    except ValueError: pass
             except:
-                return self.default_config
-        return self.default_config
+                pass
+        return data
+
+    def _build_snapshot(self):
+        values = {**self.data, **self.overrides}
+        return self.Snapshot(**{k: tuple(v) if isinstance(v, list) else v
+                                for k, v in ((k, values.get(k, d)) for k, d in self.default_config.items())})
 
     def save(self):
+        """原子写盘：先写临时文件再替换，写到一半崩溃也不会损坏配置文件"""
+        with self.lock:
+            text = json.dumps(self.data, indent=4, ensure_ascii=False)
+        tmp = self.config_file + ".tmp"
         try:
-            with open(self.config_file, "w", encoding="utf-8") as f:
-                json.dump(self.data, f, indent=4, ensure_ascii=False)
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, self.config_file)
         except Exception as e:
             print(f"Config Save Error: {e}")
 
+    def _schedule_save(self):
+        with self.lock:
+            if self._save_timer: self._save_timer.cancel()
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """立即写出尚未落盘的修改（退出时自动调用）"""
+        with self.lock:
+            if not self._save_timer: return
+            self._save_timer.cancel()
+            self._save_timer = None
+        self.save()
+
+    def subscribe(self, fn):
+        """订阅配置变化，fn(changed) 收到实际变化的 {key: value}（在修改配置的线程中调用）"""
+        if fn not in self._listeners: self._listeners.append(fn)
+
+    def unsubscribe(self, fn):
+        if fn in self._listeners: self._listeners.remove(fn)
+
+    def _notify(self, changed):
+        if not changed: return
+        for fn in list(self._listeners):
+            try: fn(changed)
+            except: pass
+
     def get(self, key):
+        if key in self.overrides: return self.overrides[key]
         return self.data.get(key)
 
+    def override(self, key, value):
+        with self.lock:
+            self.overrides[key] = self.coerce(key, value)
+            self.snap = self._build_snapshot()
+        self._notify({key: self.overrides[key]})
+
+    def set_overrides(self, values):
+        """整体替换覆盖值（撤销临时覆盖时用），通知所有生效值发生变化的键"""
+        with self.lock:
+            before = self.snap
+            self.overrides = {key: self.coerce(key, value) for key, value in values.items()}
+            self.snap = self._build_snapshot()
+            changed = {k: v for k, v in self.snap._asdict().items() if getattr(before, k) != v}
+        self._notify(changed)
+
+    def update(self, changes):
+        """批量修改：统一转换类型，快照只替换一次，变化通知一次，写盘合并为一次；返回实际变化的 {key: value}"""
+        changed = {}
+        with self.lock:
+            values = {key: self.coerce(key, value) for key, value in changes.items()}  # 任一项无效则整体不生效
+            for key, value in values.items():
+                if key in self.data and self.data[key] == value: continue
+                self.data[key] = value
+                changed[key] = value
+            if not changed: return changed
+            self.snap = self._build_snapshot()
+        self._schedule_save()
+        self._notify(changed)
+        return changed
+
     def set(self, key, value):
-        self.data[key] = value
-        self.save()
+        self.update({key: value})
 
 CFG = ConfigManager()
 
+# ================= 异步日志管道 =================
+LOG_LEVELS = {"secondary": 0, "info": 1, "success": 2, "warning": 3, "danger": 4}
+
+class LogSink:
+    """非阻塞日志管道：热路径只做一次入队，由后台线程批量投递到界面 / 终端 / 滚动文件。
+    有界环形缓冲 + 级别过滤 + 重复消息限流 + 丢弃计数"""
+    def __init__(self, callbacks=None, interval=0.1):
+        self.cbs = callbacks if callbacks else {}
+        self.interval = interval
+        self.buffer = deque(maxlen=max(100, int(CFG.get("log_buffer_size"))))
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.recent = {}        # 限流窗口内出现过的日志 {(level, msg): [首次时间, 被抑制次数]}
+        self.dropped = 0        # 本批次因缓冲溢出丢弃的条数
+        self.total_dropped = 0
+        self.thread = None
+        self.file_logger = None
+        self.open_file(CFG.get("log_file"))
+
+    def emit(self, msg, level="info"):
+        if LOG_LEVELS.get(level, 1) < LOG_LEVELS.get(CFG.snap.log_level, 0): return
+        now = time.monotonic()
+        key = (level, msg)
+        with self.lock:
+            seen = self.recent.get(key)
+            if seen and now - seen[0] < CFG.snap.log_dedupe_window:
+                seen[1] += 1
+                return
+            self.recent[key] = [now, 0]
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+                self.total_dropped += 1
+            self.buffer.append((time.strftime('%H:%M:%S'), msg, level))
+            # 在锁内检查并启动，多个线程同时首次写日志时也只有一个投递线程
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        self.wake.set()
+
+    def open_file(self, path):
+        """开启 / 切换滚动日志文件，path 为空则关闭"""
+        from logging.handlers import RotatingFileHandler
+        logger = logging.getLogger("x_spider")
+        for h in list(logger.handlers):
+            logger.removeHandler(h)
+            h.close()
+        self.file_logger = None
+        if not path: return
+        try:
+            handler = RotatingFileHandler(path, maxBytes=int(float(CFG.get("log_file_max_mb")) * 1024 * 1024),
+                                          backupCount=int(CFG.get("log_file_backups")), encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            self.file_logger = logger
+        except Exception as e:
+            cprint(f"⚠️ 日志文件打开失败: {e}", "warning")
+
+    def _run(self):
+        while True:
+            # 有被限流的日志时按窗口定时醒来，补发重复次数汇总
+            self.wake.wait(timeout=CFG.snap.log_dedupe_window if self.recent else None)
+            time.sleep(self.interval)  # 合并窗口：窗口内的日志合成一批
+            self.wake.clear()
+            self.flush()
+
+    def flush(self):
+        now = time.monotonic()
+        window = CFG.snap.log_dedupe_window
+        ts = time.strftime('%H:%M:%S')
+        with self.lock:
+            batch = list(self.buffer)
+            self.buffer.clear()
+            dropped, self.dropped = self.dropped, 0
+            for key, (first, repeats) in list(self.recent.items()):
+                if now - first < window: continue
+                del self.recent[key]
+                if repeats: batch.append((ts, f"🔁 {key[1]} (重复 {repeats} 次已折叠)", key[0]))
+        if dropped: batch.append((ts, f"⚠️ 日志过多，已丢弃 {dropped} 条较早的日志", "warning"))
+        if batch: self._deliver(batch)
+
+    def _deliver(self, batch):
+        try:
+            if 'on_logs' in self.cbs and self.cbs['on_logs']:
+                self.cbs['on_logs'](batch)
+            elif 'on_log' in self.cbs and self.cbs['on_log']:
+                for _, msg, level in batch: self.cbs['on_log'](msg, level)
+            else:
+                for _, msg, level in batch: cprint(msg, level)
+        except: pass
+        if self.file_logger:
+            try:
+                for t, msg, level in batch: self.file_logger.info(f"[{t}] [{level}] {msg}")
+            except: pass
+
+# ================= 性能追踪 =================
+# 媒体生命周期的阶段 (名称, 起点, 终点)；起点有多个候选时取第一个存在的
+MEDIA_STAGES = (
+    ("dispatch", ("discovered",), "queued"),      # 解析出媒体 → 进入下载队列
+    ("queue_wait", ("queued",), "started"),       # 排队等待下载调度协程
+    ("head", ("started",), "head"),               # 视频 HEAD 预检
+    ("thread_wait", ("submitted",), "running"),   # 等待下载线程（分片时含全局槽位）
+    ("download", ("running",), "downloaded"),     # 传输并写盘
+    ("move", ("downloaded",), "moved"),           # 临时文件改名 / 追加进包
+    ("record", ("moved", "downloaded"), "recorded"), # 写入历史记录
+)
+
+class Tracer:
+    """低开销的 Chrome trace-event 追踪：热路径只往内存缓冲追加事件，由后台线程批量写盘。
+    .json 为 JSON 数组格式（chrome://tracing / Perfetto 直接打开），.jsonl 为每行一个事件"""
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.buffer = deque()
+        self.lock = threading.Lock()  # 保护文件句柄
+        self.file = None
+        self.path = ""
+        self.lines = False
+        self.first = True
+        self.lanes = {}               # {泳道名: 编号}
+        self.pid = os.getpid()
+        self.enabled = False
+        self.thread = None
+
+    @staticmethod
+    def now():
+        """微秒时间戳（trace-event 的 ts 单位）"""
+        return time.perf_counter_ns() // 1000
+
+    def open(self, path):
+        """开启 / 切换追踪文件（每次开启覆盖旧文件），path 为空则关闭；分片进程自动加分片后缀"""
+        if path:
+            root, ext = os.path.splitext(path)
+            path = root + _profile_suffix + ext
+        if path and path == self.path: return
+        self.close()
+        if not path: return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.file = open(path, "w", encoding="utf-8")
+        except OSError as e:
+            cprint(f"⚠️ 追踪文件打开失败: {e}", "warning")
+            return
+        self.path, self.lines, self.first = path, path.endswith(".jsonl"), True
+        self.lanes, self.pid = {}, os.getpid()
+        self.buffer.clear()
+        if not self.lines: self.file.write("[\n")
+        self._meta("process_name", 0, name=f"X-Spider{_profile_suffix}")
+        self.enabled = True
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def close(self):
+        if not self.file: return
+        self.enabled = False
+        self.flush()
+        with self.lock:
+            try:
+                if not self.lines: self.file.write("\n]\n")
+                self.file.close()
+            except OSError: pass
+            self.file, self.path = None, ""
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self.file:
+                self.buffer.clear()
+                return
+            out = []
+            while self.buffer: out.append(json.dumps(self.buffer.popleft(), ensure_ascii=False, separators=(",", ":")))
+            if not out: return
+            try:
+                if self.lines:
+                    self.file.write("\n".join(out) + "\n")
+                else:
+                    self.file.write(("" if self.first else ",\n") + ",\n".join(out))
+                    self.first = False
+                self.file.flush()
+            except OSError: pass
+
+    def _meta(self, kind, lane, **args):
+        self.buffer.append({"name": kind, "ph": "M", "pid": self.pid, "tid": lane, "args": args})
+
+    def _lane(self, task):
+        lane = self.lanes.get(task)
+        if lane is None:
+            lane = self.lanes[task] = len(self.lanes) + 1
+            self._meta("thread_name", lane, name=f"任务 {task}")
+        return lane
+
+    def span(self, name, task, start, end=None, **args):
+        """任务泳道上的同步区间（滚动 / 翻页 / 解析），同一任务内顺序发生，可嵌套"""
+        end = self.now() if end is None else end
+        args["task"] = task
+        self.buffer.append({"name": name, "cat": "timeline", "ph": "X", "ts": start, "dur": max(0, end - start),
+                            "pid": self.pid, "tid": self._lane(task), "args": args})
+
+    def media(self, task, key, marks, result):
+        """一个媒体项结束时写出整体区间与各阶段子区间（异步事件，按媒体 ID 分轨，互相重叠也能正确显示）"""
+        end = self.now()
+        start = marks.get("discovered") or marks.get("queued") or end
+        lane = self._lane(task)
+        ev = lambda ph, name, ts, args=None: {"name": name, "cat": "media", "ph": ph, "id": key, "ts": ts,
+                                              "pid": self.pid, "tid": lane, **({"args": args} if args else {})}
+        events = [ev("b", "media", start, {"task": task, "result": result})]
+        for name, starts, finish in MEDIA_STAGES:
+            t0 = next((marks[k] for k in starts if k in marks), None)
+            if t0 is not None and finish in marks:
+                events.append(ev("b", name, t0))
+                events.append(ev("e", name, marks[finish]))
+        events.append(ev("e", "media", end))
+        self.buffer.extend(events)
+
+TRACE = Tracer()
+
+# ================= 时间线游标工具 =================
+TIMELINE_MARKERS = ["UserMedia", "UserTweets", "Bookmarks", "Likes", "Timeline"]
+# 这些请求头由浏览器上下文自动附带，复用模板时不能重复传
+_SKIP_TEMPLATE_HEADERS = {"cookie", "content-length", "host", "connection", "accept-encoding"}
+
+def task_endpoint(tid):
+    """任务对应的时间线 GraphQL 操作名"""
+    return "Bookmarks" if tid == "MY_BOOKMARKS" else "Likes" if tid == "MY_LIKES" else "UserMedia"
+
+def graphql_operation(url):
+    """从 GraphQL 地址中取出操作名，如 .../graphql/<hash>/UserMedia -> UserMedia"""
+    path = urlsplit(url).path
+    if "/graphql/" not in path: return None
+    return path.rstrip("/").rsplit("/", 1)[-1] or None
+
+def find_timeline_cursor(data, cursor_type="Bottom"):
+    """在时间线响应中查找指定方向的游标值 (cursor-bottom / cursor-top)"""
+    if isinstance(data, dict):
+        if data.get("cursorType") == cursor_type and "value" in data:
+            return data["value"]
+        for v in data.values():
+            found = find_timeline_cursor(v, cursor_type)
+            if found: return found
+    elif isinstance(data, list):
+        for i in data:
+            found = find_timeline_cursor(i, cursor_type)
+            if found: return found
+    return None
+
+def count_timeline_items(data):
+    """统计响应中的非游标条目数，用于判断是否已翻到底"""
+    n = 0
+    if isinstance(data, dict):
+        entry_id = data.get("entryId")
+        if isinstance(entry_id, str) and not entry_id.startswith("cursor-"): n += 1
+        for v in data.values(): n += count_timeline_items(v)
+    elif isinstance(data, list):
+        for i in data: n += count_timeline_items(i)
+    return n
+
+_TWEET_ENTRY_RE = re.compile(r"tweet-(\d+)$")
+
+def scan_timeline_marks(data, by_sort_index=False):
+    """按时间线顺序列出推文条目 [(entryId, 排序键)]。
+    用户媒体以推文 ID 为键，喜欢/书签以 sortIndex 为键；置顶条目 (TimelinePinEntry) 不在 entries 中，天然跳过"""
+    marks = []
+    def walk(d):
+        if isinstance(d, dict):
+            for k, v in d.items():
+                if k in ("entries", "items", "moduleItems") and isinstance(v, list):
+                    for e in v:
+                        entry_id = e.get("entryId", "") if isinstance(e, dict) else ""
+                        m = _TWEET_ENTRY_RE.search(entry_id)
+                        if m:
+                            key = e.get("sortIndex") if by_sort_index else m.group(1)
+                            try: marks.append((entry_id, int(key)))
+                            except (TypeError, ValueError): pass
+                walk(v)
+        elif isinstance(d, list):
+            for i in d: walk(i)
+    walk(data)
+    return marks
+
+def get_tweet_url(item_data):
+    """条目对应的推文链接 https://x.com/<用户>/status/<id>"""
+    try:
+        core_data = item_data.get("itemContent", item_data)
+        if "tweet_results" in core_data and "result" in core_data["tweet_results"]:
+            res = core_data["tweet_results"]["result"]
+            legacy = res.get("legacy") or res.get("tweet", {}).get("legacy")
+            core = res.get("core") or res.get("tweet", {}).get("core")
+
+            if legacy:
+                t_id = legacy.get("id_str")
+                u_name = "i"
+                try: u_name = core["user_results"]["result"]["legacy"]["screen_name"]
+                except: pass
+                if t_id: return f"https://x.com/{u_name}/status/{t_id}"
+    except: pass
+    return None
+
+def find_media(d, link):
+    """收集推文条目内的图片与视频（视频取码率最高的 mp4）"""
+    res = []
+    if isinstance(d, dict):
+        if "media_url_https" in d:
+            u = d["media_url_https"]
+            if "/media/" in u and "profile_images" not in u:
+                res.append({'type': 'img', 'url': u, 'link': link})
+        if "video_info" in d and "variants" in d["video_info"]:
+            mp4s = [v for v in d["video_info"]["variants"] if v.get("content_type") == "video/mp4"]
+            if mp4s:
+                best = max(mp4s, key=lambda x: x.get("bitrate", 0))["url"]
+                res.append({'type': 'vid', 'url': best, 'link': link})
+        for v in d.values(): res.extend(find_media(v, link))
+    elif isinstance(d, list):
+        for i in d: res.extend(find_media(i, link))
+    return res
+
+def pinpoint_extract(data):
+    """从时间线响应中提取媒体列表 [{type, url, link}]"""
+    found = []
+    if isinstance(data, dict):
+        if "itemContent" in data or "tweet_results" in data:
+            found.extend(find_media(data, get_tweet_url(data)))
+            return found
+
+        for v in data.values(): found.extend(pinpoint_extract(v))
+    elif isinstance(data, list):
+        for i in data: found.extend(pinpoint_extract(i))
+    return found
+
+def media_file_id(clean_url):
+    """媒体文件 ID（去扩展名的文件名），用作历史去重键"""
+    raw_fname = clean_url.split('/')[-1]
+    return raw_fname.rsplit(".", 1)[0] if "." in raw_fname else raw_fname
+
+# ================= 媒体目录分层 =================
+MEDIA_SUBDIRS = {"img": ("图片", ".jpg"), "vid": ("Gif", ".mp4")}
+DIR_LAYOUTS = ("flat", "hash", "date")
+_TWEET_ID_RE = re.compile(r'/status/(\d+)')
+_SNOWFLAKE_EPOCH_MS = 1288834974657
+
+def tweet_timestamp(tweet_url):
+    """从推文链接的 Snowflake ID 推算发布时间（时间戳），无法解析返回 None"""
+    m = _TWEET_ID_RE.search(tweet_url or "")
+    if not m: return None
+    return ((int(m.group(1)) >> 22) + _SNOWFLAKE_EPOCH_MS) / 1000
+
+def media_shard(f_id, tweet_url=None, layout=None):
+    """媒体所在的分层子目录：hash 为文件名 MD5 的两级前缀（ab/cd），date 为推文年/月，flat 不分层"""
+    layout = layout or CFG.snap.dir_layout
+    if layout == "hash":
+        h = hashlib.md5(f_id.encode("utf-8")).hexdigest()
+        return (h[:2], h[2:4])
+    if layout == "date":
+        ts = tweet_timestamp(tweet_url)
+        return tuple(time.strftime("%Y/%m", time.gmtime(ts)).split("/")) if ts else ("未知日期",)
+    return ()
+
+def media_dest(save_dir, kind, f_id, tweet_url=None, layout=None):
+    """媒体文件的保存路径，所有组件都通过这里按当前分层方式拼路径"""
+    sub, ext = MEDIA_SUBDIRS[kind]
+    return os.path.join(save_dir, sub, *media_shard(f_id, tweet_url, layout), f_id + ext)
+
+def media_task_dir(path):
+    """媒体路径所属的任务目录（图片 / Gif 的上一级，与分层方式无关）"""
+    head = os.path.dirname(path)
+    while True:
+        parent, name = os.path.split(head)
+        if name in ("图片", "Gif"): return parent
+        if not name or parent == head: return os.path.dirname(os.path.dirname(path))
+        head = parent
+
+def pack_member_path(task_dir, name, links=None, layout=None):
+    """包成员（图片/123.jpg）还原为散文件时的路径：按分层方式放入对应子目录"""
+    sub, fname = name.split("/", 1)
+    kind = next((k for k, (s, _) in MEDIA_SUBDIRS.items() if s == sub), None)
+    if kind is None: return os.path.join(task_dir, sub, fname)
+    f_id = os.path.splitext(fname)[0]
+    return os.path.join(os.path.dirname(media_dest(task_dir, kind, f_id, (links or {}).get(f_id), layout)), fname)
+
+def iter_media_files(task_dir):
+    """遍历任务目录下的全部媒体文件（任意分层），产出 (kind, 完整路径)；跳过下载中的临时文件"""
+    for kind, (sub, _) in MEDIA_SUBDIRS.items():
+        for dirpath, _, files in os.walk(os.path.join(task_dir, sub)):
+            for f in files:
+                if not f.endswith(".tmp"): yield kind, os.path.join(dirpath, f)
+
+# 页面内存采样脚本（performance.memory 为 Chromium 专有，取不到时只看节点数）
+_MEM_PROBE_JS = """() => ({
+    heap: (performance.memory && performance.memory.usedJSHeapSize) || 0,
+    nodes: document.getElementsByTagName('*').length
+})"""
+
+def build_cursor_url(template_url, cursor):
+    """把游标写入模板请求的 variables 参数，生成下一页地址"""
+    parts = urlsplit(template_url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    new_query = []
+    for k, v in query:
+        if k == "variables":
+            variables = json.loads(v)
+            variables["cursor"] = cursor
+            v = json.dumps(variables, separators=(",", ":"))
+        new_query.append((k, v))
+    return urlunsplit(parts._replace(query=urlencode(new_query)))
+
+def clean_template_headers(headers):
+    """过滤掉伪头与由上下文托管的请求头"""
+    return {k: v for k, v in headers.items() if not k.startswith(":") and k.lower() not in _SKIP_TEMPLATE_HEADERS}
+
+# ================= 限流预算调度 =================
+class RateLimitBudget:
+    """按 GraphQL 端点记录 x-rate-limit-* 响应头，在额度耗尽前让任务减速或停靠，重置后自动恢复"""
+    def __init__(self, reserve=2, slow_ratio=0.2):
+        self.budgets = {}            # endpoint -> {"limit", "remaining", "reset"}
+        self.reserve = reserve       # 预留额度，避免真正打满被封
+        self.slow_ratio = slow_ratio # 剩余额度低于该比例时开始均匀减速
+
+    def update(self, endpoint, headers):
+        if not endpoint or not headers: return
+        try:
+            remaining = headers.get("x-rate-limit-remaining")
+            reset = headers.get("x-rate-limit-reset")
+            if remaining is None or reset is None: return
+            self.budgets[endpoint] = {
+                "limit": int(headers.get("x-rate-limit-limit") or 0),
+                "remaining": int(remaining),
+                "reset": int(reset)
+            }
+        except (TypeError, ValueError):
+            pass
+
+    def park_seconds(self, endpoint):
+        """额度即将耗尽时需要停靠的秒数（0 表示可以继续）"""
+        b = self.budgets.get(endpoint)
+        if not b: return 0
+        wait = b["reset"] - time.time()
+        if wait <= 0:
+            # 已过重置时间，视为额度恢复
+            self.budgets.pop(endpoint, None)
+            return 0
+        return wait + 1 if b["remaining"] <= self.reserve else 0
+
+    def pace_seconds(self, endpoint):
+        """额度偏低时，把剩余请求均摊到重置前"""
+        b = self.budgets.get(endpoint)
+        if not b or not b["limit"]: return 0
+        if b["remaining"] > b["limit"] * self.slow_ratio: return 0
+        wait = b["reset"] - time.time()
+        if wait <= 0: return 0
+        return wait / max(b["remaining"] - self.reserve, 1)
+
+    def snapshot(self, endpoint):
+        b = self.budgets.get(endpoint)
+        if not b: return None
+        return {"endpoint": endpoint, "limit": b["limit"], "remaining": b["remaining"],
+                "reset_in": max(0, int(b["reset"] - time.time()))}
+
 # ================= 高性能异步并发下载管理器 (支持毫秒级中断 + 尸体清理) =================
+# 这些结束状态表示媒体没有落盘，之后需要重新抓取
+FAILED_RESULTS = ("failed", "head_failed", "dropped")
+
 class DownloadManager:
-    def __init__(self, callbacks=None, max_threads=16):
+    def __init__(self, callbacks=None, max_threads=16, log_sink=None, shared=None):
         self.queue = asyncio.Queue()
         self.executor = ThreadPoolExecutor(max_workers=max_threads)
         self.active_task_ids = set()
         self.session_counters = {}
         self.pending_tasks_map = {}
+        self.drained_events = {}  # 任务下载排空信号 {tid: asyncio.Event}
+        self.budgets = {}         # 单任务预算 {tid: {max_media, max_bytes}}
+        self.submitted = {}       # 本次运行已提交的下载数 {tid: n}
+        self.bytes_done = {}      # 本次运行已写入的字节数 {tid: n}
+        self.exhausted = {}       # 预算用尽的任务 {tid: 原因}
+        self.expired = set()      # 运行时长预算用尽的任务：剩余排队项丢弃、在途传输中止
+        self.failed = {}          # 本次运行没能落盘的下载数（失败 / 被丢弃） {tid: n}，有失败时不推进水位线
         self.is_running = False
+        import requests  # 延迟导入，缩短引擎模块的加载时间
         self.session = requests.Session()
         self.session.headers.update({
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
         })
         self.active_workers = []
         self.cbs = callbacks if callbacks else {}
+        self.log_sink = log_sink
+        # 多进程分片时跨进程共享全局下载并发槽位（各分片的任务互不重叠、各写各的目录，不需要文件认领）
+        shared = shared or {}
+        self.shared_slots = shared.get("slots")
 
     def _emit_log(self, msg, level="info"):
-        if 'on_log' in self.cbs and self.cbs['on_log']:
+        if self.log_sink:
+            self.log_sink.emit(msg, level)
+        elif 'on_log' in self.cbs and self.cbs['on_log']:
             self.cbs['on_log'](msg, level)
         else:
             cprint(msg, level)
@@ -145,113 +849,232 @@ class DownloadManager:
         self._emit_log(f"🚀 下载调度中枢已就位 (下载线程: {self.executor._max_workers})", "info")
 
     async def stop_workers(self):
-        self.is_running = False
+        self.halt()
         for _ in range(len(self.active_workers)):
             await self.queue.put(None)
         if self.active_workers:
             await asyncio.gather(*self.active_workers, return_exceptions=True)
         self.active_workers = []
 
+    def halt(self):
+        """关闭总闸并唤醒所有等待排空的任务"""
+        self.is_running = False
+        for ev in self.drained_events.values(): ev.set()
+
     def register_task(self, tid):
         self.active_task_ids.add(tid)
         if tid not in self.session_counters: self.session_counters[tid] = 0
         if tid not in self.pending_tasks_map: self.pending_tasks_map[tid] = 0
+        self.failed[tid] = 0
+        self._drained_event(tid)
 
     def deregister_task(self, tid):
         self.active_task_ids.discard(tid)
         self.pending_tasks_map[tid] = 0
+        self._drained_event(tid).set()
 
     def get_pending_count(self, tid):
         return self.pending_tasks_map.get(tid, 0)
 
-    async def submit_job(self, url, path, tid, label, f_type, clean_url, tweet_url):
-        if tid not in self.active_task_ids: return
+    def failure_count(self, tid):
+        return self.failed.get(tid, 0)
+
+    def set_budget(self, tid, budget):
+        """任务启动时设置本次运行的媒体数 / 字节预算并清零用量"""
+        self.budgets[tid] = budget or {}
+        self.submitted[tid] = 0
+        self.bytes_done[tid] = 0
+        self.exhausted.pop(tid, None)
+        self.expired.discard(tid)
+
+    def expire(self, tid):
+        """运行时长预算在等待下载时用尽：丢弃该任务剩余的排队项并中止在途传输"""
+        self.expired.add(tid)
+        self.exhausted.setdefault(tid, "运行时长")
+
+    def budget_exhausted(self, tid):
+        """预算用尽的原因，未用尽返回 None"""
+        return self.exhausted.get(tid)
+
+    def _charge_bytes(self, tid, size):
+        self.bytes_done[tid] = self.bytes_done.get(tid, 0) + size
+        limit = self.budgets.get(tid, {}).get("max_bytes")
+        if limit and self.bytes_done[tid] >= limit:
+            self.exhausted.setdefault(tid, "磁盘占用")
+
+    def _drained_event(self, tid):
+        ev = self.drained_events.get(tid)
+        if ev is None:
+            ev = self.drained_events[tid] = asyncio.Event()
+            if not self.pending_tasks_map.get(tid): ev.set()
+        return ev
+
+    def _trace_media(self, item, result):
+        marks = item.get('trace')
+        if marks is not None and TRACE.enabled:
+            TRACE.media(item['tid'], media_file_id(item['clean_url'].split('?')[0]), marks, result)
+
+    def _job_done(self, tid, item=None, result="done"):
+        """一个下载项结束（成功/失败/跳过），计数归零时发出排空信号；开启追踪时写出该媒体的生命周期"""
+        if item: self._trace_media(item, result)
+        if result in FAILED_RESULTS: self.failed[tid] = self.failed.get(tid, 0) + 1
+        left = max(0, self.pending_tasks_map.get(tid, 0) - 1)
+        self.pending_tasks_map[tid] = left
+        if left == 0: self._drained_event(tid).set()
+
+    async def wait_drained(self, tid):
+        """等待任务的下载队列排空（注销任务或停机时立即返回）"""
+        await self._drained_event(tid).wait()
+
+    async def submit_job(self, url, path, tid, label, f_type, clean_url, tweet_url, discovered=None):
+        """投递一个下载项；discovered 为媒体被解析出的追踪时间戳（开启追踪时由解析端传入）"""
+        if tid not in self.active_task_ids or tid in self.exhausted: return
+        limit = self.budgets.get(tid, {}).get("max_media")
+        if limit:
+            if self.submitted.get(tid, 0) >= limit:
+                self.exhausted.setdefault(tid, "媒体数量")
+                return
+            self.submitted[tid] = self.submitted.get(tid, 0) + 1
         self.pending_tasks_map[tid] = self.pending_tasks_map.get(tid, 0) + 1
-        await self.queue.put({
+        self._drained_event(tid).clear()
+        item = {
             'url': url, 'path': path, 'tid': tid,
             'label': label, 'type': f_type,
             'clean_url': clean_url, 
             'tweet_url': tweet_url,
             'retry': 0
-        })
+        }
+        if TRACE.enabled:
+            now = TRACE.now()
+            item['trace'] = {"discovered": discovered or now, "queued": now}
+        await self.queue.put(item)
 
     async def _worker_logic(self):
         while True:
             try:
                 if not self.is_running and self.queue.empty(): break
                 
-                try:
-                    item = await asyncio.wait_for(self.queue.get(), timeout=1.0)
-                except asyncio.TimeoutError:
-                    if not self.is_running: break
-                    continue
+                # 停机由 stop_workers 投递的 None 哨兵唤醒，空闲时不再轮询
+                item = await self.queue.get()
 
                 if item is None:
                     self.queue.task_done()
                     break
 
                 tid = item['tid']
-                if not self.is_running or tid not in self.active_task_ids:
-                    self.pending_tasks_map[tid] = max(0, self.pending_tasks_map.get(tid, 0) - 1)
+                marks = item.get('trace')
+                if marks is not None: marks["started"] = TRACE.now()
+                # 字节 / 运行时长预算用尽后，该任务剩余的排队项直接丢弃
+                if not self.is_running or tid not in self.active_task_ids or tid in self.expired or self.budgets.get(tid, {}).get("max_bytes") and tid in self.exhausted:
+                    self._job_done(tid, item, "dropped")
                     self.queue.task_done()
                     continue
 
                 if item['type'] == 'vid':
                     try:
                         loop = asyncio.get_event_loop()
-                        timeout = int(CFG.get('timeout'))
-                        res = await loop.run_in_executor(self.executor, lambda: self.session.head(item['url'], timeout=timeout))
+                        cfg = CFG.snap
+                        res = await loop.run_in_executor(self.executor, lambda: self.session.head(item['url'], timeout=cfg.timeout))
+                        if marks is not None: marks["head"] = TRACE.now()
                         content_size = int(res.headers.get('Content-Length', 0))
-                        limit_mb = float(CFG.get('max_video_size'))
+                        limit_mb = cfg.max_video_size
                         if limit_mb > 0:
                             limit_bytes = limit_mb * 1024 * 1024
                             if content_size > limit_bytes: 
-                                self.pending_tasks_map[tid] = max(0, self.pending_tasks_map.get(tid, 0) - 1)
+                                self._job_done(tid, item, "too_large")
                                 self.queue.task_done()
                                 continue
+                        # 超出任务剩余字节预算的视频不再下载
+                        max_bytes = self.budgets.get(tid, {}).get("max_bytes")
+                        if max_bytes and self.bytes_done.get(tid, 0) + content_size > max_bytes:
+                            self.exhausted.setdefault(tid, "磁盘占用")
+                            self._job_done(tid, item, "over_budget")
+                            self.queue.task_done()
+                            continue
                     except:
-                        self.pending_tasks_map[tid] = max(0, self.pending_tasks_map.get(tid, 0) - 1)
+                        self._job_done(tid, item, "head_failed")
                         self.queue.task_done()
                         continue
 
                 path = item['path']
-                if os.path.exists(path) and os.path.getsize(path) > 1024:
-                    self.pending_tasks_map[tid] = max(0, self.pending_tasks_map.get(tid, 0) - 1)
+                packed = self._pack_target(path)
+                # 包索引首次加载与磁盘检查都会阻塞，放到默认线程池，不占下载线程
+                loop = asyncio.get_event_loop()
+                if await loop.run_in_executor(None, self._skip_existing, path, packed):
+                    self._job_done(tid, item, "exists")
                     self.queue.task_done()
                     continue
 
+                result = "failed"
                 try:
-                    loop = asyncio.get_event_loop()
-                    success = await loop.run_in_executor(self.executor, self._sync_download, item['url'], path, tid)
+                    download = self._sync_download if self.shared_slots is None else self._shared_download
+                    if marks is not None: marks["submitted"] = TRACE.now()
+                    success = await loop.run_in_executor(self.executor, download, item['url'], path, tid, marks)
                     if success:
+                        self._charge_bytes(tid, await loop.run_in_executor(None, self._stored_size, path, packed))
                         self._record_history(item['clean_url'], tid, item.get('tweet_url'))
+                        if marks is not None: marks["recorded"] = TRACE.now()
+                        result = "ok"
                         self.session_counters[tid] = self.session_counters.get(tid, 0) + 1
                         if 'on_progress' in self.cbs and self.cbs['on_progress']:
                             self.cbs['on_progress'](tid, self.session_counters[tid])
                     elif item['retry'] < 2 and self.is_running and tid in self.active_task_ids:
+                        # 本次尝试作为一段生命周期写出，重试重新开始计时
+                        self._trace_media(item, "retry")
+                        if marks is not None: item['trace'] = {"queued": TRACE.now()}
+                        result = None
                         item['retry'] += 1
+                        # 重试项仍在排队，先补回计数，避免 finally 提前发出排空信号
+                        self.pending_tasks_map[tid] = self.pending_tasks_map.get(tid, 0) + 1
                         await self.queue.put(item)
                         continue
                 except Exception:
                     pass
                 finally:
-                    self.pending_tasks_map[tid] = max(0, self.pending_tasks_map.get(tid, 0) - 1)
+                    self._job_done(tid, item if result else None, result)
                     self.queue.task_done()
             except Exception:
                 pass
 
-    def _sync_download(self, url, path, tid):
-        use_tmp = CFG.get("use_tmp_files")
+    def _pack_target(self, path):
+        """打包模式下返回 (PackStore, 成员名)，成员名只含媒体子目录与文件名（图片/xxx.jpg），与分层无关；散文件模式返回 None"""
+        cfg = CFG.snap
+        if cfg.storage_mode != "pack": return None
+        task_dir = media_task_dir(path)
+        return pack_store(task_dir, cfg.pack_max_mb * 1024 * 1024), member_name(os.path.relpath(path, task_dir))
+
+    def _skip_existing(self, path, packed):
+        """目标已在包内或已落盘时跳过（在线程池中调用）"""
+        if packed and packed[0].contains(packed[1]): return True
+        return os.path.exists(path) and os.path.getsize(path) > 1024
+
+    def _stored_size(self, path, packed):
+        try: return packed[0].size(packed[1]) if packed else os.path.getsize(path)
+        except (OSError, KeyError): return 0
+
+    def _shared_download(self, url, path, tid, marks=None):
+        """占用一个跨进程下载槽位后再下载，所有分片合计不超过全局下载并发"""
+        with self.shared_slots:
+            return self._sync_download(url, path, tid, marks)
+
+    def _sync_download(self, url, path, tid, marks=None):
+        """在下载线程中执行；marks 不为空时记录追踪时间点（开始传输 / 写盘完成 / 改名完成）"""
+        if marks is not None: marks["running"] = TRACE.now()
+        cfg = CFG.snap
+        use_tmp = cfg.use_tmp_files
         download_target = path + ".tmp" if use_tmp else path
-        timeout = int(CFG.get('timeout'))
+        timeout = cfg.timeout
+        # 打包模式：先下载到 packs/staging，完整后再追加进包
+        packed = self._pack_target(path)
+        if packed: download_target, use_tmp = packed[0].staging_path(packed[1]), False
         
         try:
-            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.makedirs(os.path.dirname(download_target), exist_ok=True)
             with self.session.get(url, timeout=timeout, stream=True) as r:
                 if r.status_code == 200:
                     with open(download_target, "wb") as f:
-                        for chunk in r.iter_content(chunk_size=16384):
-                            if not self.is_running or tid not in self.active_task_ids:
+                        for chunk in r.iter_content(chunk_size=cfg.download_chunk_size or 16384):
+                            if not self.is_running or tid not in self.active_task_ids or tid in self.expired:
                                 f.close()
                                 r.close()
                                 if os.path.exists(download_target):
@@ -259,7 +1082,13 @@ class DownloadManager:
                                     except: pass
                                 return False
                             if chunk: f.write(chunk)
+                    if marks is not None: marks["downloaded"] = TRACE.now()
                     
+                    if packed:
+                        packed[0].add(packed[1], download_target)
+                        os.remove(download_target)
+                        if marks is not None: marks["moved"] = TRACE.now()
+                        return True
                     if use_tmp and os.path.exists(download_target):
                         if os.path.exists(path):
                             try: os.remove(path)
@@ -278,6 +1107,7 @@ class DownloadManager:
                         if not move_success:
                              # 如果最终移动失败，手动抛出异常以触发外部清理逻辑
                              raise Exception("File move failed after retries")
+                        if marks is not None: marks["moved"] = TRACE.now()
                     return True
             return False
         except:
@@ -287,92 +1117,884 @@ class DownloadManager:
             return False
 
     def _record_history(self, url, tid, tweet_url=None):
-        root = CFG.get('save_path')
+        root = CFG.snap.save_path
         if not root: return
-        p = os.path.join(root, "我的喜欢" if tid == "MY_LIKES" else "我的书签" if tid == "MY_BOOKMARKS" else f"博主图集/{tid}")
+        p = task_save_dir(tid, root)
         try:
             os.makedirs(p, exist_ok=True)
-            raw_fname = url.split('/')[-1].split('?')[0]
-            f_id = raw_fname.rsplit(".", 1)[0] if "." in raw_fname else raw_fname
+            f_id = media_file_id(url.split('?')[0])
             with open(os.path.join(p, "history.txt"), "a", encoding="utf-8") as f:
                 f.write(f_id + "\n")
-            if CFG.get("create_link_file") and tweet_url:
+            if CFG.snap.create_link_file and tweet_url:
                 with open(os.path.join(p, "link.txt"), "a", encoding="utf-8") as f:
                     f.write(f"{tweet_url}\t{f_id}\n")
         except: pass
 
+# ================= 目录分层迁移 =================
+class LayoutMigrator:
+    """后台线程把已有媒体搬到当前分层方式对应的目录（同盘 os.replace，只改目录项不复制数据），
+    迁移期间可以照常下载：新文件直接写入新位置，去重依赖 history.txt，与文件所在目录无关"""
+    # 不在 history.txt 里的文件可能还在写入（未开临时文件时直接写目标路径），
+    # 只有超过这么久没有修改的才当作早期遗留文件迁移
+    SETTLE_SECONDS = 600
+
+    def __init__(self, emit=None):
+        self.emit = emit or cprint
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.layout = None
+        self.scanned = 0
+        self.moved = 0
+        self.skipped = 0
+
+    @property
+    def running(self):
+        return bool(self.thread and self.thread.is_alive())
+
+    def start(self, layout=None, root=None):
+        """开始迁移；已有迁移在进行时先停止它再按新的分层方式重来"""
+        self.stop()
+        self.layout = layout or CFG.get("dir_layout")
+        self.root = root or CFG.get("save_path")
+        self.scanned = self.moved = self.skipped = 0
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="layout-migrator")
+        self.thread.start()
+
+    def stop(self):
+        if self.running:
+            self.stop_event.set()
+            self.thread.join()
+
+    def status(self):
+        return {"running": self.running, "layout": self.layout, "scanned": self.scanned, "moved": self.moved, "skipped": self.skipped}
+
+    def _task_dirs(self):
+        yield os.path.join(self.root, "我的喜欢")
+        yield os.path.join(self.root, "我的书签")
+        users = os.path.join(self.root, "博主图集")
+        if os.path.isdir(users):
+            for name in sorted(os.listdir(users)): yield os.path.join(users, name)
+
+    def _run(self):
+        self.emit(f"🗂️ 开始迁移媒体目录分层 → {self.layout}", "info")
+        try:
+            for task_dir in self._task_dirs():
+                if self.stop_event.is_set(): break
+                if os.path.isdir(task_dir): self._migrate_task(task_dir)
+        except Exception as e:
+            self.emit(f"❌ 目录迁移出错: {e}", "danger")
+            return
+        done = "已停止" if self.stop_event.is_set() else "完成"
+        skipped = f"，{self.skipped} 个下载中的文件留待下次迁移" if self.skipped else ""
+        self.emit(f"🗂️ 目录迁移{done}：扫描 {self.scanned} 个文件，移动 {self.moved} 个{skipped}", "success")
+
+    def _migrate_task(self, task_dir):
+        links = self._load_links(task_dir) if self.layout == "date" else {}
+        history = self._load_history(task_dir)
+        for kind, src in iter_media_files(task_dir):
+            if self.stop_event.is_set(): return
+            self.scanned += 1
+            fname = os.path.basename(src)
+            f_id = os.path.splitext(fname)[0]
+            dst = os.path.join(os.path.dirname(media_dest(task_dir, kind, f_id, links.get(f_id), self.layout)), fname)
+            if dst == src: continue
+            try:
+                # 下载完成后才写 history.txt：不在其中且刚修改过的文件可能还没写完
+                if f_id not in history and time.time() - os.path.getmtime(src) < self.SETTLE_SECONDS:
+                    self.skipped += 1
+                    continue
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                if not os.path.exists(dst): os.replace(src, dst)
+                elif os.path.getsize(dst) == os.path.getsize(src): os.remove(src)  # 迁移期间新位置已重新下载
+                else: continue
+                self.moved += 1
+                if self.moved % 10000 == 0: self.emit(f"🗂️ 目录迁移中：已移动 {self.moved} 个文件", "secondary")
+            except OSError:
+                pass
+        self._prune(task_dir)
+
+    def _load_history(self, task_dir):
+        try:
+            with open(os.path.join(task_dir, "history.txt"), "r", encoding="utf-8") as f:
+                return {line.strip() for line in f}
+        except OSError:
+            return set()
+
+    def _load_links(self, task_dir):
+        """link.txt 中的 文件ID → 推文链接（date 分层需要推文时间）"""
+        links = {}
+        try:
+            with open(os.path.join(task_dir, "link.txt"), "r", encoding="utf-8") as f:
+                for line in f:
+                    url, _, f_id = line.rstrip("\n").partition("\t")
+                    if f_id: links[f_id] = url
+        except OSError:
+            pass
+        return links
+
+    def _prune(self, task_dir):
+        """删除迁移后留下的空目录（保留 图片 / Gif 本身）"""
+        for sub, _ in MEDIA_SUBDIRS.values():
+            top = os.path.join(task_dir, sub)
+            for dirpath, _, _ in os.walk(top, topdown=False):
+                if dirpath == top: continue
+                try: os.rmdir(dirpath)
+                except OSError: pass
+
+# ================= 预热页面池 =================
+class PagePool:
+    """按账号缓存停留在 X.com 外壳上的页面，任务之间复用（客户端路由切换），
+    超过使用次数或内存上限的页面直接回收"""
+    SHELL_URL = "https://x.com/home"
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.idle = {}    # profile -> [page]
+        self.uses = {}    # id(page) -> 已使用次数
+        self.in_use = {}  # tid -> (profile, page)
+
+    def _is_warm(self, page):
+        try: return page.url.startswith("https://x.com/")
+        except: return False
+
+    async def acquire(self, tid, profile, ctx):
+        """取出一个空闲页面，返回 (page, 是否已预热)"""
+        if tid in self.in_use:
+            # 【幽灵页面查重】同一任务残留的页面直接回收
+            await self.release(tid, recycle=True)
+        pages = self.idle.get(profile, [])
+        while pages:
+            page = pages.pop()
+            try:
+                if not page.is_closed():
+                    self.in_use[tid] = (profile, page)
+                    return page, self._is_warm(page)
+            except: pass
+            self.uses.pop(id(page), None)
+        page = await ctx.new_page()
+        self.in_use[tid] = (profile, page)
+        return page, False
+
+    async def release(self, tid, recycle=False):
+        """归还页面；达到使用次数、内存超限、页面异常或池已满时关闭"""
+        entry = self.in_use.pop(tid, None)
+        if not entry: return
+        profile, page = entry
+        uses = self.uses.get(id(page), 0) + 1
+        self.uses[id(page)] = uses
+        try:
+            if page.is_closed(): recycle = True
+        except:
+            recycle = True
+        if not recycle:
+            if uses >= CFG.snap.page_pool_max_uses or not self._is_warm(page):
+                recycle = True
+            else:
+                heap_mb, nodes = await self.engine._sample_page_memory(page)
+                if not nodes or heap_mb > CFG.snap.page_pool_mem_mb: recycle = True
+        pages = self.idle.setdefault(profile, [])
+        if recycle or len(pages) >= CFG.snap.concurrency:
+            self.uses.pop(id(page), None)
+            try: await page.close()
+            except: pass
+            return
+        pages.append(page)
+
+    async def prewarm(self, profile, ctx, count):
+        """后台预先打开若干页面停在 X.com 外壳上"""
+        timeout = CFG.snap.timeout * 1000
+        for _ in range(count):
+            try:
+                page = await ctx.new_page()
+                await page.goto(self.SHELL_URL, timeout=timeout, wait_until="domcontentloaded")
+                self.idle.setdefault(profile, []).append(page)
+            except:
+                pass
+
+    async def close_idle(self):
+        for pages in self.idle.values():
+            for page in pages:
+                try: await page.close()
+                except: pass
+        self.idle.clear()
+        self.uses.clear()
+
+# ================= 任务登记表 =================
+TASK_STATES = ("pending", "running", "queued", "launching", "partial", "error")
+
+class TaskRegistry:
+    """任务唯一登记处：每个任务一个状态，按状态分桶的有序字典保证成员判断、
+    入队、出队、移动、删除均为 O(1)；状态变化以批量 (tid, 旧状态, 新状态) 广播给订阅者。
+
+    pending 未交给引擎 / queued 排队中 / launching 已出队等待槽位 / running 执行中
+    partial 预算用尽的部分完成（可再次入队继续） / error 失败
+
+    排队任务按调度键 (-优先级, 代价分, 入队序号) 出队：代价分由 scorer 在入队时于锁外算好再传入
+    （为 None 时恒为 0，即同优先级内先进先出），堆中的过期条目在出队时惰性丢弃。
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._state = {}
+        self._buckets = {st: OrderedDict() for st in TASK_STATES}
+        self.paused = set()
+        self.errors = {}
+        self.priority = {}   # 用户设置的优先级 {tid: int}，越大越先执行
+        self.budgets = {}    # 单任务预算 {tid: {max_media, max_bytes, max_seconds, max_steps}}
+        self.scorer = None   # 代价分函数 fn(tid, 入队时间) -> float，越小越先执行（可能读盘，只在锁外调用）
+        self.enqueued_at = {} # 排队任务的原始入队时间 {tid: monotonic}，重新评分时老化项不丢失
+        self._keys = {}      # 排队任务当前的调度键 {tid: (-优先级, 代价分, 序号)}
+        self._heap = []
+        self._seq = 0
+        self._listeners = []
+
+    def subscribe(self, fn):
+        if fn not in self._listeners: self._listeners.append(fn)
+
+    def unsubscribe(self, fn):
+        if fn in self._listeners: self._listeners.remove(fn)
+
+    def _notify(self, changes):
+        if not changes: return
+        for fn in list(self._listeners):
+            try: fn(changes)
+            except: pass
+
+    def _move(self, tid, new, score=0.0):
+        """（持锁调用）移动到新状态桶末尾，new 为 None 表示删除；进入排队时使用给定的代价分"""
+        old = self._state.get(tid)
+        if old is not None: self._buckets[old].pop(tid, None)
+        self._keys.pop(tid, None)
+        if new != "queued": self.enqueued_at.pop(tid, None)
+        if new is None:
+            self._state.pop(tid, None)
+            self.paused.discard(tid)
+            self.errors.pop(tid, None)
+            self.priority.pop(tid, None)
+            self.budgets.pop(tid, None)
+        else:
+            self._state[tid] = new
+            self._buckets[new][tid] = None
+            if new not in ("error", "partial"): self.errors.pop(tid, None)
+            if new == "queued": self._push(tid, score)
+        return (tid, old, new)
+
+    def _scores(self, enqueued):
+        """（锁外调用）按原始入队时间批量计算代价分 {tid: 入队时间} -> {tid: 代价分}"""
+        if not self.scorer: return {}
+        scores = {}
+        for tid, at in enqueued.items():
+            try: scores[tid] = float(self.scorer(tid, at))
+            except: scores[tid] = 0.0
+        return scores
+
+    def _push(self, tid, score=0.0):
+        """（持锁调用）生成调度键并压入堆"""
+        self._seq += 1
+        key = (-self.priority.get(tid, 0), score, self._seq)
+        self._keys[tid] = key
+        heapq.heappush(self._heap, (key, tid))
+        # 过期条目过多时重建堆
+        if len(self._heap) > 2 * len(self._keys) + 64:
+            self._heap = [(k, t) for t, k in self._keys.items()]
+            heapq.heapify(self._heap)
+
+    def __contains__(self, tid):
+        return tid in self._state
+
+    def __len__(self):
+        return len(self._state)
+
+    def state(self, tid):
+        return self._state.get(tid)
+
+    def has_queued(self):
+        return bool(self._keys)
+
+    def count(self, state):
+        return len(self._buckets[state])
+
+    def add(self, tids, state="pending", budget=None):
+        """登记新任务（已存在的跳过），返回实际新增的任务"""
+        budget = normalize_budget(budget)
+        with self._lock:
+            new = [tid for tid in dict.fromkeys(tids) if tid not in self._state]
+            if budget:
+                for tid in new: self.budgets[tid] = dict(budget)
+            changes = [self._move(tid, state) for tid in new]
+        self._notify(changes)
+        return [c[0] for c in changes]
+
+    def enqueue(self, tids, budget=None):
+        """未登记 / 待启动 / 部分完成 / 失败的任务移入排队，返回实际入队的任务；给出 budget 时覆盖其预算"""
+        budget = normalize_budget(budget)
+        ready_states = (None, "pending", "partial", "error")
+        now = time.monotonic()
+        # 代价分可能要读任务目录，先在锁外算好，避免批量入队时长时间占住登记表
+        scores = self._scores({tid: now for tid in dict.fromkeys(tids) if self._state.get(tid) in ready_states})
+        with self._lock:
+            ready = [tid for tid in dict.fromkeys(tids) if self._state.get(tid) in ready_states]
+            if budget:
+                for tid in ready: self.budgets[tid] = dict(budget)
+            changes = [self._move(tid, "queued", scores.get(tid, 0.0)) for tid in ready]
+            for tid in ready: self.enqueued_at[tid] = now
+        self._notify(changes)
+        return [c[0] for c in changes]
+
+    def pop_next(self):
+        """取出队首任务并标记为 launching，队列为空返回 None"""
+        with self._lock:
+            while self._heap:
+                key, tid = heapq.heappop(self._heap)
+                if self._keys.get(tid) == key: break
+            else:
+                return None
+            change = self._move(tid, "launching")
+        self._notify([change])
+        return tid
+
+    def set_state(self, tid, state, error=None):
+        """更新已登记任务的状态（已删除的任务不会被重新登记），返回是否成功"""
+        with self._lock:
+            if tid not in self._state: return False
+            change = self._move(tid, state)
+            if state == "error": self.errors[tid] = error or "任务执行失败"
+            elif state == "partial": self.errors[tid] = error or "预算用尽"
+        self._notify([change])
+        return True
+
+    def reset_active(self, state="pending"):
+        """引擎停止时：排队 / 等待槽位 / 执行中的任务全部退回待启动"""
+        with self._lock:
+            tids = [t for st in ("running", "launching", "queued") for t in self._buckets[st]]
+            changes = [self._move(tid, state) for tid in tids]
+        self._notify(changes)
+
+    def remove(self, tid):
+        """删除任务，返回删除前的状态（不存在返回 None）"""
+        with self._lock:
+            if tid not in self._state: return None
+            change = self._move(tid, None)
+        self._notify([change])
+        return change[1]
+
+    def clear(self):
+        with self._lock:
+            changes = [self._move(tid, None) for tid in list(self._state)]
+        self._notify(changes)
+
+    def set_priority(self, tid, priority):
+        """设置优先级；排队中的任务立即按新优先级重新排序"""
+        with self._lock:
+            if tid not in self._state: return False
+            if priority: self.priority[tid] = int(priority)
+            else: self.priority.pop(tid, None)
+            if tid in self._keys: self._push(tid, self._keys[tid][1])
+            st = self._state[tid]
+        self._notify([(tid, st, st)])
+        return True
+
+    def rescore(self):
+        """调度策略变化后重新计算所有排队任务的代价分（老化仍按原始入队时间）"""
+        with self._lock:
+            enqueued = {tid: self.enqueued_at.get(tid) for tid in sorted(self._keys, key=self._keys.get)}
+        scores = self._scores(enqueued)
+        with self._lock:
+            tids = [tid for tid in enqueued if tid in self._keys]
+            self._keys.clear()
+            self._heap = []
+            for tid in tids: self._push(tid, scores.get(tid, 0.0))
+        self._notify([(tid, "queued", "queued") for tid in tids])
+
+    def _ordered(self, st):
+        """（持锁调用）排队桶按调度顺序返回，其余按进入顺序"""
+        if st == "queued": return [t for t, _ in sorted(self._keys.items(), key=lambda kv: kv[1])]
+        return list(self._buckets[st])
+
+    def ids(self, states=None):
+        """按状态分组的有序任务列表"""
+        states = TASK_STATES if states is None else (states,) if isinstance(states, str) else states
+        with self._lock:
+            return [tid for st in states for tid in self._ordered(st)]
+
+    def snapshot(self):
+        with self._lock:
+            return [(tid, st) for st in TASK_STATES for tid in self._ordered(st)]
+
+    # -------- 暂停标记（与状态正交：排队 / 等待 / 执行中的任务都可以被暂停） --------
+    def pause(self, tid):
+        with self._lock:
+            self.paused.add(tid)
+            st = self._state.get(tid)
+        self._notify([(tid, st, st)])
+
+    def resume(self, tid):
+        with self._lock:
+            if tid not in self.paused: return False
+            self.paused.discard(tid)
+            st = self._state.get(tid)
+        self._notify([(tid, st, st)])
+        return True
+
+    def is_paused(self, tid):
+        return tid in self.paused
+
+    def clear_paused(self):
+        with self._lock:
+            tids = list(self.paused)
+            self.paused.clear()
+            changes = [(tid, self._state.get(tid), self._state.get(tid)) for tid in tids]
+        self._notify(changes)
+
+# ================= 定时同步监视列表 =================
+WATCHLIST_FILE = "watchlist.json"
+LEGACY_TASKS_FILE = "tasks.json"
+
+class Watchlist:
+    """定时同步的账号列表，同时负责任务登记表的持久化（取代平铺的 tasks.json）。
+    每个账号有独立的同步间隔(小时)，下次到期时间写入磁盘，重启后按原节奏继续。"""
+    def __init__(self, registry=None, path=WATCHLIST_FILE):
+        self.registry = registry
+        self.path = path
+        self._lock = threading.RLock()
+        self.entries = {}     # {tid: {"interval": 小时, "next_due": 时间戳, "last_run": 时间戳}}
+        self._listeners = []
+
+    def subscribe(self, fn):
+        if fn not in self._listeners: self._listeners.append(fn)
+
+    def unsubscribe(self, fn):
+        if fn in self._listeners: self._listeners.remove(fn)
+
+    def _notify(self):
+        for fn in list(self._listeners):
+            try: fn()
+            except: pass
+
+    def __contains__(self, tid):
+        return tid in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    # -------- 持久化 --------
+    def load(self):
+        """读取监视列表与未完成任务；首次运行时迁移旧版 tasks.json"""
+        path = self.path if os.path.exists(self.path) else LEGACY_TASKS_FILE
+        if not os.path.exists(path): return 0
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, list): data = {"tasks": data}  # 旧版 tasks.json 是平铺的 ID 列表
+        if self.registry is not None:
+            for t in data.get("tasks", []):
+                if isinstance(t, dict):
+                    self.registry.add([t["id"]], budget=t.get("budget"))
+                    if t.get("priority"): self.registry.set_priority(t["id"], t["priority"])
+                else:
+                    self.registry.add([t])
+        with self._lock:
+            for tid, e in data.get("watch", {}).items():
+                self.entries[tid] = {"interval": float(e.get("interval") or 0),
+                                     "next_due": float(e.get("next_due") or 0),
+                                     "last_run": float(e.get("last_run") or 0)}
+        if path == LEGACY_TASKS_FILE:
+            self.save()
+            try: os.replace(LEGACY_TASKS_FILE, LEGACY_TASKS_FILE + ".bak")
+            except OSError: pass
+        self._notify()
+        return len(data.get("tasks", []))
+
+    def save(self):
+        """原子写入（临时文件 + 替换），设置了优先级或预算的任务记录为对象"""
+        tasks = []
+        if self.registry is not None:
+            for tid in self.registry.ids():
+                entry = {"id": tid}
+                if tid in self.registry.priority: entry["priority"] = self.registry.priority[tid]
+                if tid in self.registry.budgets: entry["budget"] = self.registry.budgets[tid]
+                tasks.append(entry if len(entry) > 1 else tid)
+        with self._lock:
+            data = {"tasks": tasks, "watch": {tid: dict(e) for tid, e in self.entries.items()}}
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.path)
+
+    # -------- 监视列表维护 --------
+    def watch(self, tids, interval=None):
+        """加入 / 更新监视。已运行过的账号从上次完成时间起算，从未运行过的立即到期（由调度器限速错开）"""
+        interval = float(interval or CFG.get("watch_interval_hours") or 24)
+        now = time.time()
+        with self._lock:
+            for tid in tids:
+                e = self.entries.get(tid) or {"last_run": last_finished_at(tid)}
+                e["interval"] = interval
+                e["next_due"] = e["last_run"] + interval * 3600 if e["last_run"] else now
+                self.entries[tid] = e
+        self._notify()
+
+    def unwatch(self, tid):
+        with self._lock:
+            removed = self.entries.pop(tid, None) is not None
+        if removed: self._notify()
+        return removed
+
+    def mark_run(self, tid, ok=True):
+        """任务结束后推算下次到期时间：成功按间隔加随机抖动，失败一小时后（不超过间隔）重试"""
+        with self._lock:
+            e = self.entries.get(tid)
+            if not e: return False
+            now = time.time()
+            period = e["interval"] * 3600
+            if ok:
+                jitter = float(CFG.get("watch_jitter") or 0)
+                e["last_run"] = now
+                e["next_due"] = now + period * (1 + random.uniform(-jitter, jitter))
+            else:
+                e["next_due"] = now + min(period, 3600)
+        self._notify()
+        return True
+
+    def skip(self, tids):
+        """跳过本轮（如用户清空任务），推迟到下一个间隔"""
+        now = time.time()
+        with self._lock:
+            for tid in tids:
+                if tid in self.entries: self.entries[tid]["next_due"] = now + self.entries[tid]["interval"] * 3600
+        self._notify()
+
+    def due(self, now=None):
+        """已到期的账号，按到期时间先后排列"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return [tid for tid, e in sorted(self.entries.items(), key=lambda kv: kv[1]["next_due"]) if e["next_due"] <= now]
+
+    def next_due_in(self, now=None):
+        """距最早到期还有多少秒（已到期为 0 或负数），列表为空返回 None"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if not self.entries: return None
+            return min(e["next_due"] for e in self.entries.values()) - now
+
+    def snapshot(self):
+        with self._lock:
+            return [{"id": tid, **e} for tid, e in sorted(self.entries.items(), key=lambda kv: kv[1]["next_due"])]
+
+# ================= 事件循环诊断 =================
+_SLOW_TASK_RE = re.compile(r"coro=<(.+?) running at (.+?):(\d+)>")
+_SLOW_HANDLE_RE = re.compile(r"<\w*Handle (.+?) at (.+?):(\d+)")
+
+_SLOW_TASK_NAME_RE = re.compile(r"<Task \w+ name='(.+?)'")
+
+_LIB_DIRS = (os.path.dirname(asyncio.__file__), "site-packages")
+
+def _innermost_frame(task):
+    """沿 await 链找到任务当前挂起的最内层协程帧（跳过 asyncio / 第三方库内部的帧）"""
+    frame, coro = None, task.get_coro()
+    while coro is not None:
+        f = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if f is None: break
+        if frame is None or not any(d in f.f_code.co_filename for d in _LIB_DIRS): frame = f
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frame
+
+def slow_call_site(desc, loop=None):
+    """从 asyncio 慢回调日志的句柄描述中取出调用位置（协程取其下一个挂起点，阻塞代码就在它之前）"""
+    m = _SLOW_TASK_NAME_RE.search(desc)
+    if m and loop is not None:
+        task = next((t for t in asyncio.all_tasks(loop) if t.get_name() == m.group(1)), None)
+        frame = _innermost_frame(task) if task else None
+        if frame is not None:
+            code = frame.f_code
+            return f"{getattr(code, 'co_qualname', code.co_name)}() @ {os.path.basename(code.co_filename)}:{frame.f_lineno}"
+    m = _SLOW_TASK_RE.search(desc) or _SLOW_HANDLE_RE.search(desc)
+    if not m: return desc[:120]
+    return f"{m.group(1)} @ {os.path.basename(m.group(2))}:{m.group(3)}"
+
+class LoopDiagnostics:
+    """可选的事件循环诊断：慢回调定位（loop debug）、循环延迟采样、按需 cProfile / tracemalloc 快照"""
+    def __init__(self, emit=None):
+        self.emit = emit or cprint
+        self.loop = None
+        self.enabled = False
+        self.lags = deque(maxlen=1200)  # 最近的循环延迟样本(秒)
+        self.max_lag = 0.0
+        self.slow_sites = {}            # {调用位置: [次数, 总耗时, 最长耗时]}
+        self.sampler = None
+        self.profiling = False
+        self.last_snapshot = None
+        self._saved_debug = None
+
+    def install(self, loop):
+        """在引擎循环内调用；诊断模式未开启时只记录循环（快照仍可按需使用）"""
+        self.loop = loop
+        if self.enabled or not CFG.get("diagnostics"): return
+        threshold = float(CFG.get("slow_callback_ms") or 100)
+        self._saved_debug = (loop.get_debug(), loop.slow_callback_duration)
+        loop.set_debug(True)
+        loop.slow_callback_duration = threshold / 1000
+        logging.getLogger("asyncio").addFilter(self._filter)
+        self.lags.clear()
+        self.max_lag = 0.0
+        self.slow_sites = {}
+        self.sampler = loop.create_task(self._sample_lag())
+        self.enabled = True
+        self.emit(f"🩺 诊断模式已开启 (慢回调阈值 {threshold:g}ms，debug 模式会降低运行速度)", "warning")
+
+    def uninstall(self):
+        if not self.enabled: return
+        self.enabled = False
+        if self.sampler: self.sampler.cancel()
+        self.sampler = None
+        logging.getLogger("asyncio").removeFilter(self._filter)
+        if self._saved_debug and self.loop:
+            self.loop.set_debug(self._saved_debug[0])
+            self.loop.slow_callback_duration = self._saved_debug[1]
+        status = self.status()
+        self.emit(f"🩺 诊断模式已关闭 (循环延迟 p99 {status['lag_p99_ms']}ms / 最大 {status['lag_max_ms']}ms，阻塞位置 {len(self.slow_sites)} 处)", "info")
+
+    def _filter(self, record):
+        """截获 asyncio 的慢回调告警：按调用位置汇总并转入日志管道，不再打印到标准错误"""
+        if not (isinstance(record.msg, str) and record.msg.startswith("Executing ") and len(record.args or ()) == 2):
+            return True
+        desc, seconds = record.args
+        site = slow_call_site(str(desc), self.loop)
+        stat = self.slow_sites.setdefault(site, [0, 0.0, 0.0])
+        stat[0] += 1
+        stat[1] += seconds
+        stat[2] = max(stat[2], seconds)
+        self.emit(f"🐢 事件循环阻塞 {seconds * 1000:.0f}ms: {site}", "warning")
+        return False
+
+    async def _sample_lag(self):
+        """定时睡眠并测量实际唤醒的延迟：延迟即循环被占用、无法及时调度的时间"""
+        interval = float(CFG.get("lag_sample_interval") or 0.5)
+        while True:
+            t = self.loop.time()
+            await asyncio.sleep(interval)
+            lag = max(0.0, self.loop.time() - t - interval)
+            self.lags.append(lag)
+            if lag > self.max_lag: self.max_lag = lag
+
+    def status(self):
+        lags = sorted(self.lags)
+        pick = lambda p: round(lags[min(len(lags) - 1, int(p / 100 * len(lags)))] * 1000, 1) if lags else 0.0
+        slow = sorted(self.slow_sites.items(), key=lambda kv: -kv[1][1])[:10]
+        return {
+            "enabled": self.enabled,
+            "lag_p50_ms": pick(50), "lag_p99_ms": pick(99), "lag_max_ms": round(self.max_lag * 1000, 1),
+            "samples": len(lags),
+            "slow": [{"site": site, "count": n, "total_ms": round(total * 1000), "max_ms": round(peak * 1000)} for site, (n, total, peak) in slow],
+            "profiling": self.profiling,
+            "tracing_memory": tracemalloc.is_tracing(),
+        }
+
+    def _output_path(self, prefix, ext):
+        folder = CFG.get("diag_dir") or "diagnostics"
+        os.makedirs(folder, exist_ok=True)
+        return os.path.abspath(os.path.join(folder, f"{prefix}_{time.strftime('%Y%m%d_%H%M%S')}{ext}"))
+
+    def capture_profile(self, seconds=10):
+        """对事件循环线程做 N 秒 cProfile 采样（可从任意线程调用），返回输出文件路径"""
+        if self.profiling:
+            self.emit("⚠️ 性能采样进行中", "warning")
+            return None
+        if not (self.loop and self.loop.is_running()):
+            self.emit("⚠️ 引擎未运行，无法采样", "warning")
+            return None
+        path = self._output_path("profile", ".prof")
+        self.profiling = True
+        asyncio.run_coroutine_threadsafe(self._profile(max(1.0, float(seconds)), path), self.loop)
+        return path
+
+    async def _profile(self, seconds, path):
+        # 在循环线程内开启，只统计该线程上执行的回调与协程
+        prof = cProfile.Profile()
+        self.emit(f"⏺️ 开始性能采样 ({seconds:g} 秒)", "info")
+        prof.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            prof.disable()
+            self.profiling = False
+        try:
+            await self.loop.run_in_executor(None, self._dump_profile, prof, path)
+            self.emit(f"📊 性能采样已保存: {path} (文本摘要 .txt)", "success")
+        except Exception as e:
+            self.emit(f"⚠️ 性能采样保存失败: {e}", "warning")
+
+    def _dump_profile(self, prof, path):
+        prof.dump_stats(path)
+        with open(path + ".txt", "w", encoding="utf-8") as f:
+            pstats.Stats(prof, stream=f).sort_stats("cumulative").print_stats(40)
+
+    def capture_memory(self, top=30):
+        """tracemalloc 快照（进程级，任意线程可调用）；首次调用只开启追踪，与上次快照对比输出增长最多的位置"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self.emit("🧠 已开始内存追踪，稍后再次执行以获取快照（追踪开始前的分配不计入）", "info")
+            return None
+        snap = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        path = self._output_path("memory", ".tracemalloc")
+        snap.dump(path)
+        with open(path + ".txt", "w", encoding="utf-8") as f:
+            current, peak = tracemalloc.get_traced_memory()
+            f.write(f"当前 {current / 1024 / 1024:.1f} MB / 峰值 {peak / 1024 / 1024:.1f} MB\n\n[占用最多]\n")
+            for stat in snap.statistics("lineno")[:top]: f.write(f"{stat}\n")
+            if self.last_snapshot is not None:
+                f.write("\n[较上次快照增长]\n")
+                for stat in snap.compare_to(self.last_snapshot, "lineno")[:top]: f.write(f"{stat}\n")
+        self.last_snapshot = snap
+        self.emit(f"🧠 内存快照已保存: {path} (文本摘要 .txt)", "success")
+        return path
+
 # ================= 核心爬虫引擎 =================
 class CrawlerEngine:
-    def __init__(self, callbacks=None):
+    def __init__(self, callbacks=None, registry=None, log_sink=None, watchlist=None):
         self.loop = None
         self.pw_instance = None
-        self.browser_context = None
-        self.queue = asyncio.Queue()
-        self.running_tasks = {}
+        self.profile_contexts = {} # 账号池 {profile: 持久化上下文}
+        self.task_profiles = {}    # 任务所分配的账号 {tid: profile}
+        self.launch_locks = {}     # 按账号的浏览器启动锁
+        self.started_at = None
+        self.first_request_logged = False
+        self.registry = registry if registry is not None else TaskRegistry() # 任务状态唯一来源
+        self.registry.scorer = self._schedule_score
+        self.queue_signal = asyncio.Event() # 有新任务入队时唤醒调度器
+        self.watchlist = watchlist if watchlist is not None else Watchlist(self.registry) # 定时同步列表
+        self.watch_signal = asyncio.Event() # 监视列表或排队情况变化时唤醒定时调度
+        self.running_tasks = {}    # 执行中任务的协程句柄 {tid: mission}
         self.semaphore = None
+        self.slot_holders = set()  # 当前持有并发槽位的任务
+        self.cost_estimates = {}   # sjf 调度的预计耗时 {tid: 秒}
+        self.cost_cache = {}       # 按历史估算的耗时缓存 {tid: 秒}，任务运行结束后失效
+        self.task_started = {}     # 任务本次运行的开始时间 {tid: monotonic}
         self.is_running = False
         self.manual_shutdown = False
         self.engine_ready_event = asyncio.Event()
+        self.stop_event = asyncio.Event()  # 停机信号：唤醒所有等待中的协程
+        self.resume_events = {}            # 任务可运行信号 {tid: asyncio.Event}
         self.is_ctx_alive = False
         self.cbs = callbacks if callbacks else {}
-        self.dl_manager = DownloadManager(callbacks)
-        # 暂停状态管理
-        self.paused_tasks = set()  # 暂停的任务 ID
-        self.suspended_tasks = {}  # 挂起的任务（释放了槽位，等待恢复）
+        self.log_sink = log_sink if log_sink is not None else LogSink(self.cbs) # 非阻塞日志管道
+        self.diagnostics = LoopDiagnostics(self._emit_log) # 可选的事件循环诊断
+        self.shared = None         # 多进程分片时的跨进程共享对象（下载槽位 / 文件认领表）
+        self.thread = None
+        self.dl_manager = DownloadManager(callbacks, log_sink=self.log_sink)
         self.global_paused = False
         self.completed_tasks = []  # 本次启动完成的任务
-        self.failed_tasks = {}     # 失败的任务 {tid: error_msg}
-        self.transitioning_tasks = {} # 正在等待信号量的任务 {tid: launcher_task}
-        self.tid_to_page = {}      # 任务 ID 到 Page 对象的映射，防止幽灵页面
+        self.transitioning_tasks = {} # 正在等待信号量的任务句柄 {tid: launcher_task}
+        self.page_pool = PagePool(self) # 预热页面池（同时负责防止幽灵页面）
+        self.pending_watermarks = {} # 本次运行待提交的水位线 {tid: (save_dir, state)}
+        self.rate_budget = RateLimitBudget()
+        self.throttled_tasks = {}  # 因限流预算停靠的任务 {tid: 恢复时间戳}
 
     def _emit_log(self, msg, level="info"):
-        """推送日志到前端"""
-        if 'on_log' in self.cbs and self.cbs['on_log']:
-            self.cbs['on_log'](msg, level)
+        """推送日志到前端（只入队，由日志管道的后台线程批量投递）"""
+        self.log_sink.emit(msg, level)
+
+    def _call_in_loop(self, fn, *args):
+        """asyncio 事件只能在引擎循环内置位：来自 GUI 线程的调用转交给循环执行"""
+        try:
+            if asyncio.get_running_loop() is self.loop: return fn(*args)
+        except RuntimeError:
+            pass
+        if self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(fn, *args)
         else:
-            cprint(msg, level)
+            fn(*args)
+
+    def _is_paused(self, tid):
+        return self.registry.is_paused(tid) or self.global_paused
+
+    def _on_registry_change(self, changes):
+        """登记表变化回调：有任务进入排队时唤醒调度器"""
+        if any(new == "queued" for _, _, new in changes):
+            self._call_in_loop(self.queue_signal.set)
+        if any(old == "queued" or new is None for _, old, new in changes):
+            self._call_in_loop(self.watch_signal.set)
+
+    def _on_watchlist_change(self):
+        self._call_in_loop(self.watch_signal.set)
+
+    def _on_config_change(self, changed):
+        """运行中即时生效的配置：调度策略重排排队任务、诊断模式开关、追踪文件切换"""
+        if any(key.startswith("schedule_") or key in ("incremental_sync", "deep_scan") for key in changed):
+            self.cost_cache.clear()
+            self.registry.rescore()
+        if "diagnostics" in changed: self.apply_diagnostics()
+        if "trace_file" in changed: TRACE.open(changed["trace_file"])
+
+    def _wake_tasks(self, tids=None):
+        """唤醒等待恢复的任务，由其自行复查暂停状态"""
+        for tid in (self.resume_events if tids is None else tids):
+            ev = self.resume_events.get(tid)
+            if ev: ev.set()
+
+    async def _wait_runnable(self, tid):
+        """挂起直到任务被恢复或引擎停止（无轮询，空闲零开销）"""
+        while self._is_paused(tid) and self.is_running:
+            ev = self.resume_events.setdefault(tid, asyncio.Event())
+            ev.clear()
+            await ev.wait()
+        self.resume_events.pop(tid, None)
+
+    def _fire_stop(self):
+        self.stop_event.set()
+        self._wake_tasks()
+        if self.dl_manager: self.dl_manager.halt()
+
+    def _signal_stop(self):
+        """置位停机标志并立即唤醒所有等待者"""
+        self.is_running = False
+        self._call_in_loop(self._fire_stop)
 
-    def _broadcast_status(self):
-        """主动推送最新状态到前端"""
-        if 'on_task_update' in self.cbs and self.cbs['on_task_update']:
-            try:
+    def _broadcast_status(self, tids=None):
+        """主动推送最新状态到前端：有增量通道时只标记变化的任务（None 表示全量），否则推送完整列表"""
+        try:
+            if 'on_task_dirty' in self.cbs and self.cbs['on_task_dirty']:
+                self.cbs['on_task_dirty'](tids)
+            elif 'on_task_update' in self.cbs and self.cbs['on_task_update']:
                 self.cbs['on_task_update'](self.get_queue_status())
-            except: pass
+        except: pass
 
     def start(self):
         if self.is_running: return
         self.is_running = True
         self.manual_shutdown = False
-        threading.Thread(target=self._run_loop, daemon=True).start()
+        self.thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.thread.start()
 
-    def add_task_to_queue(self, tid):
-        if self.is_running and self.loop:
-            # 查重：如果在运行中、挂起中或已在队列中，则拒绝
-            if tid in self.running_tasks or tid in self.suspended_tasks or tid in self.paused_tasks:
-                self._emit_log(f"⚠️ 任务 [{tid}] 已经在处理中，请勿重复添加", "warning")
-                return False
-                
-            # 检查队列内部
-            queue_items = []
-            try:
-                queue_items = list(self.queue._queue)
-            except: pass
-            if tid in queue_items:
-                self._emit_log(f"⚠️ 任务 [{tid}] 已在排队，请勿重复添加", "warning")
-                return False
+    def add_task_to_queue(self, tid, budget=None):
+        return bool(self.add_tasks_to_queue([tid], budget=budget))
 
-            self.loop.call_soon_threadsafe(self.queue.put_nowait, tid)
-            # 添加到队列时，清除错误状态
-            self.failed_tasks.pop(tid, None)
-            self._emit_log(f"➕ 任务 [{tid}] 已添加至队列", "info")
-            return True
-        else:
+    def add_tasks_to_queue(self, tids, budget=None):
+        """批量入队（查重由登记表 O(1) 完成），返回实际入队的任务列表；budget 为单任务预算"""
+        if not (self.is_running and self.loop):
             self._emit_log("⚠️ 引擎尚未就绪", "warning")
-            return False
+            return []
+        tids = list(tids)
+        accepted = self.registry.enqueue(tids, budget=budget)
+        if len(tids) == 1:
+            if accepted: self._emit_log(f"➕ 任务 [{tids[0]}] 已添加至队列", "info")
+            else: self._emit_log(f"⚠️ 任务 [{tids[0]}] 已经在处理中，请勿重复添加", "warning")
+        elif tids:
+            skipped = len(tids) - len(accepted)
+            self._emit_log(f"➕ 已添加 {len(accepted)} 个任务至队列" + (f" (忽略 {skipped} 个重复项)" if skipped else ""), "info")
+        return accepted
+
+    def apply_diagnostics(self):
+        """按配置即时开启 / 关闭诊断模式（引擎运行中切换也生效）"""
+        if not (self.loop and self.is_running): return
+        if CFG.get("diagnostics"): self._call_in_loop(self.diagnostics.install, self.loop)
+        else: self._call_in_loop(self.diagnostics.uninstall)
 
     def stop(self):
         self.manual_shutdown = True
-        self.is_running = False
+        self._signal_stop()
         if self.loop:
              asyncio.run_coroutine_threadsafe(self._shutdown_sequence(), self.loop)
 
@@ -382,62 +2004,90 @@ class CrawlerEngine:
         self.loop.run_until_complete(self._engine_lifecycle())
 
     async def _engine_lifecycle(self):
+        self.stop_event.clear()
+        self.registry.subscribe(self._on_registry_change)
+        self.watchlist.subscribe(self._on_watchlist_change)
+        CFG.subscribe(self._on_config_change)
+        self.diagnostics.install(asyncio.get_running_loop())
+        TRACE.open(CFG.get("trace_file"))
+        self.started_at = time.perf_counter()
+        self.first_request_logged = False
         self._emit_log(f"🚀 初始化核心 (页面并发: {int(CFG.get('concurrency'))})", "info")
         
         dl_threads = int(CFG.get('download_threads'))
-        self.dl_manager = DownloadManager(self.cbs, max_threads=dl_threads)
-        await self.dl_manager.start_workers(count=12)
+        self.dl_manager = DownloadManager(self.cbs, max_threads=dl_threads, log_sink=self.log_sink, shared=self.shared)
+        await self.dl_manager.start_workers(count=int(CFG.get('download_workers') or 12))
         
         self.semaphore = asyncio.Semaphore(int(CFG.get('concurrency')))
 
-        await self._launch_context()
-        if not self.browser_context: 
+        # 【延迟启动】浏览器在第一个任务真正需要时才启动
+        if not logged_in_profiles():
+            self._emit_log("❌ 未检测到任何已登录账号，请先登录", "danger")
             self.is_running = False
+            CFG.unsubscribe(self._on_config_change)
+            self.diagnostics.uninstall()
+            TRACE.close()
             return
 
-        self._emit_log("✅ 物理链路开启，环境预热中...", "success")
+        self._emit_log(f"✅ 调度中枢就绪 (账号: {', '.join(logged_in_profiles())})，浏览器将在首个任务时启动", "success")
         if CFG.get("deep_scan"):
              self._emit_log("⛏️ 注意：穿透模式 (Deep Scan) 已开启，将强制扫描至底部", "warning")
 
-        await asyncio.sleep(3)
         self.engine_ready_event.set()
 
         scheduler_task = asyncio.create_task(self._task_dispatcher())
+        watch_task = asyncio.create_task(self._watch_scheduler())
 
         self.is_ctx_alive = True
-        def on_close(_): 
-            if self.is_running and not self.manual_shutdown:
-                self._emit_log("⚠️ 浏览器已关闭，引擎停止。", "warning")
-            self.is_ctx_alive = False
-            self.is_running = False
-
-        self.browser_context.on("close", on_close)
-
-        while self.is_running and self.is_ctx_alive:
-            if not self.browser_context.pages: await self.browser_context.new_page()
-            await asyncio.sleep(2)
+        # 常驻等待停机信号（保活页面由 _watch_context 的关闭事件负责）
+        if self.is_running: await self.stop_event.wait()
 
         if scheduler_task: scheduler_task.cancel()
+        watch_task.cancel()
+        self.registry.unsubscribe(self._on_registry_change)
+        self.watchlist.unsubscribe(self._on_watchlist_change)
+        CFG.unsubscribe(self._on_config_change)
+        self.diagnostics.uninstall()
         self.engine_ready_event.clear()
         
         await self._shutdown_sequence()
 
-    async def _launch_context(self):
-        # 严格检查复用条件：变量存在 且 仍在连接中
-        if self.browser_context and self.pw_instance:
+    async def _ctx_usable(self, ctx):
+        """持久化上下文没有 browser 对象，直接发一个轻量调用判断是否仍然存活"""
+        try:
+            await ctx.cookies("https://x.com")
+            return True
+        except:
+            return False
+
+    async def _ensure_context(self, profile):
+        """首次使用时才启动账号的浏览器上下文（同一账号并发请求只启动一次）"""
+        ctx = self.profile_contexts.get(profile)
+        if ctx: return ctx
+        lock = self.launch_locks.setdefault(profile, asyncio.Lock())
+        async with lock:
+            ctx = self.profile_contexts.get(profile)
+            if ctx: return ctx
             try:
-                # 尝试访问属性，如果已经断开会抛异常或返回 False
-                if self.browser_context.browser and self.browser_context.browser.is_connected():
-                    self._emit_log("🔗 正在连通已有的浏览器实例", "success")
-                    return self.browser_context
-            except:
-                pass
+                return await self._launch_context(profile)
+            except Exception as e:
+                self._emit_log(f"⚠️ 账号 [{profile}] 启动失败: {e}", "warning")
+                return None
+
+    async def _launch_context(self, profile=DEFAULT_PROFILE):
+        # 严格检查复用条件：实例存在 且 仍然可用
+        ctx = self.profile_contexts.get(profile)
+        if ctx and self.pw_instance:
+            if await self._ctx_usable(ctx):
+                self._emit_log(f"🔗 正在连通已有的浏览器实例 [{profile}]", "success")
+                self._watch_context(profile, ctx)
+                return ctx
             
             # 如果走到这里，说明注入的实例已失效，需要重置
-            self._emit_log("⚠️ 浏览器实例已丢失，正在重新初始化...", "warning")
-            self.browser_context = None
+            self._emit_log(f"⚠️ 浏览器实例 [{profile}] 已丢失，正在重新初始化...", "warning")
+            self.profile_contexts.pop(profile, None)
 
-        user_data_path = os.path.abspath("my_browser_data")
+        user_data_path = profile_data_dir(profile)
         bt = CFG.get("browser_type")
         exe = find_system_browser(bt)
         if not exe:
@@ -447,10 +2097,11 @@ class CrawlerEngine:
         is_headless = CFG.get("headless")
         timeout = int(CFG.get("timeout")) * 1000 # Playwright 使用毫秒
 
+        t0 = time.perf_counter()
         if not self.pw_instance:
-            self.pw_instance = await async_playwright().start()
+            self.pw_instance = await _async_playwright().start()
             
-        self.browser_context = await self.pw_instance.chromium.launch_persistent_context(
+        ctx = await self.pw_instance.chromium.launch_persistent_context(
             user_data_dir=user_data_path, executable_path=exe,
             headless=is_headless,
             channel="msedge" if bt.lower() == "edge" else "chrome",
@@ -460,7 +2111,7 @@ class CrawlerEngine:
         
         # 【新增】强制清理非正常关闭留下的冗余标签页
         try:
-            pages = self.browser_context.pages
+            pages = ctx.pages
             if len(pages) > 1:
                 # 保留第一个，关闭其余所有
                 for p in pages[1:]:
@@ -468,41 +2119,113 @@ class CrawlerEngine:
         except:
             pass
 
-        return self.browser_context
+        # 就绪探测：能正常开出页面即视为浏览器可用（取代固定的预热等待）
+        if not ctx.pages: await ctx.new_page()
+        self._emit_log(f"🌐 账号 [{profile}] 浏览器就绪，耗时 {time.perf_counter() - t0:.2f} 秒", "success")
+
+        self.profile_contexts[profile] = ctx
+        self._watch_context(profile, ctx)
+        prewarm = min(CFG.snap.page_pool_prewarm, CFG.snap.concurrency)
+        if prewarm > 0: asyncio.create_task(self.page_pool.prewarm(profile, ctx, prewarm))
+        return ctx
+
+    def _watch_context(self, profile, ctx):
+        """上下文被关闭时移出账号池；全部关闭则停止引擎"""
+        def on_close(_):
+            if self.profile_contexts.get(profile) is ctx:
+                self.profile_contexts.pop(profile, None)
+            if self.profile_contexts: 
+                self._emit_log(f"⚠️ 账号 [{profile}] 的浏览器已关闭，已移出账号池", "warning")
+                return
+            if self.is_running and not self.manual_shutdown:
+                self._emit_log("⚠️ 浏览器已关闭，引擎停止。", "warning")
+            self.is_ctx_alive = False
+            self._signal_stop()
+        ctx.on("close", on_close)
+
+        # 保活：最后一个标签页被关掉时立即补开一个，避免上下文随之退出
+        def on_page_close(_):
+            if self.is_running and not self.manual_shutdown and self.profile_contexts.get(profile) is ctx and not ctx.pages:
+                asyncio.create_task(self._reopen_page(ctx))
+        for pg in ctx.pages: pg.on("close", on_page_close)
+        ctx.on("page", lambda pg: pg.on("close", on_page_close))
+
+    async def _reopen_page(self, ctx):
+        try: await ctx.new_page()
+        except: pass
+
+    @property
+    def browser_context(self):
+        """账号所有者 Profile 的上下文（兼容旧调用）"""
+        return self.profile_contexts.get(CFG.snap.owner_profile or DEFAULT_PROFILE)
+
+    def _eligible_profiles(self, tid):
+        """喜欢/书签固定在所有者账号上，其余任务可分配给任意已登录账号"""
+        if tid in PINNED_TASKS: return [CFG.snap.owner_profile or DEFAULT_PROFILE]
+        return logged_in_profiles() or [DEFAULT_PROFILE]
+
+    def _budget_key(self, profile, endpoint):
+        return f"{profile}:{endpoint}"
+
+    def _task_budget_key(self, tid, endpoint=None):
+        endpoint = endpoint or task_endpoint(tid)
+        profile = self.task_profiles.get(tid)
+        if not profile:
+            profile = min(self._eligible_profiles(tid), key=lambda p: self.rate_budget.park_seconds(self._budget_key(p, endpoint)))
+        return self._budget_key(profile, endpoint)
+
+    def _assign_profile(self, tid):
+        """把任务分配给最空闲、限流余量最充足的账号"""
+        endpoint = task_endpoint(tid)
+        candidates = [p for p in self._eligible_profiles(tid) if os.path.exists(profile_data_dir(p))]
+        if not candidates: return None
+        load = {p: 0 for p in candidates}
+        for other, p in self.task_profiles.items():
+            if other != tid and p in load: load[p] += 1
+        def score(p):
+            park = self.rate_budget.park_seconds(self._budget_key(p, endpoint))
+            pace = self.rate_budget.pace_seconds(self._budget_key(p, endpoint))
+            return (park > 0, load[p], pace, park)
+        profile = min(candidates, key=score)
+        self.task_profiles[tid] = profile
+        return profile
 
     async def _shutdown_sequence(self):
         """完全关闭引擎（软件退出时调用）"""
-        if not self.browser_context and (not self.dl_manager or not self.dl_manager.is_running): return
+        if not self.profile_contexts and (not self.dl_manager or not self.dl_manager.active_workers): return
 
         self._emit_log("🛑 正在停止全链路采集...", "danger")
         if self.dl_manager: await self.dl_manager.stop_workers()
         
         for t in self.running_tasks.values(): t.cancel()
         self.running_tasks.clear()
-        self.suspended_tasks.clear()
-        self.paused_tasks.clear()
+        self.registry.clear_paused()
+        self.registry.reset_active()
+        self.task_profiles.clear()
+        await self.page_pool.close_idle()
 
         # 只有完全退出时才关闭浏览器
         if self.manual_shutdown:
-            if self.browser_context:
-                try: await self.browser_context.close()
+            for ctx in list(self.profile_contexts.values()):
+                try: await ctx.close()
                 except: pass
             if hasattr(self, 'pw_instance') and self.pw_instance:
                 try: await self.pw_instance.stop()
                 except: pass
-            self.browser_context = None
+            self.profile_contexts.clear()
         
         self.is_running = False
+        if TRACE.path:
+            self._emit_log(f"🧵 追踪已写入: {os.path.abspath(TRACE.path)}", "info")
+            TRACE.close()
         self._emit_log("🏁 引擎已安全停机。", "success")
+        self.log_sink.flush()
 
     def stop_crawling_only(self):
         """仅停止爬取逻辑，不关闭浏览器（新需求）"""
         self._emit_log("⏹️ 正在停止爬取...", "warning")
-        self.is_running = False
-        
-        # 强制关闭下载管理器总闸，触发即时中断检查
-        if self.dl_manager:
-            self.dl_manager.is_running = False
+        # 置位停机并唤醒所有等待者（同时关闭下载管理器总闸，触发即时中断检查）
+        self._signal_stop()
         
         # 取消所有运行中的任务
         for tid, task in list(self.running_tasks.items()):
@@ -510,14 +2233,9 @@ class CrawlerEngine:
             if self.dl_manager:
                 self.dl_manager.deregister_task(tid)
         self.running_tasks.clear()
-        self.suspended_tasks.clear()
         
-        # 清空队列
-        while not self.queue.empty():
-            try:
-                self.queue.get_nowait()
-            except:
-                break
+        # 排队 / 执行中的任务退回待启动（失败任务保留）
+        self.registry.reset_active()
         
         self._emit_log("⏹️ 爬取已停止 (后台下载已强制中断并清理)", "success")
 
@@ -534,69 +2252,55 @@ class CrawlerEngine:
             self._emit_log(f"🗑️ 已删除运行中任务: [{tid}]", "warning")
         
         # 同样需要清理正在过渡中（已出队但未进入 running）的任务
-        if hasattr(self, 'transitioning_tasks') and tid in self.transitioning_tasks:
-            task = self.transitioning_tasks[tid]
+        if tid in self.transitioning_tasks:
+            task = self.transitioning_tasks.pop(tid)
             task.cancel()
-            self.transitioning_tasks.pop(tid, None)
             deleted = True
             self._emit_log(f"🗑️ 已删除过渡中任务: [{tid}]", "warning")
         
-        # 从队列中移除
-        try:
-            new_queue = asyncio.Queue()
-            while not self.queue.empty():
-                item = self.queue.get_nowait()
-                if item != tid:
-                    new_queue.put_nowait(item)
-                else:
-                    deleted = True
-                    self._emit_log(f"🗑️ 已从队列移除: [{tid}]", "warning")
-            self.queue = new_queue
-        except:
-            pass
+        # 从登记表移除（O(1)，调度器只会取到仍在排队的任务）
+        if self.registry.remove(tid) == "queued":
+            deleted = True
+            self._emit_log(f"🗑️ 已从队列移除: [{tid}]", "warning")
         
         # 从下载管理器注销
         if self.dl_manager:
             self.dl_manager.deregister_task(tid)
         
-        # 从任务中移除
         self.running_tasks.pop(tid, None)
-        self.failed_tasks.pop(tid, None)
         
         # 任务状态更新回调
-        if 'on_task_update' in self.cbs and self.cbs['on_task_update']:
-            self.cbs['on_task_update'](self.get_queue_status())
+        self._broadcast_status([tid])
 
     def pause_task(self, tid):
         """暂停单个任务"""
-        if hasattr(self, 'paused_tasks'):
-            self.paused_tasks.add(tid)
-        else:
-            self.paused_tasks = {tid}
+        self.registry.pause(tid)
         self._emit_log(f"⏸️ 任务已暂停: [{tid}]", "info")
 
     def resume_task(self, tid):
         """恢复单个任务"""
-        # 如果在失败列表中，则重新加入队列
-        if tid in self.failed_tasks:
+        # 如果在失败 / 部分完成列表中，则重新加入队列
+        if self.registry.state(tid) in ("error", "partial"):
             self.add_task_to_queue(tid)
             return
 
-        if hasattr(self, 'paused_tasks') and tid in self.paused_tasks:
-            self.paused_tasks.discard(tid)
+        if self.registry.resume(tid):
+            self._call_in_loop(self._wake_tasks, [tid])
             self._emit_log(f"▶️ 任务已恢复: [{tid}]", "info")
 
     def pause_all(self):
         """全局暂停"""
         self.global_paused = True
         self._emit_log("⏸️ 全局暂停", "warning")
+        self._broadcast_status()
 
     def resume_all(self):
         """全局恢复"""
         self.global_paused = False
-        if hasattr(self, 'paused_tasks'):
-            self.paused_tasks.clear()
+        self.registry.clear_paused()
+        self._call_in_loop(self._wake_tasks)
         self._emit_log("▶️ 全局恢复", "success")
+        self._broadcast_status()
 
     async def clear_all_tasks(self):
         """清空所有任务"""
@@ -612,15 +2316,9 @@ class CrawlerEngine:
             task.cancel()
         self.transitioning_tasks.clear()
         
-        # 3. 清空各种状态集合
-        self.paused_tasks.clear()
-        self.failed_tasks.clear()
-        self.suspended_tasks.clear()
-        
-        # 4. 清空队列
-        while not self.queue.empty():
-            try: self.queue.get_nowait()
-            except: break
+        # 3. 清空登记表（排队 / 暂停 / 失败状态一并清除）
+        self.registry.clear()
+        self._wake_tasks()
             
         # 5. 清理下载项与注销 ID
         if self.dl_manager:
@@ -628,111 +2326,262 @@ class CrawlerEngine:
                 self.dl_manager.deregister_task(tid)
             self.dl_manager.session_counters.clear()
         
-        # 6. 重置信号量 (防止死锁)
-        if self.semaphore:
-            self.semaphore = asyncio.Semaphore(int(CFG.get('concurrency')))
+        # 6. 槽位由被取消任务的 finally 幂等归还（slot_holders 记账），无需重置信号量
             
         # 7. 推送状态
         self._emit_log("🗓️ 任务列表已完全重置 (后台下载已强制中断)", "success")
         self._broadcast_status()
 
+    def _status_item(self, tid, state, counters):
+        item = {"id": tid, "status": state, "state": state, "progress": 0,
+                "priority": self.registry.priority.get(tid, 0)}
+        if state == "queued" and tid in self.cost_estimates:
+            item["est_cost"] = int(self.cost_estimates[tid])
+        if state in ("running", "launching"):
+            # launching：调度器已取走但尚未开始执行（等待槽位）
+            if self._is_paused(tid): item["status"] = "paused"
+            elif tid in self.throttled_tasks: item["status"] = "throttled"
+            elif state == "launching": item["status"] = "queued"
+            if state == "running": item["progress"] = counters.get(tid, 0)
+            item["rate_limit"] = self.rate_budget.snapshot(self._task_budget_key(tid))
+            item["profile"] = self.task_profiles.get(tid)
+        elif state in ("error", "partial"):
+            item["progress"] = counters.get(tid, 0)
+            item["error"] = self.registry.errors.get(tid, "任务执行失败")
+        if tid in self.registry.budgets: item["budget"] = self.registry.budgets[tid]
+        if tid in self.watchlist: item["watch_interval"] = self.watchlist.entries[tid]["interval"]
+        return item
+
     def get_queue_status(self):
-        """获取任务队列状态"""
-        status_list = []
-        
-        # 运行中的任务
-        for tid in self.running_tasks.keys():
-            is_paused = hasattr(self, 'paused_tasks') and tid in self.paused_tasks
-            status_list.append({
-                "id": tid,
-                "status": "paused" if is_paused else "running",
-                "progress": self.dl_manager.session_counters.get(tid, 0) if self.dl_manager else 0
-            })
-        
-        # 队列中等待的任务（通过遍历队列副本）
-        try:
-            queue_items = list(self.queue._queue)
-            for tid in queue_items:
-                if tid not in self.running_tasks:
-                    status_list.append({
-                        "id": tid,
-                        "status": "queued",
-                        "progress": 0
-                    })
-        except:
-            pass
-        
-        # 正在等待槽位的任务（即调度器已取走但尚未开始执行）
-        for tid in list(self.transitioning_tasks.keys()):
-            if tid in self.running_tasks: continue # 如果已进入运行字典，则由下方循环渲染
-            is_paused = tid in self.paused_tasks or self.global_paused
-            status_list.append({
-                "id": tid,
-                "status": "paused" if is_paused else "queued",
-                "progress": 0
-            })
-
-        # 失败的任务
-        for tid, err in self.failed_tasks.items():
-            status_list.append({
-                "id": tid,
-                "status": "error",
-                "progress": self.dl_manager.session_counters.get(tid, 0) if self.dl_manager else 0,
-                "error": err
-            })
-        
-        return status_list
+        """获取任务队列状态（直接遍历登记表快照，排队任务按调度顺序）"""
+        counters = self.dl_manager.session_counters if self.dl_manager else {}
+        return [self._status_item(tid, state, counters) for tid, state in self.registry.snapshot()]
+
+    def get_task_status(self, tids):
+        """只计算指定任务的状态（增量推送用），已删除的任务不返回"""
+        counters = self.dl_manager.session_counters if self.dl_manager else {}
+        items = []
+        for tid in tids:
+            state = self.registry.state(tid)
+            if state is not None: items.append(self._status_item(tid, state, counters))
+        return items
 
     def get_completed_tasks(self):
         """获取本次启动完成的任务列表"""
         return self.completed_tasks[:50]  # 最多返回 50 条
 
+    async def _watch_scheduler(self):
+        """定时同步：到期账号按 watch_rate_per_hour 均匀错开入队，排队任务足以填满并发时暂缓，
+        避免数千个账号同一时刻启动触发限流后又长时间空闲"""
+        last_launch = None
+        while True:
+            try:
+                self.watch_signal.clear()
+                wait = self.watchlist.next_due_in()
+                if wait is not None and wait <= 0:
+                    rate = float(CFG.get("watch_rate_per_hour") or 0)
+                    gap = 3600.0 / rate if rate > 0 else 0.0
+                    wait = gap - (time.monotonic() - last_launch) if last_launch is not None else 0
+                    if self.registry.count("queued") >= int(CFG.get("concurrency")):
+                        wait = max(wait, 5)  # 出队时会被唤醒，这里只是兜底
+                    if wait <= 0:
+                        # 正在排队 / 执行中的账号跳过，待启动（如从监视列表恢复）、部分完成或失败的继续
+                        tid = next((t for t in self.watchlist.due() if self.registry.state(t) in (None, "pending", "partial", "error")), None)
+                        if tid:
+                            self.registry.enqueue([tid])
+                            last_launch = time.monotonic()
+                            self._emit_log(f"⏰ 定时同步到期: [{tid}] 已加入队列", "info")
+                            self._broadcast_status([tid])
+                            continue
+                        wait = 60  # 到期账号都在执行中，稍后复查
+                timeout = 3600 if wait is None else min(max(wait, 0.05), 3600)
+                try: await asyncio.wait_for(self.watch_signal.wait(), timeout=timeout)
+                except asyncio.TimeoutError: pass
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self._emit_log(f"⚠️ 定时调度异常: {e}", "warning")
+                await asyncio.sleep(5)
+
+    def watch_accounts(self, tids, interval=None):
+        """加入定时同步；最近运行过的账号从上次完成时间起算，不会立刻重跑"""
+        tids = list(tids)
+        self.watchlist.watch(tids, interval)
+        self._save_watchlist()
+        return tids
+
+    def _save_watchlist(self):
+        try: self.watchlist.save()
+        except Exception as e: self._emit_log(f"⚠️ 监视列表保存失败: {e}", "warning")
+
     async def _task_dispatcher(self):
         while self.is_running:
             try:
-                tid = await asyncio.wait_for(self.queue.get(), timeout=1.0)
-                # 产生一个非阻塞启动器，防止 acquire 导致 dispatcher 暂停工作
+                if not self.registry.has_queued():
+                    # 队列为空时挂起，等待入队信号；停机时由 _engine_lifecycle 取消本协程
+                    self.queue_signal.clear()
+                    await self.queue_signal.wait()
+                    continue
+                # 有空闲槽位时才出队：调度顺序（优先级 / 预计耗时）在出队这一刻生效
+                await self.semaphore.acquire()
+                tid = self.registry.pop_next()
+                if tid is None:
+                    self.semaphore.release()
+                    continue
+                self.slot_holders.add(tid)
+                # 产生一个非阻塞启动器（已携带槽位），暂停 / 停靠时由启动器归还
                 launcher = asyncio.create_task(self._task_launcher(tid))
                 self.transitioning_tasks[tid] = launcher
+            except asyncio.CancelledError:
+                break
             except:
                 pass
 
     async def _task_launcher(self, tid):
-        """负责等待信号量并启动执行器的中间层"""
+        """负责等待信号量并启动执行器的中间层（由调度器带着槽位启动）"""
         try:
             while self.is_running:
-                # 1. 如果在等待期间被暂停，则一直等直到恢复或引擎停止
-                while (tid in self.paused_tasks or self.global_paused) and self.is_running:
-                    await asyncio.sleep(1)
+                # 1. 如果在等待期间被暂停，则归还槽位并挂起直到恢复信号或停机信号
+                if self._is_paused(tid):
+                    self._release_slot(tid)
+                    await self._wait_runnable(tid)
                 
                 if not self.is_running: return
 
-                # 2. 获取信号量（此时如果排在前面的任务没暂停，它会在这里阻塞）
-                self._emit_log(f"⏳ 任务 [{tid}] 正在等待可用槽位...", "secondary")
-                await self.semaphore.acquire()
+                # 1.5 端点额度即将耗尽时不占槽位，停靠到重置时间
+                park = self.rate_budget.park_seconds(self._task_budget_key(tid))
+                if park > 0:
+                    self._release_slot(tid)
+                    await self._park_until_reset(tid, park)
+                    continue
+
+                # 2. 获取信号量（暂停 / 停靠后重新排队）
+                if tid not in self.slot_holders:
+                    self._emit_log(f"⏳ 任务 [{tid}] 正在等待可用槽位...", "secondary")
+                    await self._acquire_slot(tid)
                 
                 # 3. 拿到信号量后，再次检查是否在等待期间又变为了暂停状态
-                if (tid in self.paused_tasks or self.global_paused) and self.is_running:
-                    self.semaphore.release()
+                if self._is_paused(tid) and self.is_running:
                     continue
                 
-                # 4. 正式进入执行
+                # 4. 正式进入执行（等待期间已被删除则归还槽位）
+                if not self.registry.set_state(tid, "running"):
+                    return
                 await self._wrapped_executor(tid)
                 break
         except asyncio.CancelledError:
             pass
         finally:
+            self._release_slot(tid)
             self.transitioning_tasks.pop(tid, None)
+            # 未能执行完毕（停机 / 取消）的任务退回待启动
+            if self.registry.state(tid) in ("launching", "running"):
+                self.registry.set_state(tid, "pending")
+
+    async def _acquire_slot(self, tid):
+        await self.semaphore.acquire()
+        self.slot_holders.add(tid)
+
+    def _release_slot(self, tid):
+        """幂等归还槽位（暂停 / 停靠 / 取消路径可能先后调用多次）"""
+        if tid in self.slot_holders:
+            self.slot_holders.discard(tid)
+            self.semaphore.release()
+
+    # ================= 调度策略 =================
+    def _estimate_cost(self, tid):
+        """按历史估算任务耗时(秒)，结果缓存到任务下次运行结束"""
+        cost = self.cost_cache.get(tid)
+        if cost is None: cost = self.cost_cache[tid] = self._read_cost(tid)
+        return cost
+
+    def _read_cost(self, tid):
+        """读任务目录估算耗时：增量任务取上次运行耗时，否则按已下载数量估算全量扫描"""
+        d = task_save_dir(tid)
+        default = CFG.snap.schedule_default_cost
+        if not os.path.isdir(d): return default
+        sync = self._load_sync_state(d)
+        last = sync.get("last_run") or {}
+        if last and sync.get("watermark") and CFG.snap.incremental_sync and not CFG.snap.deep_scan:
+            return float(last.get("duration", default))
+        h = os.path.join(d, "history.txt")
+        known = os.path.getsize(h) / 24 if os.path.exists(h) else 0  # 每条记录约 24 字节
+        per_item = float(last["duration"]) / max(1, last.get("media", 0)) if last.get("media") else 0.05
+        return max(float(last.get("duration", 0)), known * min(per_item, 1.0)) or default
+
+    def _schedule_score(self, tid, enqueued_at=None):
+        """登记表的代价分：fifo 恒为 0；sjf 为预计耗时 + 老化项（入队越早分越低）"""
+        if CFG.snap.schedule_policy != "sjf":
+            self.cost_estimates.pop(tid, None)
+            return 0.0
+        cost = self._estimate_cost(tid)
+        self.cost_estimates[tid] = cost
+        return cost + CFG.snap.schedule_aging * (enqueued_at if enqueued_at is not None else time.monotonic())
+
+    def _task_budget_hit(self, tid, steps=None):
+        """检查单任务预算（媒体数 / 字节 / 运行时长 / 翻页次数），用尽时返回原因"""
+        budget = self.registry.budgets.get(tid)
+        if not budget: return None
+        reason = self.dl_manager.budget_exhausted(tid) if self.dl_manager else None
+        if reason: return reason
+        started = self.task_started.get(tid)
+        if budget.get("max_seconds") and started and time.monotonic() - started >= budget["max_seconds"]:
+            return "运行时长"
+        if steps is not None and budget.get("max_steps") and steps >= budget["max_steps"]:
+            return "翻页次数"
+        return None
+
+    def _budget_stop(self, tid, task_label, steps):
+        reason = self._task_budget_hit(tid, steps)
+        if reason: self._emit_log(f"🧮 [{task_label}] 已达到任务预算上限 ({reason})，停止采集", "warning")
+        return reason is not None
+
+    def set_task_priority(self, tid, priority):
+        ok = self.registry.set_priority(tid, priority)
+        if ok: self._emit_log(f"🔢 任务 [{tid}] 优先级: {int(priority)}", "info")
+        return ok
+
+    async def _drain_downloads(self, tid):
+        """等待任务的下载排空（注销任务或停机时立即放行）；设置了运行时长预算时最多等到预算用完，
+        超时则丢弃剩余排队项、中止在途传输并返回 False"""
+        budget = self.registry.budgets.get(tid) or {}
+        started = self.task_started.get(tid)
+        if not budget.get("max_seconds") or started is None:
+            await self.dl_manager.wait_drained(tid)
+            return True
+        remain = budget["max_seconds"] - (time.monotonic() - started)
+        try:
+            await asyncio.wait_for(self.dl_manager.wait_drained(tid), timeout=max(0.0, remain))
+            return True
+        except asyncio.TimeoutError:
+            self.dl_manager.expire(tid)
+            await self.dl_manager.wait_drained(tid)
+            return False
+
+    def _record_last_run(self, tid, save_dir, started):
+        """记录本次运行的耗时与下载数量，作为 sjf 调度的估算依据"""
+        self.cost_cache.pop(tid, None)
+        data = self._load_sync_state(save_dir)
+        data["last_run"] = {
+            "duration": round(time.monotonic() - started, 1),
+            "media": self.dl_manager.session_counters.get(tid, 0) if self.dl_manager else 0,
+            "finished": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        self._save_sync_state(save_dir, data)
 
     async def _wrapped_executor(self, tid):
         """任务执行器：支持暂停释放槽位"""
+        status = None
         try:
             self.dl_manager.register_task(tid)
+            self.dl_manager.set_budget(tid, self.registry.budgets.get(tid))
+            self.task_started[tid] = time.monotonic()
             self._emit_log(f"▶ 启动任务: [{tid}]", "info")
             
-            root = CFG.get('save_path')
-            p = os.path.join(root, "我的喜欢" if tid == "MY_LIKES" else "我的书签" if tid == "MY_BOOKMARKS" else f"博主图集/{tid}")
-            self._archaeology_healing(p, tid)
+            p = task_save_dir(tid)
+            # 考古要遍历整个任务目录并读包索引，放到线程池，不阻塞事件循环
+            await asyncio.get_running_loop().run_in_executor(None, self._archaeology_healing, p, tid)
+            started = time.monotonic()
 
             mission = asyncio.create_task(self._mission_body_logic(tid))
             self.running_tasks[tid] = mission
@@ -744,9 +2593,15 @@ class CrawlerEngine:
                 self._emit_log(f"🗑️ 任务 [{tid}] 已被删除", "warning")
                 status = "CANCELLED"
 
+            if status in ("FINISHED", "PARTIAL") and not await self._drain_downloads(tid):
+                status = "PARTIAL"  # 运行时长预算在等待下载落盘时用尽
+
             if status == "FINISHED":
-                while self.dl_manager.get_pending_count(tid) > 0 and self.is_running:
-                    await asyncio.sleep(2)
+                if self.is_running:
+                    # 有下载失败时保留断点（停在第一个失败之前），下次从那里重新抓取
+                    if self._commit_watermark(tid): self._clear_checkpoint(p)
+                    else: self._save_checkpoint(tid)
+                    self._record_last_run(tid, p, started)
                 self._emit_log(f"✅ 任务 [{tid}] 完成", "success")
                 # 记录完成的任务
                 self.completed_tasks.insert(0, {
@@ -754,28 +2609,43 @@ class CrawlerEngine:
                     "time": __import__('datetime').datetime.now().strftime("%H:%M:%S")
                 })
                 # 任务完成，且成功移除
+                self.registry.remove(tid)
+                if self.watchlist.mark_run(tid):
+                    await asyncio.get_running_loop().run_in_executor(None, self._save_watchlist)
                 if 'on_task_finished' in self.cbs and self.cbs['on_task_finished']:
                     self.cbs['on_task_finished'](tid)
 
+            elif status == "PARTIAL":
+                # 预算用尽：在途下载已落盘（或因时长预算被丢弃），标记为部分完成（不推进水位线），可稍后继续
+                reason = self._task_budget_hit(tid) or "预算用尽"
+                self.registry.set_state(tid, "partial", f"预算用尽: {reason}")
+                if self.watchlist.mark_run(tid):
+                    await asyncio.get_running_loop().run_in_executor(None, self._save_watchlist)
+                self._emit_log(f"🧮 任务 [{tid}] 预算用尽 ({reason})，已标记为部分完成，可稍后继续", "warning")
             elif status == "PAUSED":
                 # 任务被暂停，释放槽位等待恢复
                 self._emit_log(f"⏸️ 任务 [{tid}] 已挂起，等待恢复", "info")
             elif status == "FAILED":
                 # 任务显式返回失败状态
-                self.failed_tasks[tid] = "任务执行失败"
+                self.registry.set_state(tid, "error", "任务执行失败")
+                if self.watchlist.mark_run(tid, ok=False):
+                    await asyncio.get_running_loop().run_in_executor(None, self._save_watchlist)
                 self._emit_log(f"❌ 任务 [{tid}] 执行失败", "danger")
             elif status != "CANCELLED":
                 self._emit_log(f"⚠️ 任务 [{tid}] 结束状态: {status}", "warning")
         except Exception as e:
-            self.failed_tasks[tid] = str(e)
+            self.registry.set_state(tid, "error", str(e))
+            if self.watchlist.mark_run(tid, ok=False):
+                await asyncio.get_running_loop().run_in_executor(None, self._save_watchlist)
             self._emit_log(f"❌ 任务 [{tid}] 执行异常: {e}", "danger")
         finally:
-            self.semaphore.release()
+            # 未正常完成（暂停 / 停止 / 失败 / 预算用尽）时记下断点，下次从游标继续
+            if status != "FINISHED": self._save_checkpoint(tid)
+            self._release_slot(tid)
             self.running_tasks.pop(tid, None)
-            try:
-                self.queue.task_done()
-            except:
-                pass
+            self.pending_watermarks.pop(tid, None)
+            self.task_profiles.pop(tid, None)
+            self.task_started.pop(tid, None)
 
     async def _sniff_and_save_id(self, page):
         """主动嗅探用户 ID 并保存"""
@@ -804,18 +2674,16 @@ class CrawlerEngine:
     def _archaeology_healing(self, path, tid):
         h_file = os.path.join(path, "history.txt")
         if not os.path.exists(h_file) and os.path.exists(path):
-            ids = []
-            for sub in ["图片", "Gif"]:
-                p = os.path.join(path, sub)
-                if os.path.exists(p):
-                    for f in os.listdir(p): ids.append(os.path.splitext(f)[0])
+            ids = [os.path.splitext(os.path.basename(f))[0] for _, f in iter_media_files(path)]
+            if has_packs(path):
+                ids.extend(os.path.splitext(n.rsplit("/", 1)[-1])[0] for n in pack_store(path).names())
             if ids:
                 with open(h_file, "w", encoding="utf-8") as f:
                     for rid in set(ids): f.write(rid + "\n")
                 self._emit_log(f"🧠 [{tid}] 考古完成，恢复记录 {len(ids)} 条", "secondary")
 
     async def resilient_goto(self, page, url, tid):
-        timeout = int(CFG.get('timeout')) * 1000
+        timeout = CFG.snap.timeout * 1000
         for i in range(3):
             try:
                 await self.engine_ready_event.wait()
@@ -828,9 +2696,176 @@ class CrawlerEngine:
                 raise e
         return False
 
+    async def _pause_checkpoint(self, tid):
+        """暂停检查与信号量交接，返回 False 表示引擎已停止"""
+        if self._is_paused(tid):
+            self._emit_log(f"⏸️ 任务 [{tid}] 正在暂停并释放资源...", "info")
+            self._release_slot(tid) # 释放槽位给别人
+            try:
+                await self._wait_runnable(tid)
+
+                if not self.is_running: return False
+
+                self._emit_log(f"⏳ 任务 [{tid}] 正在尝试恢复并重新排队...", "info")
+                await self._acquire_slot(tid) # 重新排队
+                self._emit_log(f"▶️ 任务 [{tid}] 已成功恢复运行", "success")
+            except Exception as e:
+                self._emit_log(f"❌ 任务 [{tid}] 恢复失败: {e}", "danger")
+                return False
+        return True
+
+    async def _park_until_reset(self, tid, seconds):
+        """停靠等待限流额度重置（停机信号到达时立即结束）"""
+        self.throttled_tasks[tid] = time.time() + seconds
+        self._emit_log(f"🚦 任务 [{tid}] 接口额度即将耗尽，停靠 {int(seconds)} 秒后自动恢复", "warning")
+        self._broadcast_status([tid])
+        try:
+            # 停机信号到达时提前结束停靠
+            await asyncio.wait_for(self.stop_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.throttled_tasks.pop(tid, None)
+            self._broadcast_status([tid])
+
+    async def _budget_checkpoint(self, tid, endpoint):
+        """翻页前检查任务所在账号的端点预算：额度偏低时减速，即将耗尽时释放槽位停靠到重置"""
+        key = self._task_budget_key(tid, endpoint)
+        park = self.rate_budget.park_seconds(key)
+        if park > 0:
+            self._release_slot(tid)
+            await self._park_until_reset(tid, park)
+            if not self.is_running: return False
+            await self._acquire_slot(tid)
+            return self.is_running
+        pace = self.rate_budget.pace_seconds(key)
+        if pace > 0: await asyncio.sleep(pace)
+        return True
+
+    async def _sample_page_memory(self, page):
+        """采样页面 JS 堆(MB)与 DOM 节点数，失败返回 (0, 0)"""
+        try:
+            m = await page.evaluate(_MEM_PROBE_JS)
+            return m["heap"] / 1024 / 1024, m["nodes"]
+        except:
+            return 0, 0
+
+    def _over_memory_limit(self, heap_mb, nodes):
+        return heap_mb > CFG.snap.mem_heap_limit_mb or nodes > CFG.snap.mem_dom_limit
+
+    async def _client_navigate(self, page, url):
+        """在已加载的 X.com 单页应用内做客户端路由跳转，省去整页启动"""
+        try:
+            await page.evaluate("""(path) => {
+                history.pushState({}, '', path);
+                window.dispatchEvent(new PopStateEvent('popstate', {state: {}}));
+            }""", urlsplit(url).path)
+            return True
+        except:
+            return False
+
+    async def _wait_page_arrival(self, state, timeout):
+        """等待目标时间线的下一批响应，超时返回 False"""
+        try:
+            await asyncio.wait_for(state["page_arrived"].wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _polite_delay(self, started):
+        """保证两次翻页之间至少间隔 min_page_delay（带少量抖动），网络越快翻页越快"""
+        delay = CFG.snap.min_page_delay * random.uniform(1.0, 1.3)
+        remain = delay - (time.monotonic() - started)
+        if remain > 0: await asyncio.sleep(remain)
+
+    def _should_stop(self, state, task_label):
+        """增量水位线 / 旧图阈值判定（穿透模式下只打印进度）"""
+        if state["crossed"]:
+            self._emit_log(f"🧭 [{task_label}] 已越过上次同步位置，增量同步完成", "success")
+            state["complete"] = True
+            return True
+        cfg = CFG.snap
+        stop_limit = cfg.stop_thresh
+        if not cfg.deep_scan and not state.get("gap") and state["streak"] >= stop_limit:
+            self._emit_log(f"🛑 [{task_label}] 连续 {stop_limit} 张旧图，停止", "success")
+            state["complete"] = True
+            return True
+        elif cfg.deep_scan and state["streak"] > 0 and state["streak"] % 100 == 0:
+            self._emit_log(f"⛏️ [{task_label}] 穿透模式运行中... 已忽略 {state['streak']} 张旧图", "secondary")
+        return False
+
+    async def _cursor_pagination(self, tid, task_label, state, on_page, request_ctx, start_step=0):
+        """免滚动翻页：复用捕获的 GraphQL 请求模板，沿 cursor-bottom 直接拉取后续页面。
+        request_ctx 为 Playwright APIRequestContext（默认取登录上下文的 request，可指向本地桩服务器）。
+        返回 FINISHED / FAILED / PARTIAL（任务预算用尽） / FALLBACK（模板失效，交还滚动模式）"""
+        template = state["template"]
+        endpoint = graphql_operation(template["url"])
+        budget_key = self._task_budget_key(tid, endpoint)
+        timeout = CFG.snap.timeout * 1000
+        errors = 0
+        last_started = None
+        for i in range(start_step, CFG.snap.max_scrolls):
+            self._track_checkpoint(tid, state, i)
+            if not self.is_running or not self.is_ctx_alive: return "FAILED"
+            if not await self._pause_checkpoint(tid): return "FAILED"
+            if self._should_stop(state, task_label): return "FINISHED"
+            # 翻页预算按本次运行实际走过的步数计（滚动与游标翻页共用），start_step 只是时间线上的位置
+            if self._budget_stop(tid, task_label, state.get("spent", 0)): return "PARTIAL"
+            state["spent"] = state.get("spent", 0) + 1
+            if not await self._budget_checkpoint(tid, endpoint): return "FAILED"
+
+            cursor = state["cursor"]
+            if not cursor:
+                state["complete"] = True
+                return "FINISHED"
+
+            t0 = TRACE.now() if TRACE.enabled else None
+            if last_started is not None: await self._polite_delay(last_started)
+            last_started = time.monotonic()
+            t1 = TRACE.now() if t0 is not None else None
+
+            try:
+                resp = await request_ctx.get(build_cursor_url(template["url"], cursor), headers=template["headers"], timeout=timeout)
+                self.rate_budget.update(budget_key, resp.headers)
+                if resp.status == 429:
+                    # 带重置时间的 429 交给预算停靠后重试，否则按限流保护处理
+                    if self.rate_budget.park_seconds(budget_key) > 0: continue
+                    self._emit_log(f"⛔ [{task_label}] 触发推特限流，停止账号保护！", "danger")
+                    return "FAILED"
+                if not resp.ok: raise Exception(f"HTTP {resp.status}")
+                json_data = await resp.json()
+            except Exception as e:
+                errors += 1
+                if errors >= 3:
+                    self._emit_log(f"⚠️ [{task_label}] 游标翻页失败 ({e})，回退滚动模式", "warning")
+                    return "FALLBACK"
+                continue
+            errors = 0
+            if t0 is not None:
+                TRACE.span("polite_delay", tid, t0, t1)
+                TRACE.span("fetch", tid, t1)
+
+            await on_page(json_data)
+            if t0 is not None: TRACE.span("page", tid, t0, step=i, items=count_timeline_items(json_data))
+            next_cursor = find_timeline_cursor(json_data)
+            if not next_cursor or next_cursor == cursor or count_timeline_items(json_data) == 0:
+                self._emit_log(f"🛑 [{task_label}] 页面到底", "success")
+                state["complete"] = True
+                return "FINISHED"
+            state["cursor"] = next_cursor
+        return "FINISHED"
+
     async def _mission_body_logic(self, tid):
-        if not self.is_running or not self.browser_context: return "FAILED"
-        save_root = CFG.get('save_path')
+        if not self.is_running: return "FAILED"
+        # 【多账号】取得任务所分配账号的上下文（首次使用时启动浏览器）
+        profile = self.task_profiles.get(tid) or self._assign_profile(tid)
+        ctx = await self._ensure_context(profile) if profile else None
+        if not ctx:
+            self._emit_log(f"❌ 任务 [{tid}] 没有可用账号（喜欢/书签需要所有者账号在线）", "danger")
+            return "FAILED"
+        if len(logged_in_profiles()) > 1:
+            self._emit_log(f"👥 任务 [{tid}] 分配至账号 [{profile}]", "secondary")
+        save_root = CFG.snap.save_path
         target_url = f"https://x.com/{tid}/media"
         task_label = tid
         save_dir = os.path.join(save_root, "博主图集", tid)
@@ -840,7 +2875,7 @@ class CrawlerEngine:
             task_label = "书签"
             save_dir = os.path.join(save_root, "我的书签")
         elif tid == "MY_LIKES":
-            my_id = CFG.get("custom_likes_id")
+            my_id = CFG.snap.custom_likes_id
             if not my_id: 
                 # 尝试主动嗅探
                 # 此时页面可能还没打开，需要先创建页面
@@ -852,169 +2887,227 @@ class CrawlerEngine:
             task_label = "喜欢"
             save_dir = os.path.join(save_root, "我的喜欢")
 
-        state = {"active": False, "streak": 0}
-        history = self._get_local_history(save_dir)
-
-        def get_tweet_url(item_data):
-            try:
-                core_data = item_data.get("itemContent", item_data)
-                if "tweet_results" in core_data and "result" in core_data["tweet_results"]:
-                    res = core_data["tweet_results"]["result"]
-                    legacy = res.get("legacy") or res.get("tweet", {}).get("legacy")
-                    core = res.get("core") or res.get("tweet", {}).get("core")
-                    
-                    if legacy:
-                        t_id = legacy.get("id_str")
-                        u_name = "i"
-                        try: u_name = core["user_results"]["result"]["legacy"]["screen_name"]
-                        except: pass
-                        if t_id: return f"https://x.com/{u_name}/status/{t_id}"
-            except: pass
-            return None
-
-        def pinpoint_extract(data):
-            found = []
-            if isinstance(data, dict):
-                if "itemContent" in data or "tweet_results" in data:
-                    t_url = get_tweet_url(data)
-                    
-                    def find_media(d, link):
-                        res = []
-                        if isinstance(d, dict):
-                            if "media_url_https" in d:
-                                u = d["media_url_https"]
-                                if "/media/" in u and "profile_images" not in u: 
-                                    res.append({'type': 'img', 'url': u, 'link': link})
-                            if "video_info" in d and "variants" in d["video_info"]:
-                                mp4s = [v for v in d["video_info"]["variants"] if v.get("content_type") == "video/mp4"]
-                                if mp4s: 
-                                    best = max(mp4s, key=lambda x: x.get("bitrate", 0))["url"]
-                                    res.append({'type': 'vid', 'url': best, 'link': link})
-                            for v in d.values(): res.extend(find_media(v, link))
-                        elif isinstance(d, list):
-                            for i in d: res.extend(find_media(i, link))
-                        return res
-                    
-                    found.extend(find_media(data, t_url))
-                    return found
-                
-                for v in data.values(): found.extend(pinpoint_extract(v))
-            elif isinstance(data, list):
-                for i in data: found.extend(pinpoint_extract(i))
-            return found
+        timeline_op = task_endpoint(tid)
+        state = {"active": False, "paginating": False, "streak": 0, "spent": 0, "template": None, "cursor": None, "last_items": None,
+                 "template_ready": asyncio.Event(), "page_arrived": asyncio.Event(),
+                 "crossed": False, "complete": False, "top_key": None, "top_entries": None}
+        history = await asyncio.get_running_loop().run_in_executor(None, self._get_local_history, save_dir)
+
+        # 【增量同步】读取上次成功运行留下的水位线（穿透模式强制全量，不使用水位线）
+        by_sort_index = tid in ("MY_LIKES", "MY_BOOKMARKS")
+        sync_state = self._load_sync_state(save_dir)
+        watermark = None
+        if CFG.snap.incremental_sync and not CFG.snap.deep_scan:
+            watermark = sync_state.get("watermark")
+        # 【断点续传】上次中断时的游标；续传时沿用原运行的顶部位置，中间新增的内容留给下次增量同步
+        checkpoint = sync_state.get("checkpoint") if CFG.snap.resume_checkpoints else None
+        if checkpoint and checkpoint.get("top_key") is not None:
+            state.update(top_key=checkpoint["top_key"], top_entries=checkpoint.get("top_entries"), frozen_top=True)
+        self.pending_watermarks[tid] = (save_dir, state)
+        # 【覆盖缺口】上次运行没有完整结束（预算用尽 / 失败 / 中断）时，已下载区域之后可能还有没抓到的内容，
+        # 本次不按旧图阈值提前停止，一直走到越过水位线或到底；标记在运行开始时落盘，完整结束后清除
+        state["gap"] = bool(sync_state.get("incomplete"))
+        if state["gap"]:
+            self._emit_log(f"🧩 [{task_label}] 上次运行未完整结束，本次不按旧图阈值提前停止", "info")
+        else:
+            sync_state["incomplete"] = True
+            self._save_sync_state(save_dir, sync_state)
+
+        def track_watermark(json_data):
+            """记录本次运行的最新位置，并判断是否已越过上次水位线"""
+            marks = scan_timeline_marks(json_data, by_sort_index)
+            if not marks: return
+            if not state.get("frozen_top"):
+                if state["top_entries"] is None:
+                    state["top_entries"] = [e for e, _ in marks[:20]]
+                page_top = max(k for _, k in marks)
+                if state["top_key"] is None or page_top > state["top_key"]:
+                    state["top_key"] = page_top
+            if watermark:
+                known = set(watermark.get("top_entries") or [])
+                if any(k <= watermark["key"] or e in known for e, k in marks):
+                    state["crossed"] = True
+
+        async def process_timeline_json(json_data, is_target=True):
+            """解析一页时间线数据并投递下载（滚动与游标翻页共用）"""
+            t0 = TRACE.now() if TRACE.enabled else None
+            if is_target: track_watermark(json_data)
+            media_list = pinpoint_extract(json_data)
+            found_at = TRACE.now() if t0 is not None else None
+            queued = 0
+            cfg = CFG.snap
+
+            for item in media_list:
+                raw_url = item['url']
+                t_link = item['link']
+                clean = raw_url.split("?")[0]
+                f_id = media_file_id(clean)
+
+                if f_id in history:
+                    state["streak"] += 1
+                    continue
+                state["streak"] = 0
+
+                if item['type'] == 'img' and cfg.dl_images:
+                    dest = media_dest(save_dir, 'img', f_id, t_link, cfg.dir_layout)
+                    await self.dl_manager.submit_job(f"{clean}?format=jpg&name=orig", dest, tid, task_label, 'img', clean, t_link, found_at)
+                    history.add(f_id)
+                    queued += 1
+                elif item['type'] == 'vid' and cfg.dl_gifs:
+                    dest = media_dest(save_dir, 'vid', f_id, t_link, cfg.dir_layout)
+                    await self.dl_manager.submit_job(clean, dest, tid, task_label, 'vid', clean, t_link, found_at)
+                    history.add(f_id)
+                    queued += 1
+            if t0 is not None:
+                TRACE.span("extract", tid, t0, media=len(media_list), queued=queued)
 
         async def api_handler(res):
-            markers = ["UserMedia", "UserTweets", "Bookmarks", "Likes", "Timeline"]
-            if not any(m in res.url for m in markers) or not state["active"]: return
+            if not any(m in res.url for m in TIMELINE_MARKERS) or not state["active"]: return
             try:
+                op = graphql_operation(res.url)
+                self.rate_budget.update(self._budget_key(profile, op), res.headers)
                 json_data = await res.json()
-                media_list = pinpoint_extract(json_data)
-                
-                for item in media_list:
-                    raw_url = item['url']
-                    t_link = item['link']
-                    clean = raw_url.split("?")[0]
-                    
-                    raw_fname = clean.split('/')[-1]
-                    if "." in raw_fname:
-                         f_id = raw_fname.rsplit(".", 1)[0]
-                    else:
-                         f_id = raw_fname
-                    
-                    if f_id in history:
-                        state["streak"] += 1
-                        continue
-                    state["streak"] = 0
-                    
-                    if item['type'] == 'img' and CFG.get("dl_images"):
-                        dest = os.path.join(save_dir, "图片", f_id + ".jpg")
-                        await self.dl_manager.submit_job(f"{clean}?format=jpg&name=orig", dest, tid, task_label, 'img', clean, t_link)
-                        history.add(f_id)
-                    elif item['type'] == 'vid' and CFG.get("dl_gifs"):
-                        dest = os.path.join(save_dir, "Gif", f_id + ".mp4")
-                        await self.dl_manager.submit_job(clean, dest, tid, task_label, 'vid', clean, t_link)
-                        history.add(f_id)
+                # 【游标翻页】首个目标时间线请求作为模板，之后持续记录 cursor-bottom；
+                # 直接翻页接管后游标只由翻页循环推进，页面自己加载的时间线（懒加载 / 预取）一律忽略
+                is_target = op == timeline_op
+                if is_target and state["paginating"]: return
+                if is_target:
+                    cursor = find_timeline_cursor(json_data)
+                    if cursor:
+                        state["cursor"] = cursor
+                        if state["template"] is None and res.request.method == "GET":
+                            headers = await res.request.all_headers()
+                            state["template"] = {"url": res.url, "headers": clean_template_headers(headers)}
+                            state["template_ready"].set()
+                await process_timeline_json(json_data, is_target)
+                if is_target:
+                    if not self.first_request_logged and self.started_at:
+                        self.first_request_logged = True
+                        self._emit_log(f"⏱️ 首个时间线请求耗时 {time.perf_counter() - self.started_at:.2f} 秒 (引擎启动 → 首个请求)", "secondary")
+                    # 通知滚动循环：下一批数据已到达
+                    state["last_items"] = count_timeline_items(json_data)
+                    state["page_arrived"].set()
             except:
                 pass
 
         try:
-            # 【幽灵页面查重】检查是否已有该任务对应的页面
-            page = None
-            if tid in self.tid_to_page:
-                old_page = self.tid_to_page[tid]
-                try:
-                    if not old_page.is_closed():
-                        page = old_page
-                        self._emit_log(f"🧠 [{task_label}] 检测到已有页面，正在复用进行同步", "secondary")
-                    else:
-                        del self.tid_to_page[tid]
-                except:
-                    del self.tid_to_page[tid]
-
-            if not page:
-                page = await self.browser_context.new_page()
-                self.tid_to_page[tid] = page
+            # 【页面池】优先取用已预热的页面
+            page, warm = await self.page_pool.acquire(tid, profile, ctx)
+            if warm: self._emit_log(f"🧠 [{task_label}] 复用预热页面", "secondary")
 
-            page.on("response", lambda r: asyncio.create_task(api_handler(r)))
+            on_response = lambda r: asyncio.create_task(api_handler(r))
+            page.on("response", on_response)
             state["active"] = True
 
             # 【ID 缓存机制】
-            if tid == "MY_LIKES" and not CFG.get("custom_likes_id"):
+            if tid == "MY_LIKES" and not CFG.snap.custom_likes_id:
                 sniffed_id = await self._sniff_and_save_id(page)
                 if sniffed_id:
                      target_url = f"https://x.com/{sniffed_id}/likes"
                 else:
                      return "FAILED"
 
-            if not await self.resilient_goto(page, target_url, task_label): return "FAILED"
+            # 预热页面走客户端路由切换，等不到目标时间线再整页加载
+            navigated = False
+            if warm and urlsplit(page.url).path != urlsplit(target_url).path:
+                navigated = await self._client_navigate(page, target_url) and await self._wait_page_arrival(state, 8)
+            if not navigated and not await self.resilient_goto(page, target_url, task_label): return "FAILED"
 
             try: await page.wait_for_selector('[data-testid="tweet"]', timeout=20000)
             except: pass
             
             self._emit_log(f"✅ [{task_label}] 页面加载完毕，开始采集", "success")
-            await asyncio.sleep(5)
+
+            # 【免滚动翻页】模板捕获成功则直接请求后续页面，失败时回退滚动
+            # 有断点时同样借助模板，从断点游标直接请求（不受 api_pagination 开关限制）
+            resume = checkpoint and checkpoint.get("cursor")
+            if CFG.snap.api_pagination or resume:
+                try: await asyncio.wait_for(state["template_ready"].wait(), timeout=10)
+                except asyncio.TimeoutError: pass
+                if state["template"]:
+                    # 先让监听器停止记录游标，再写入断点游标，页面随后到达的首页响应不会覆盖它
+                    state["paginating"] = True
+                    start_step = 0
+                    if resume:
+                        state["cursor"] = checkpoint["cursor"]
+                        start_step = int(checkpoint.get("steps") or 0)
+                        self._emit_log(f"📍 [{task_label}] 从断点继续 (已翻 {start_step} 页，{checkpoint.get('updated', '')})", "info")
+                    else:
+                        self._emit_log(f"⚡ [{task_label}] 已捕获时间线模板，切换游标翻页", "secondary")
+                    result = await self._cursor_pagination(tid, task_label, state, process_timeline_json, ctx.request, start_step=start_step)
+                    if result != "FALLBACK": return result
+                    state["paginating"] = False
+                else:
+                    self._emit_log(f"⚠️ [{task_label}] 未捕获时间线模板，使用滚动模式" + ("（断点无法使用，从头开始）" if resume else ""), "warning")
+
+            # 首批时间线数据到达即开始滚动（不再固定等待）
+            wait_timeout = CFG.snap.scroll_wait_timeout
+            await self._wait_page_arrival(state, wait_timeout)
 
             shake_retry = 0
-            for i in range(int(CFG.get('max_scrolls'))):
+            max_scrolls = CFG.snap.max_scrolls
+            # 回收页面后新页面从头加载：先重放 replay 次滚动回到原位置，这些步不计入滚动次数与预算，
+            # 也不按旧图阈值停止（重放的内容都在历史记录里），回到原位置后恢复之前的连续旧图计数
+            i, replay, held_streak = -1, 0, None
+            while True:
+                replaying = replay > 0
+                if replaying:
+                    replay -= 1
+                else:
+                    if held_streak is not None: state["streak"], held_streak = held_streak, None
+                    i += 1
+                    if i >= max_scrolls: break
+                    self._track_checkpoint(tid, state, i)
                 if not self.is_running or not self.is_ctx_alive: return "FAILED"
-                
-                # 【暂停检查与信号量交接】
-                if tid in self.paused_tasks or self.global_paused:
-                    self._emit_log(f"⏸️ 任务 [{tid}] 正在暂停并释放资源...", "info")
-                    self.semaphore.release() # 释放槽位给别人
-                    try:
-                        while (tid in self.paused_tasks or self.global_paused) and self.is_running:
-                            await asyncio.sleep(1)
-                        
-                        if not self.is_running: return "FAILED"
-                        
-                        self._emit_log(f"⏳ 任务 [{tid}] 正在尝试恢复并重新排队...", "info")
-                        await self.semaphore.acquire() # 重新排队
-                        self._emit_log(f"▶️ 任务 [{tid}] 已成功恢复运行", "success")
-                    except Exception as e:
-                        self._emit_log(f"❌ 任务 [{tid}] 恢复失败: {e}", "danger")
-                        return "FAILED"
-
-                # 【核心修改】读取配置中的阈值
-                stop_limit = int(CFG.get('stop_thresh'))
-                if not CFG.get("deep_scan") and state["streak"] >= stop_limit: 
-                    self._emit_log(f"🛑 [{task_label}] 连续 {stop_limit} 张旧图，停止", "success")
-                    break
-                elif CFG.get("deep_scan") and state["streak"] > 0 and state["streak"] % 100 == 0:
-                    self._emit_log(f"⛏️ [{task_label}] 穿透模式运行中... 已忽略 {state['streak']} 张旧图", "secondary")
 
-                prev_h = await page.evaluate("document.body.scrollHeight")
+                if not await self._pause_checkpoint(tid): return "FAILED"
+                if not replaying:
+                    if self._should_stop(state, task_label): break
+                    if self._budget_stop(tid, task_label, state["spent"]): return "PARTIAL"
+                    state["spent"] += 1
+                if not await self._budget_checkpoint(tid, timeline_op): return "FAILED"
+
+                # 【内存保护】定期采样，超限时回收页面（时间线单元归 React 管理，不直接删节点）：
+                # 有模板时从最后的游标继续翻页，否则在新页面上重新滚动（已下载的由历史记录跳过）
+                cfg = CFG.snap
+                if cfg.mem_guard and not replaying and i > 0 and i % max(1, int(cfg.mem_check_every)) == 0:
+                    heap_mb, nodes = await self._sample_page_memory(page)
+                    if self._over_memory_limit(heap_mb, nodes):
+                        self._emit_log(f"♻️ [{task_label}] 页面内存超限 ({heap_mb:.0f}MB / {nodes} 节点)，回收页面", "warning")
+                        try: page.remove_listener("response", on_response)
+                        except: pass
+                        await self.page_pool.release(tid, recycle=True)
+                        if state["template"] and state["cursor"]:
+                            state["paginating"] = True
+                            result = await self._cursor_pagination(tid, task_label, state, process_timeline_json, ctx.request, start_step=i)
+                            if result != "FALLBACK": return result
+                            state["paginating"] = False
+                        self._emit_log(f"🔁 [{task_label}] 在新页面上继续滚动", "info")
+                        page, _ = await self.page_pool.acquire(tid, profile, ctx)
+                        page.on("response", on_response)
+                        if not await self.resilient_goto(page, target_url, task_label): return "FAILED"
+                        await self._wait_page_arrival(state, wait_timeout)
+                        shake_retry = 0
+                        replay, held_streak = i, state["streak"]
+                        continue
+
+                prev_cursor = state["cursor"]
+                state["page_arrived"].clear()
+                started = time.monotonic()
+                t0 = TRACE.now() if TRACE.enabled else None
                 await page.keyboard.press("End")
-                
-                # 滚动后的等待也要分片，以便快速响应暂停/停止
-                wait_time = random.uniform(5, 8)
-                for _ in range(int(wait_time)):
-                     if not self.is_running or tid in self.paused_tasks or self.global_paused: break
-                     await asyncio.sleep(1)
-                
-                new_h = await page.evaluate("document.body.scrollHeight")
 
-                if new_h == prev_h:
+                # 等待下一批时间线响应（超时即视为未增长），再补足最小礼貌间隔
+                arrived = await self._wait_page_arrival(state, wait_timeout)
+                t1 = TRACE.now() if t0 is not None else None
+                await self._polite_delay(started)
+                if t0 is not None:
+                    TRACE.span("wait_response", tid, t0, t1, arrived=bool(arrived))
+                    TRACE.span("polite_delay", tid, t1)
+                    TRACE.span("scroll", tid, t0, step=i, items=state["last_items"])
+
+                # 停滞判定：没有拿到新游标，或新一页为空
+                if state["cursor"] == prev_cursor or state["last_items"] == 0:
                     shake_retry += 1
                     
                     is_rate_limited = await page.get_by_text("Rate limit exceeded").count() > 0 or \
@@ -1027,19 +3120,16 @@ class CrawlerEngine:
                     if await retry_btn.count() > 0:
                          self._emit_log(f"🔄 [{task_label}] 检测到重试按钮，尝试点击...", "warning")
                          await retry_btn.click()
-                         await asyncio.sleep(5)
                          shake_retry = 0
                          continue
 
                     if shake_retry < 3:
-                        self._emit_log(f"⏳ [{task_label}] 页面未滚动，重试 {shake_retry}...", "warning")
+                        self._emit_log(f"⏳ [{task_label}] 未获取到新游标，重试 {shake_retry}...", "warning")
                         await page.evaluate("window.scrollBy(0, -600)")
-                        await asyncio.sleep(3)
-                        await page.keyboard.press("End")
-                        await asyncio.sleep(shake_retry * 5)
                         continue
                     else:
                         self._emit_log(f"🛑 [{task_label}] 页面到底", "success")
+                        state["complete"] = True
                         break
                 else:
                     shake_retry = 0
@@ -1048,11 +3138,94 @@ class CrawlerEngine:
             self._emit_log(f"❌ [{task_label}] 任务异常: {e}", "danger")
             return "FAILED"
         finally:
-            try: 
-                if tid in self.tid_to_page:
-                    self.tid_to_page.pop(tid)
-                await page.close()
+            # 清理监听器与任务状态后归还页面
+            state["active"] = False
+            try: page.remove_listener("response", on_response)
+            except: pass
+            try: await self.page_pool.release(tid)
+            except: pass
+
+    def _load_sync_state(self, path):
+        """读取任务目录下的同步状态 (sync_state.json)"""
+        f = os.path.join(path, "sync_state.json")
+        if os.path.exists(f):
+            try:
+                with open(f, "r", encoding="utf-8") as fp:
+                    data = json.load(fp)
+                    if isinstance(data, dict): return data
             except: pass
+        return {}
+
+    def _save_sync_state(self, path, data):
+        try:
+            os.makedirs(path, exist_ok=True)
+            tmp = os.path.join(path, "sync_state.json.tmp")
+            with open(tmp, "w", encoding="utf-8") as fp:
+                json.dump(data, fp, ensure_ascii=False, indent=2)
+            os.replace(tmp, os.path.join(path, "sync_state.json"))
+        except Exception as e:
+            self._emit_log(f"⚠️ 同步状态保存失败: {e}", "warning")
+
+    def _track_checkpoint(self, tid, state, step):
+        """每步开始时记录可安全续传的位置：只有该任务的下载全部落盘时，当前游标之前的内容才算完成；
+        每 checkpoint_every 步落盘一次"""
+        dl = self.dl_manager
+        # 下载总闸关闭或任务已注销时排队项会被丢弃，计数归零不代表已落盘；
+        # 本次运行有下载失败后不再前移，续传时仍从失败文件之前的位置重新扫描
+        if (dl.is_running and tid in dl.active_task_ids and not dl.get_pending_count(tid)
+                and not dl.failure_count(tid) and state["cursor"]):
+            state["safe_cursor"], state["safe_steps"] = state["cursor"], step
+        every = max(1, int(CFG.snap.checkpoint_every))
+        if step and step % every == 0: self._save_checkpoint(tid)
+
+    def _save_checkpoint(self, tid):
+        """把最后的安全游标写入 sync_state.json（任务未完整结束时调用）"""
+        entry = self.pending_watermarks.get(tid)
+        if not entry or not CFG.snap.resume_checkpoints: return
+        save_dir, state = entry
+        if state["complete"] or not state.get("safe_cursor"): return
+        data = self._load_sync_state(save_dir)
+        data["checkpoint"] = {
+            "cursor": state["safe_cursor"],
+            "steps": state["safe_steps"],
+            "top_key": state["top_key"],
+            "top_entries": state["top_entries"] or [],
+            "updated": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        self._save_sync_state(save_dir, data)
+
+    def _clear_checkpoint(self, save_dir):
+        """任务完整结束：清除断点与未完成标记"""
+        data = self._load_sync_state(save_dir)
+        cleared = data.pop("checkpoint", None) is not None
+        if data.pop("incomplete", None) is not None or cleared: self._save_sync_state(save_dir, data)
+
+    def _commit_watermark(self, tid):
+        """任务成功完成且下载清空后，落盘新的水位线（未完整覆盖的运行不推进水位线）；
+        有下载失败时同样不推进，否则失败的媒体落在水位线之下，之后的增量同步再也不会回头抓取。
+        返回本次运行是否完整覆盖（未完整覆盖时保留断点与未完成标记）"""
+        entry = self.pending_watermarks.get(tid)
+        if not entry: return True
+        save_dir, state = entry
+        if not state["complete"]: return False
+        failed = self.dl_manager.failure_count(tid)
+        if failed:
+            state["complete"] = False
+            self._emit_log(f"⚠️ [{tid}] {failed} 个媒体下载失败，本次不推进水位线，下次同步会重新抓取", "warning")
+            return False
+        self.pending_watermarks.pop(tid, None)
+        if state["top_key"] is None: return True
+        data = self._load_sync_state(save_dir)
+        old = data.get("watermark") or {}
+        if old.get("key") is not None and old["key"] > state["top_key"]: return True
+        data["watermark"] = {
+            "key": state["top_key"],
+            "top_entries": state["top_entries"] or [],
+            "updated": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
+        self._save_sync_state(save_dir, data)
+        self._emit_log(f"🧭 [{tid}] 水位线已更新", "secondary")
+        return True
 
     def _get_local_history(self, path):
         s = set()
@@ -1064,37 +3237,43 @@ class CrawlerEngine:
             except: pass
         return s
 
-    async def run_login(self):
+    async def run_login(self, profile=DEFAULT_PROFILE):
+        profile = profile or DEFAULT_PROFILE
         bt = CFG.get("browser_type")
         exe = find_system_browser(bt)
         if not exe: 
             self._emit_log("未找到浏览器内核", "danger")
             return
-        self._emit_log("🔑 正在开启独立登录环境授权向导...", "warning")
-        async with async_playwright() as p:
+        self._emit_log(f"🔑 正在开启独立登录环境授权向导 (账号: {profile})...", "warning")
+        async with _async_playwright() as p:
             ctx = await p.chromium.launch_persistent_context(
-                user_data_dir=os.path.abspath("my_browser_data"), executable_path=exe,
+                user_data_dir=profile_data_dir(profile), executable_path=exe,
                 headless=False, channel="msedge" if bt.lower() == "edge" else "chrome",
                 args=["--disable-blink-features=AutomationControlled"], no_viewport=True
             )
             page = ctx.pages[0]
             await page.goto("https://x.com/i/flow/login", timeout=0)
             self._emit_log("请在弹出的浏览器中登录 Twitter，完成后关闭浏览器窗口。", "info")
-            while True:
-                if not ctx.pages: break
-                await asyncio.sleep(1)
+            # 等待用户关闭浏览器窗口（上下文关闭事件）
+            await ctx.wait_for_event("close", timeout=0)
             self._emit_log("✅ 授权环境已更新并落盘", "success")
+        # 新登录的账号自动加入账号池配置
+        profiles = configured_profiles()
+        if profile not in profiles:
+            CFG.set("profiles", profiles + [profile])
 
     # 【新增】导出 Cookie 逻辑
-    def export_cookies(self):
-        src = os.path.abspath("my_browser_data")
+    def export_cookies(self, profile=DEFAULT_PROFILE):
+        profile = profile or DEFAULT_PROFILE
+        src = profile_data_dir(profile)
         if not os.path.exists(src):
-            cprint("❌ 未找到登录数据，无法导出", "danger")
+            cprint(f"❌ 未找到账号 [{profile}] 的登录数据，无法导出", "danger")
             return
         
-        dest = os.path.join(os.getcwd(), "cookies_backup.json")
+        fname = "cookies_backup.json" if profile == DEFAULT_PROFILE else f"cookies_backup_{profile}.json"
+        dest = os.path.join(os.getcwd(), fname)
         async def extract():
-            async with async_playwright() as p:
+            async with _async_playwright() as p:
                 bt = CFG.get("browser_type")
                 exe = find_system_browser(bt)
                 ctx = await p.chromium.launch_persistent_context(
@@ -1157,16 +3336,23 @@ def main():
     cprint("   X-Spider CLI (Ultimate v9.0)", "info")
     cprint("========================================", "info")
     
-    if not os.path.exists("my_browser_data"):
+    if not logged_in_profiles():
         cprint("⚠️ 未检测到登录信息，请先执行 'login' 命令", "warning")
     else:
-        cprint("✅ 登录凭证就绪", "success")
+        cprint(f"✅ 登录凭证就绪 (账号: {', '.join(logged_in_profiles())})", "success")
 
     engine = CrawlerEngine()
+    migrator = LayoutMigrator()
+    CFG.subscribe(lambda changed: "dir_layout" in changed and migrator.start(changed["dir_layout"]))
+    try:
+        engine.watchlist.load()
+        if len(engine.watchlist): cprint(f"⏰ 已加载 {len(engine.watchlist)} 个定时同步账号", "info")
+    except Exception as e:
+        cprint(f"⚠️ 监视列表读取失败: {e}", "warning")
     engine.start()
 
     cprint("\n指令列表:", "secondary")
-    cprint("  add <id>    : 添加博主", "secondary")
+    cprint("  add <id>    : 添加博主 (可选预算 --media/--mb/--min/--steps)", "secondary")
     cprint("  likes       : 下载喜欢", "secondary")
     cprint("  marks       : 下载书签", "secondary")
     cprint("  path <dir>  : 修改路径", "secondary")
@@ -1181,9 +3367,24 @@ def main():
     cprint("  deep on/off : 穿透开关", "secondary")
     cprint("  head on/off : 无头开关", "secondary")
     cprint("  stats       : 历史统计", "secondary")
-    cprint("  export      : 导出Cookie", "secondary")
+    cprint("  export [p]  : 导出Cookie", "secondary")
     cprint("  config      : 查看配置", "secondary")
-    cprint("  login       : 启动登录", "secondary")
+    cprint("  login [p]   : 启动登录(可指定账号)", "secondary")
+    cprint("  profiles    : 账号列表", "secondary")
+    cprint("  owner <p>   : 设置喜欢/书签所属账号", "secondary")
+    cprint("  log <file>  : 日志写入滚动文件(off 关闭)", "secondary")
+    cprint("  prio <id> <n>: 设置任务优先级", "secondary")
+    cprint("  sched <p>   : 调度策略(fifo/sjf)", "secondary")
+    cprint("  watch <id> [h]: 定时同步(间隔小时)", "secondary")
+    cprint("  unwatch <id>: 取消定时同步", "secondary")
+    cprint("  watchlist   : 定时同步列表", "secondary")
+    cprint("  diag [on/off]: 诊断模式(循环延迟/慢回调)", "secondary")
+    cprint("  profile [s] : 事件循环 cProfile 采样", "secondary")
+    cprint("  memsnap     : tracemalloc 内存快照", "secondary")
+    cprint("  trace <file>: 追踪输出(.json/.jsonl，off 关闭)", "secondary")
+    cprint("  store <m>   : 存储方式(files 散文件 / pack 打包)", "secondary")
+    cprint("  pack <op> <id>: 打包存储(import 收录散文件 / export 还原 / verify 校验)", "secondary")
+    cprint("  layout <m>  : 目录分层(flat/hash/date，切换后后台迁移已有文件，stop 停止)", "secondary")
     cprint("  exit        : 退出", "secondary")
     print("")
 
@@ -1200,18 +3401,27 @@ def main():
             cmd = parts[0].lower()
             
             if cmd == "exit" or cmd == "stop" or cmd == "quit":
+                migrator.stop()
                 engine.stop()
                 break
             
             elif cmd == "add":
                 if len(parts) > 1:
-                    raw_args = parts[1]
+                    # 可选预算: --media N --mb N --min N --steps N
+                    opts = dict(re.findall(r'--(media|mb|min|steps)\s+(\d+)', cmd_raw))
+                    raw_args = re.sub(r'--\w+\s+\d+', ' ', cmd_raw[3:])
                     ids = re.findall(r'@?([a-zA-Z0-9_]+)', raw_args)
-                    final_ids = set()
+                    final_ids = {}
                     for i in ids:
-                        if i.lower() not in ['x', 'com', 'https', 'http', 'twitter', 'www']: final_ids.add(i)
-                    for tid in final_ids: engine.add_task_to_queue(tid)
-                else: cprint("用法: add <id/url>", "warning")
+                        if i.lower() not in ['x', 'com', 'https', 'http', 'twitter', 'www']: final_ids[i] = None
+                    budget = {
+                        "max_media": opts.get("media"),
+                        "max_bytes": int(opts["mb"]) * 1024 * 1024 if "mb" in opts else 0,
+                        "max_seconds": int(opts["min"]) * 60 if "min" in opts else 0,
+                        "max_steps": opts.get("steps"),
+                    }
+                    engine.add_tasks_to_queue(final_ids, budget=budget)
+                else: cprint("用法: add <id/url> [--media N --mb N --min N --steps N]", "warning")
             
             elif cmd == "likes": engine.add_task_to_queue("MY_LIKES")
             elif cmd == "marks": engine.add_task_to_queue("MY_BOOKMARKS")
@@ -1301,14 +3511,134 @@ def main():
                 print_stats()
 
             elif cmd == "export":
-                engine.export_cookies()
+                profile = parts[1] if len(parts) > 1 else DEFAULT_PROFILE
+                if profile in configured_profiles(): engine.export_cookies(profile)
+                else: cprint(f"❌ 账号 [{profile}] 不存在 (输入 profiles 查看账号列表)", "danger")
+
+            elif cmd == "profiles":
+                owner = CFG.get("owner_profile") or DEFAULT_PROFILE
+                for p in configured_profiles():
+                    flag = "✅" if os.path.exists(profile_data_dir(p)) else "⚠️ 未登录"
+                    cprint(f"👤 {p:<12} {flag}{' (所有者)' if p == owner else ''}", "info")
+
+            elif cmd == "owner":
+                if len(parts) > 1 and parts[1] in configured_profiles():
+                    CFG.set("owner_profile", parts[1])
+                    cprint(f"👑 所有者账号: {parts[1]}", "success")
+                else: cprint(f"当前所有者账号: {CFG.get('owner_profile')}", "info")
+
+            elif cmd == "prio":
+                if len(parts) > 2 and parts[2].lstrip("-").isdigit():
+                    if not engine.set_task_priority(parts[1], int(parts[2])): cprint("任务不存在", "warning")
+                else: cprint("用法: prio <id> <n>", "warning")
+
+            elif cmd == "sched":
+                if len(parts) > 1 and parts[1] in ("fifo", "sjf"):
+                    CFG.set("schedule_policy", parts[1])
+                    cprint(f"📐 调度策略: {parts[1]}", "success")
+                else: cprint(f"当前调度策略: {CFG.get('schedule_policy')}", "info")
+
+            elif cmd == "watch":
+                args = parts[1:]
+                hours = float(args.pop()) if len(args) > 1 and re.fullmatch(r'\d+(\.\d+)?', args[-1]) else None
+                ids = [i for i in re.findall(r'@?([a-zA-Z0-9_]+)', " ".join(args))
+                       if i.lower() not in ['x', 'com', 'https', 'http', 'twitter', 'www']]
+                if ids:
+                    engine.watch_accounts(ids, hours)
+                    cprint(f"⏰ 已加入定时同步: {', '.join(ids)} (每 {hours or CFG.get('watch_interval_hours')} 小时)", "success")
+                else: cprint("用法: watch <id...> [间隔小时]", "warning")
+
+            elif cmd == "unwatch":
+                if len(parts) > 1 and engine.watchlist.unwatch(parts[1].lstrip("@")):
+                    engine._save_watchlist()
+                    cprint(f"🗑️ 已取消定时同步: {parts[1]}", "success")
+                else: cprint("用法: unwatch <id> (须在定时同步列表中)", "warning")
+
+            elif cmd == "watchlist":
+                items = engine.watchlist.snapshot()
+                if not items: cprint("定时同步列表为空", "info")
+                for e in items:
+                    due = time.strftime("%m-%d %H:%M", time.localtime(e["next_due"]))
+                    cprint(f"  {e['id']:<20} 每 {e['interval']:g} 小时  下次 {due}", "secondary")
+
+            elif cmd == "diag":
+                if len(parts) > 1 and parts[1].lower() in ("on", "off"):
+                    CFG.set("diagnostics", parts[1].lower() == "on")
+                    if not engine.is_running: cprint(f"🩺 诊断模式: {parts[1].upper()} (下次启动生效)", "success")
+                else:
+                    d = engine.diagnostics.status()
+                    cprint(f"🩺 诊断模式: {'ON' if d['enabled'] else 'OFF'}  循环延迟 p50 {d['lag_p50_ms']}ms / p99 {d['lag_p99_ms']}ms / 最大 {d['lag_max_ms']}ms", "info")
+                    for item in d["slow"]:
+                        cprint(f"  {item['count']:>4} 次  累计 {item['total_ms']:>6}ms  最长 {item['max_ms']:>5}ms  {item['site']}", "secondary")
+
+            elif cmd == "profile":
+                seconds = float(parts[1]) if len(parts) > 1 and re.fullmatch(r'\d+(\.\d+)?', parts[1]) else 10
+                engine.diagnostics.capture_profile(seconds)
+
+            elif cmd == "memsnap":
+                engine.diagnostics.capture_memory()
+
+            elif cmd == "trace":
+                target = cmd_raw[6:].strip().strip('"')
+                if not target: cprint(f"当前追踪文件: {CFG.get('trace_file') or '未开启'}", "info")
+                else:
+                    path = "" if target.lower() == "off" else os.path.abspath(target)
+                    CFG.set("trace_file", path)
+                    cprint(f"🧵 追踪文件: {path or '已关闭'}", "success")
+
+            elif cmd == "store":
+                if len(parts) > 1 and parts[1].lower() in ("files", "pack"):
+                    CFG.set("storage_mode", parts[1].lower())
+                    cprint(f"📦 存储方式: {parts[1].lower()}", "success")
+                else: cprint(f"当前存储方式: {CFG.get('storage_mode')}", "info")
+
+            elif cmd == "layout":
+                arg = parts[1].lower() if len(parts) > 1 else ""
+                if arg in DIR_LAYOUTS:
+                    if arg == CFG.get("dir_layout"): migrator.start(arg)  # 同一分层也重新整理（例如中断过的迁移）
+                    else: CFG.set("dir_layout", arg)
+                elif arg == "stop": migrator.stop()
+                else:
+                    st = migrator.status()
+                    cprint(f"🗂️ 目录分层: {CFG.get('dir_layout')}" + (f"  迁移中 → {st['layout']}：扫描 {st['scanned']} / 移动 {st['moved']}" if st["running"] else ""), "info")
+
+            elif cmd == "pack":
+                if len(parts) < 3 or parts[1] not in ("import", "export", "verify"):
+                    cprint("用法: pack import|export|verify <id>", "secondary")
+                else:
+                    tid = parts[2].lstrip("@")
+                    task_dir = task_save_dir(tid)
+                    store = pack_store(task_dir, CFG.get("pack_max_mb") * 1024 * 1024)
+                    if parts[1] == "import":
+                        cprint(f"📦 [{tid}] 已收录 {store.import_loose()} 个散文件", "success")
+                    elif parts[1] == "export":
+                        layout = CFG.get("dir_layout")
+                        links = migrator._load_links(task_dir) if layout == "date" else {}
+                        count = store.export(place=lambda name: pack_member_path(task_dir, name, links, layout))
+                        cprint(f"📤 [{tid}] 已还原 {count} 个文件 (目录分层: {layout})", "success")
+                    else:
+                        total, bad = store.verify()
+                        cprint(f"🔍 [{tid}] 校验 {total} 个成员，损坏 {len(bad)} 个", "warning" if bad else "success")
+                        for name in bad[:20]: cprint(f"  {name}", "secondary")
+
+            elif cmd == "log":
+                target = cmd_raw[4:].strip().strip('"')
+                if not target: cprint(f"当前日志文件: {CFG.get('log_file') or '未开启'}", "info")
+                else:
+                    path = "" if target.lower() == "off" else os.path.abspath(target)
+                    CFG.set("log_file", path)
+                    engine.log_sink.open_file(path)
+                    cprint(f"📝 日志文件: {path or '已关闭'}", "success")
 
             elif cmd == "config":
                 cprint(json.dumps(CFG.data, indent=2, ensure_ascii=False), "secondary")
 
             elif cmd == "login":
                 if engine.is_running: cprint("请先 exit 停止引擎", "warning")
-                else: asyncio.run(engine.run_login())
+                else:
+                    profile = parts[1] if len(parts) > 1 else DEFAULT_PROFILE
+                    if re.fullmatch(r"[A-Za-z0-9_-]+", profile): asyncio.run(engine.run_login(profile))
+                    else: cprint("账号名仅支持字母、数字、_ 和 -", "danger")
             
             else: cprint("未知指令 (输入 help 查看说明)", "secondary")
 
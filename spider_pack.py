@@ -0,0 +1,188 @@
+"""
+X-Spider 打包存储模式
+下载的媒体按任务追加写入滚动的 tar 包（<任务目录>/packs/pack_00001.tar …），每个包写满后换下一个；
+packs/index.jsonl 记录 成员名 → 包号 / 数据偏移 / 大小 / CRC32，按偏移随机读取，不需要遍历 tar。
+每次追加后包文件仍是合法的 tar（末尾补结束标记），可直接用 tar / 7-Zip 解开，也可用 export 还原为散文件。
+"""
+import os
+import json
+import time
+import zlib
+import tarfile
+import threading
+
+PACK_DIR = "packs"
+INDEX_FILE = "index.jsonl"
+STAGING_DIR = "staging"
+BLOCK = tarfile.BLOCKSIZE
+MEDIA_DIRS = ("图片", "Gif")
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def member_name(name):
+    """成员名只取 媒体子目录/文件名（图片/123.jpg），与目录分层无关：切换分层后仍能按同一名字去重和查找"""
+    parts = name.replace(os.sep, "/").split("/")
+    return f"{parts[0]}/{parts[-1]}"
+
+def has_packs(task_dir):
+    return os.path.exists(os.path.join(task_dir, PACK_DIR, INDEX_FILE))
+
+def pack_store(task_dir, max_bytes=None):
+    """同一任务目录在进程内共用一个 PackStore（多个下载线程并发追加）"""
+    key = os.path.abspath(task_dir)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None: store = _stores[key] = PackStore(key)
+        if max_bytes: store.max_bytes = max_bytes
+        return store
+
+class PackStore:
+    """单个任务目录的打包存储；成员名见 member_name，如 图片/123.jpg"""
+    def __init__(self, task_dir, max_bytes=1024 * 1024 * 1024):
+        self.task_dir = task_dir
+        self.dir = os.path.join(task_dir, PACK_DIR)
+        self.max_bytes = max_bytes
+        self.lock = threading.RLock()
+        self.entries = {}   # {成员名: (包号, 数据偏移, 大小, crc32)}
+        self.current = 0    # 当前追加的包号，0 表示还没有包
+        self.end = 0        # 当前包最后一个成员的结尾（结束标记之前）
+        self._loaded = False
+
+    def _pack_path(self, n):
+        return os.path.join(self.dir, f"pack_{n:05d}.tar")
+
+    def _load(self):
+        if self._loaded: return
+        with self.lock:
+            if self._loaded: return
+            try:
+                with open(os.path.join(self.dir, INDEX_FILE), "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            e = json.loads(line)
+                            # 早期按分层路径写入的成员（图片/ab/cd/123.jpg）同样按 member_name 收录
+                            self.entries[member_name(e["name"])] = (e["pack"], e["offset"], e["size"], e["crc"])
+                        except: pass  # 写到一半的最后一行
+            except FileNotFoundError:
+                pass
+            # 索引是唯一依据：没进索引的尾部数据（崩溃前写了一半）下次追加时直接覆盖
+            for pack, offset, size, _ in self.entries.values():
+                end = offset + size + (-size) % BLOCK
+                if pack > self.current: self.current, self.end = pack, end
+                elif pack == self.current: self.end = max(self.end, end)
+            self._loaded = True  # 读完索引再置位，不加锁的查询不会看到读了一半的索引
+
+    # 查询不加锁：成员在数据写完后才进 entries，不必等正在追加的其他文件
+    def contains(self, name):
+        self._load()
+        return name in self.entries
+
+    def names(self):
+        self._load()
+        return list(self.entries)
+
+    def size(self, name):
+        self._load()
+        return self.entries[name][2]
+
+    def staging_path(self, name):
+        """下载中的临时文件放在 packs/staging 下，成功后再追加进包"""
+        return os.path.join(self.dir, STAGING_DIR, name.replace("/", "_") + ".tmp")
+
+    def add(self, name, src_path):
+        """把 src_path 追加为成员 name，返回写入字节数；同名成员已存在时不重复写入"""
+        size = os.path.getsize(src_path)
+        with self.lock:
+            self._load()
+            if name in self.entries: return 0
+            os.makedirs(self.dir, exist_ok=True)
+            if not self.current or self.end and self.end + size > self.max_bytes:
+                self.current, self.end = self.current + 1, 0
+            info = tarfile.TarInfo(name)
+            info.size, info.mtime, info.mode = size, int(time.time()), 0o644
+            header = info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+            path = self._pack_path(self.current)
+            crc = 0
+            with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+                f.seek(self.end)
+                f.write(header)
+                offset = self.end + len(header)
+                with open(src_path, "rb") as src:
+                    while True:
+                        chunk = src.read(1024 * 1024)
+                        if not chunk: break
+                        crc = zlib.crc32(chunk, crc)
+                        f.write(chunk)
+                # 补齐块并写入两个零块作为 tar 结束标记，截掉之前残留的尾部
+                f.write(b"\0" * ((-size) % BLOCK + 2 * BLOCK))
+                f.truncate()
+            self.end = offset + size + (-size) % BLOCK
+            with open(os.path.join(self.dir, INDEX_FILE), "a", encoding="utf-8") as f:
+                f.write(json.dumps({"name": name, "pack": self.current, "offset": offset, "size": size, "crc": crc}, ensure_ascii=False) + "\n")
+            self.entries[name] = (self.current, offset, size, crc)
+            return size
+
+    def read(self, name):
+        with self.lock:
+            self._load()
+            pack, offset, size, _ = self.entries[name]
+        with open(self._pack_path(pack), "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+
+    def verify(self):
+        """逐个校验成员的大小与 CRC32，返回 (成员总数, 损坏或缺失的成员名列表)"""
+        with self.lock:
+            self._load()
+            items = sorted(self.entries.items(), key=lambda kv: kv[1][:2])
+        bad = []
+        handles = {}
+        try:
+            for name, (pack, offset, size, crc) in items:
+                try:
+                    f = handles.get(pack)
+                    if f is None: f = handles[pack] = open(self._pack_path(pack), "rb")
+                    f.seek(offset)
+                    data = f.read(size)
+                    if len(data) != size or zlib.crc32(data) != crc: bad.append(name)
+                except OSError:
+                    bad.append(name)
+        finally:
+            for f in handles.values(): f.close()
+        return len(items), bad
+
+    def export(self, dest_dir=None, names=None, place=None):
+        """把成员还原为散文件，已存在且大小一致的跳过，返回还原数量；
+        place(成员名) 返回目标路径（按目录分层放置），默认平铺在 dest_dir（任务目录）的 图片 / Gif 下"""
+        dest_dir = dest_dir or self.task_dir
+        count = 0
+        for name in names or self.names():
+            target = place(name) if place else os.path.join(dest_dir, *name.split("/"))
+            try:
+                if os.path.exists(target) and os.path.getsize(target) == self.size(name): continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with open(target + ".tmp", "wb") as f: f.write(self.read(name))
+                os.replace(target + ".tmp", target)
+                count += 1
+            except (OSError, KeyError):
+                pass
+        return count
+
+    def import_loose(self, subdirs=MEDIA_DIRS, remove=True):
+        """把任务目录下已有的散文件收进包里（默认收录后删除原文件），返回收录数量"""
+        count = 0
+        for sub in subdirs:
+            for dirpath, _, files in os.walk(os.path.join(self.task_dir, sub)):
+                for fname in sorted(files):
+                    if fname.endswith(".tmp"): continue
+                    src = os.path.join(dirpath, fname)
+                    try:
+                        name = member_name(os.path.relpath(src, self.task_dir))
+                        if not self.contains(name):
+                            self.add(name, src)
+                            count += 1
+                        if remove: os.remove(src)
+                    except OSError:
+                        pass
+        return count
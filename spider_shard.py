@@ -0,0 +1,266 @@
+"""
+X-Spider 多进程分片模式
+协调进程把任务列表切成 N 份，每个工作进程运行独立的 CrawlerEngine、Playwright 实例与浏览器账号副本；
+各分片的任务互不重叠、写入各自的目录；全局下载并发跨进程共享，日志 / 状态 / 进度经本地 IPC 队列汇总回界面或命令行。
+"""
+import os
+import sys
+import time
+import queue
+import shutil
+import threading
+import multiprocessing as mp
+import spider_core as sc
+from spider_core import CrawlerEngine, TaskRegistry, CFG, cprint, configured_profiles, profile_data_dir, PINNED_TASKS
+
+# 复制账号数据时跳过的锁文件与缓存（缓存体积大且与登录态无关）
+PROFILE_COPY_IGNORE = shutil.ignore_patterns("Singleton*", "lockfile", "LOCK", "*.lock", "Cache", "Code Cache", "GPUCache", "ShaderCache", "GrShaderCache")
+
+def shard_tasks(tids, n, costs=None):
+    """按预计耗时贪心分配（耗时长的先分给最空闲的分片），喜欢 / 书签固定在第 0 片"""
+    costs = costs or {}
+    shards, load = [[] for _ in range(n)], [0.0] * n
+    for tid in sorted(tids, key=lambda t: -costs.get(t, 1)):
+        i = 0 if tid in PINNED_TASKS else load.index(min(load))
+        shards[i].append(tid)
+        load[i] += costs.get(tid, 1)
+    return shards
+
+def copy_profiles(n):
+    """为每个分片复制一份已登录账号的浏览器数据（Chromium 不允许多个进程共用同一数据目录）"""
+    copied = []
+    for shard in range(n):
+        for profile in configured_profiles():
+            src = profile_data_dir(profile)
+            if not os.path.exists(src): continue
+            dest = src + f"_shard{shard}"
+            try:
+                shutil.copytree(src, dest, ignore=PROFILE_COPY_IGNORE, dirs_exist_ok=True)
+            except shutil.Error:
+                pass  # 个别被占用的文件复制失败不影响登录态
+            copied.append(dest)
+    return copied
+
+def remove_profiles(copied):
+    """分片运行结束后删除账号数据副本（登录态以原目录为准，下次启动重新复制）"""
+    for dest in copied:
+        shutil.rmtree(dest, ignore_errors=True)
+
+# ================= 工作进程 =================
+def _shard_worker(shard, tids, meta, events, control, shared):
+    """工作进程入口：运行独立引擎执行本分片任务，全部结束（或收到停止指令）后退出"""
+    sc.set_profile_suffix(f"_shard{shard}")
+    emit = lambda *ev: events.put((shard,) + ev)
+    registry = TaskRegistry()
+    for tid in tids:
+        registry.add([tid], budget=meta.get(tid, {}).get("budget"))
+        if meta.get(tid, {}).get("priority"): registry.set_priority(tid, meta[tid]["priority"])
+
+    idle = threading.Event()
+    def on_change(changes):
+        emit("state", [(tid, new, registry.errors.get(tid)) for tid, _, new in changes])
+        if not any(registry.count(st) for st in ("queued", "launching", "running")): idle.set()
+    registry.subscribe(on_change)
+
+    def wait_control():
+        # 控制通道只有一种指令：stop
+        control.get()
+        emit("log", "⏹️ 收到停止指令", "warning")
+        idle.set()
+    threading.Thread(target=wait_control, daemon=True).start()
+
+    callbacks = {
+        'on_log': lambda msg, level="info": emit("log", msg, level),
+        'on_progress': lambda tid, count: emit("progress", tid, count),
+        'on_task_finished': lambda tid: emit("finished", tid),
+    }
+    engine = CrawlerEngine(callbacks, registry=registry)
+    engine.shared = shared
+    engine.start()
+    # 等待引擎就绪（未登录等原因启动失败时 is_running 会被置回 False）
+    deadline = time.monotonic() + 120
+    while engine.is_running and not engine.engine_ready_event.is_set() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    if engine.engine_ready_event.is_set():
+        engine.add_tasks_to_queue(tids)
+        idle.wait()
+    if engine.is_running:
+        engine.manual_shutdown = True
+        engine.stop()
+    if engine.thread: engine.thread.join(timeout=60)
+    engine.log_sink.flush()
+    emit("done", {tid: (st, registry.errors.get(tid)) for tid, st in registry.snapshot()})
+
+# ================= 协调进程 =================
+class ShardCoordinator:
+    """把任务分给 N 个工作进程并汇总状态；对外提供与引擎一致的状态查询接口"""
+    def __init__(self, callbacks=None, registry=None, workers=None, watchlist=None):
+        self.cbs = callbacks if callbacks else {}
+        self.registry = registry if registry is not None else TaskRegistry()
+        self.workers = int(workers or CFG.get("shard_workers") or 1)
+        self.watchlist = watchlist
+        self.ctx = mp.get_context("spawn")  # Playwright 与线程状态不能被 fork 继承
+        self.procs = []
+        self.controls = []
+        self.manager = None
+        self.events = None
+        self.shard_of = {}    # {tid: 分片号}
+        self.progress = {}    # {tid: 已下载数}
+        self.results = {}     # 各分片结束时上报的剩余任务状态
+        self.is_running = False
+        self.started_at = None
+        self.profile_copies = []
+        self.stop_requested = False
+
+    def _emit_log(self, msg, level="info"):
+        if self.cbs.get('on_log'): self.cbs['on_log'](msg, level)
+        else: cprint(msg, level)
+
+    def start(self, tids=None):
+        """启动分片运行；tids 为空时取登记表中待启动 / 部分完成 / 失败的任务"""
+        if self.is_running: return False
+        tids = list(dict.fromkeys(tids)) if tids else self.registry.ids(("pending", "partial", "error"))
+        if not tids:
+            self._emit_log("⚠️ 没有可执行的任务", "warning")
+            return False
+        self.registry.add(tids)
+        n = max(1, min(self.workers, len(tids)))
+        estimator = CrawlerEngine(registry=TaskRegistry())  # 只借用按历史估算耗时的逻辑
+        shards = shard_tasks(tids, n, {tid: estimator._estimate_cost(tid) for tid in tids})
+        self.procs, self.controls, self.results, self.progress = [], [], {}, {}
+        self.manager = None
+        self.registry.enqueue(tids)
+        self.is_running = True
+        self.stop_requested = False
+        self.started_at = time.monotonic()
+        # 复制账号数据可能要几秒到几十秒，放到后台线程，不阻塞界面 / 命令行
+        threading.Thread(target=self._launch, args=(tids, shards), daemon=True).start()
+        return True
+
+    def _launch(self, tids, shards):
+        """复制账号数据、启动各分片进程，然后汇总事件直到全部结束"""
+        self._emit_log(f"📂 正在为 {len(shards)} 个分片复制账号数据...", "info")
+        try:
+            self.profile_copies = copy_profiles(len(shards))
+        except OSError as e:
+            self._emit_log(f"❌ 复制账号数据失败: {e}", "danger")
+            self.stop_requested = True
+        if self.stop_requested:
+            self._finish()
+            return
+        self.manager = self.ctx.Manager()
+        shared = {"slots": self.manager.BoundedSemaphore(int(CFG.get("download_threads")))}
+        self.events = self.ctx.Queue()
+        for shard, part in enumerate(shards):
+            meta = {tid: {"budget": self.registry.budgets.get(tid), "priority": self.registry.priority.get(tid)} for tid in part}
+            control = self.ctx.Queue()
+            proc = self.ctx.Process(target=_shard_worker, args=(shard, part, meta, self.events, control, shared), daemon=True)
+            proc.start()
+            self.procs.append(proc)
+            self.controls.append(control)
+            for tid in part: self.shard_of[tid] = shard
+        self._emit_log(f"🧩 分片模式启动: {len(tids)} 个任务 → {len(shards)} 个工作进程 (全局下载并发 {CFG.get('download_threads')})", "success")
+        self._pump()
+
+    def stop(self):
+        self.stop_requested = True  # 还在复制账号数据时，复制完直接结束，不再启动分片
+        for control in self.controls:
+            try: control.put("stop")
+            except: pass
+
+    def _pump(self):
+        """汇总各分片的事件；超时只用于发现异常退出（未上报 done）的工作进程"""
+        pending = set(range(len(self.procs)))
+        while pending:
+            try:
+                shard, kind, *args = self.events.get(timeout=2)
+            except queue.Empty:
+                for shard in [s for s in pending if not self.procs[s].is_alive()]:
+                    pending.discard(shard)
+                    self._shard_lost(shard)
+                continue
+            try: self._handle(shard, kind, args)
+            except Exception as e: self._emit_log(f"⚠️ 分片事件处理失败: {e}", "warning")
+            if kind == "done": pending.discard(shard)
+        self._finish()
+
+    def _handle(self, shard, kind, args):
+        if kind == "log":
+            msg, level = args
+            self._emit_log(f"[#{shard}] {msg}", level)
+        elif kind == "progress":
+            tid, count = args
+            self.progress[tid] = count
+            if self.cbs.get('on_progress'): self.cbs['on_progress'](tid, count)
+        elif kind == "state":
+            for tid, new, error in args[0]:
+                # 完成由 finished 事件处理；其余状态镜像到协调进程的登记表
+                if new is not None: self.registry.set_state(tid, new, error)
+        elif kind == "finished":
+            tid = args[0]
+            self.registry.remove(tid)
+            if self.watchlist is not None and self.watchlist.mark_run(tid):
+                try: self.watchlist.save()
+                except: pass
+            if self.cbs.get('on_task_finished'): self.cbs['on_task_finished'](tid)
+        elif kind == "done":
+            self.results[shard] = args[0]
+
+    def _shard_lost(self, shard):
+        """工作进程异常退出：其未完成的任务标记为失败"""
+        lost = [tid for tid, s in self.shard_of.items() if s == shard and self.registry.state(tid) in ("queued", "launching", "running")]
+        for tid in lost: self.registry.set_state(tid, "error", "工作进程异常退出")
+        self._emit_log(f"❌ 分片 #{shard} 异常退出 (退出码 {self.procs[shard].exitcode})，{len(lost)} 个任务标记为失败", "danger")
+
+    def _finish(self):
+        # 停止后仍处于执行相关状态的任务恢复为待启动，下次继续
+        for tid in self.registry.ids(("queued", "launching", "running")):
+            self.registry.set_state(tid, "pending")
+        for proc in self.procs: proc.join(timeout=5)
+        try: self.manager.shutdown()
+        except: pass
+        remove_profiles(self.profile_copies)
+        self.profile_copies = []
+        self.is_running = False
+        elapsed = time.monotonic() - self.started_at
+        total = sum(self.progress.values())
+        self._emit_log(f"🏁 分片运行结束: 下载 {total} 个文件，耗时 {elapsed:.0f}s，剩余 {len(self.registry)} 个任务", "success")
+        if self.cbs.get('on_done'): self.cbs['on_done'](self.results)
+
+    # -------- 与引擎一致的状态查询接口 --------
+    def _status_item(self, tid, state):
+        item = {"id": tid, "status": state, "state": state, "progress": self.progress.get(tid, 0),
+                "priority": self.registry.priority.get(tid, 0), "shard": self.shard_of.get(tid)}
+        if state == "launching": item["status"] = "queued"
+        if state in ("error", "partial"): item["error"] = self.registry.errors.get(tid, "任务执行失败")
+        if tid in self.registry.budgets: item["budget"] = self.registry.budgets[tid]
+        return item
+
+    def get_queue_status(self):
+        return [self._status_item(tid, st) for tid, st in self.registry.snapshot()]
+
+    def get_task_status(self, tids):
+        return [self._status_item(tid, st) for tid, st in ((t, self.registry.state(t)) for t in tids) if st]
+
+def main():
+    """命令行：python spider_shard.py [-n 进程数] <id...>"""
+    args = sys.argv[1:]
+    workers = None
+    if len(args) > 1 and args[0] == "-n":
+        workers, args = int(args[1]), args[2:]
+    tids = [a.lstrip("@") for a in args]
+    if not tids:
+        cprint("用法: python spider_shard.py [-n 进程数] <id...>", "warning")
+        return
+    done = threading.Event()
+    coordinator = ShardCoordinator({'on_done': lambda results: done.set()}, workers=workers)
+    if not coordinator.start(tids): return
+    try:
+        done.wait()
+    except KeyboardInterrupt:
+        cprint("⏹️ 正在停止所有分片...", "warning")
+        coordinator.stop()
+        done.wait(timeout=90)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+from spider_core import CFG, CrawlerEngine
+
+@pytest.fixture
+def cfg():
+    """临时覆盖配置：cfg(key=value, ...)，用例结束后恢复原有的覆盖值"""
+    saved = dict(CFG.overrides)
+    def override(**values):
+        for key, value in values.items(): CFG.override(key, value)
+    yield override
+    CFG.set_overrides(saved)
+
+@pytest.fixture
+def engine(cfg):
+    """不启动浏览器的引擎：任务 alice 分配到默认账号，翻页不等待"""
+    cfg(min_page_delay=0, max_scrolls=50, stop_thresh=1000, deep_scan=False, timeout=5, resume_checkpoints=False)
+    eng = CrawlerEngine()
+    eng.is_running = True
+    eng.is_ctx_alive = True
+    eng.task_profiles["alice"] = "default"
+    yield eng
+    eng.log_sink.flush()
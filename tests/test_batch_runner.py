@@ -0,0 +1,21 @@
+"""
+无界面批处理（user-043）：结束判定与任务列表解析
+"""
+from batch_runner import BatchRun, parse_task_ids
+
+def test_status_urls_are_skipped():
+    text = "https://x.com/alice/status/1234567890 @bob\nhttps://x.com/carol/media MY_LIKES  # 注释 dave"
+    assert parse_task_ids(text) == ["bob", "carol", "MY_LIKES"]
+
+def test_waits_for_finished_callback_not_registry_empty():
+    batch = BatchRun(["a", "b"])
+    batch.engine.is_running = True
+    batch.registry.add(["a", "b"])
+    batch.armed = True
+    batch.registry.set_state("b", "error", "boom")
+    batch.registry.set_state("a", "running")
+    batch.registry.remove("a")  # 引擎先从登记表移除完成的任务，再回调 on_task_finished
+    assert not batch.idle.is_set()
+    batch._on_finished("a")
+    assert batch.idle.is_set()
+    assert batch.stats["a"]["state"] == "finished" and batch.stats["b"]["state"] == "error"
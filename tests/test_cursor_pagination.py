@@ -0,0 +1,131 @@
+"""
+免滚动游标翻页：用桩 request_ctx 模拟 GraphQL 时间线接口，驱动 _cursor_pagination 完整走一遍
+（user-026 游标翻页；user-042 断点续传的安全游标）
+"""
+import json
+import time
+import asyncio
+from urllib.parse import urlsplit, parse_qsl
+
+from spider_core import build_cursor_url, find_timeline_cursor
+from timeline_stubs import TEMPLATE_URL, make_page, StubRequestContext, StubTimelineResponse, StubPage, install_stub_browser
+
+def make_state(cursor="c1"):
+    return {"streak": 0, "template": {"url": TEMPLATE_URL, "headers": {}}, "cursor": cursor,
+            "crossed": False, "complete": False, "top_key": None, "top_entries": None}
+
+def run(engine, state, ctx, start_step=0):
+    seen = []
+    async def on_page(data):
+        seen.append(data)
+    result = asyncio.run(engine._cursor_pagination("alice", "alice", state, on_page, ctx, start_step))
+    return result, seen
+
+def test_find_timeline_cursor():
+    page = make_page([3, 2], "next")
+    page["extra"] = {"cursorType": "Top", "value": "prev"}
+    assert find_timeline_cursor(page) == "next"
+    assert find_timeline_cursor(page, "Top") == "prev"
+    assert find_timeline_cursor(make_page([1], None)) is None
+
+def test_build_cursor_url_keeps_other_variables():
+    url = build_cursor_url(TEMPLATE_URL, "c/9+=")
+    query = dict(parse_qsl(urlsplit(url).query))
+    assert json.loads(query["variables"]) == {"userId": "42", "count": 20, "cursor": "c/9+="}
+    assert query["features"] == "{}"
+    assert urlsplit(url).path == urlsplit(TEMPLATE_URL).path
+
+def test_follows_cursors_until_empty_page(engine):
+    pages = {"c1": make_page([9, 8], "c2"), "c2": make_page([7, 6], "c3"), "c3": make_page([], "c4")}
+    ctx = StubRequestContext(pages)
+    state = make_state()
+    result, seen = run(engine, state, ctx)
+    assert result == "FINISHED"
+    assert ctx.cursors == ["c1", "c2", "c3"]
+    assert len(seen) == 3
+    assert state["complete"] is True
+
+def test_stops_when_cursor_repeats(engine):
+    ctx = StubRequestContext({"c1": make_page([5], "c1")})
+    state = make_state()
+    assert run(engine, state, ctx)[0] == "FINISHED"
+    assert ctx.cursors == ["c1"]
+
+def test_transient_errors_are_retried(engine):
+    pages = {"c1": make_page([9], "c2"), "c2": make_page([], None)}
+    ctx = StubRequestContext(pages, responses=[500, 502, 200, 200])
+    result, seen = run(engine, make_state(), ctx)
+    assert result == "FINISHED"
+    assert ctx.cursors == ["c1", "c1", "c1", "c2"]
+
+def test_repeated_errors_fall_back_to_scrolling(engine):
+    ctx = StubRequestContext({}, responses=[500, 500, 500])
+    state = make_state()
+    assert run(engine, state, ctx)[0] == "FALLBACK"
+    assert state["complete"] is False
+
+def test_rate_limit_without_reset_fails(engine):
+    ctx = StubRequestContext({}, responses=[429])
+    assert run(engine, make_state(), ctx)[0] == "FAILED"
+
+def test_step_budget_returns_partial(engine):
+    pages = {f"c{i}": make_page([100 - i], f"c{i + 1}") for i in range(1, 10)}
+    engine.registry.add(["alice"], budget={"max_steps": 2})
+    ctx = StubRequestContext(pages)
+    state = make_state()
+    assert run(engine, state, ctx)[0] == "PARTIAL"
+    assert ctx.cursors == ["c1", "c2"]
+    assert state["cursor"] == "c3" and state["complete"] is False
+
+def test_streak_threshold_stops(engine, cfg):
+    cfg(stop_thresh=2)
+    pages = {"c1": make_page([9], "c2"), "c2": make_page([8], "c3")}
+    state = make_state()
+    async def on_page(data):
+        state["streak"] += 1
+    result = asyncio.run(engine._cursor_pagination("alice", "alice", state, on_page, StubRequestContext(pages)))
+    assert result == "FINISHED" and state["complete"] is True
+
+# user-042：有下载失败后安全游标不再前移
+def test_safe_cursor_stops_after_failed_download(engine):
+    dl = engine.dl_manager
+    dl.is_running = True
+    dl.register_task("alice")
+    state = make_state("c1")
+    engine._track_checkpoint("alice", state, 1)
+    assert state["safe_cursor"] == "c1"
+    dl.failed["alice"] += 1  # 一个下载失败后，安全游标停在失败之前
+    state["cursor"] = "c2"
+    engine._track_checkpoint("alice", state, 2)
+    assert (state["safe_cursor"], state["safe_steps"]) == ("c1", 1)
+
+# user-042：续传写入断点游标后，页面迟到的首页响应不能把游标改回开头
+def test_resume_cursor_survives_late_page_response(engine, cfg, tmp_path):
+    cfg(save_path=str(tmp_path), resume_checkpoints=True)
+    save_dir = tmp_path / "博主图集" / "alice"
+    save_dir.mkdir(parents=True)
+    (save_dir / "sync_state.json").write_text(json.dumps({"checkpoint": {"cursor": "c5", "steps": 5, "top_key": None}}), encoding="utf-8")
+    # 额度偏低时翻页前先减速等待，迟到的响应正好在这段等待里到达
+    engine.rate_budget.budgets[engine._task_budget_key("alice", "UserMedia")] = {"limit": 100, "remaining": 10, "reset": time.time() + 0.4}
+
+    page = StubPage()
+    head = make_page([100], "c1")
+    ctx = StubRequestContext({"c1": head, "c5": make_page([50], "c6"), "c6": make_page([40], None)})
+
+    def on_goto(p):
+        p.emit(StubTimelineResponse(head))
+        p.emit(StubTimelineResponse(head, delay=0.02))
+    install_stub_browser(engine, page, ctx, on_goto)
+
+    assert asyncio.run(engine._mission_body_logic("alice")) == "FINISHED"
+    assert ctx.cursors == ["c5", "c6"]
+
+# user-030：回收页面后接着翻页时，预算按本次运行已走的步数继续计，而不是从 start_step 重新开始
+def test_step_budget_counts_steps_spent_before_handoff(engine):
+    pages = {f"c{i}": make_page([100 - i], f"c{i + 1}") for i in range(1, 10)}
+    engine.registry.add(["alice"], budget={"max_steps": 3})
+    ctx = StubRequestContext(pages)
+    state = make_state()
+    state["spent"] = 2
+    assert run(engine, state, ctx, start_step=7)[0] == "PARTIAL"
+    assert ctx.cursors == ["c1"]
@@ -0,0 +1,51 @@
+"""
+目录分层迁移与打包存储（user-050）：迁移跳过下载中的文件，包成员名与分层方式无关
+"""
+import os
+import time
+
+from spider_core import LayoutMigrator, DownloadManager, media_dest, pack_member_path
+from spider_pack import PackStore
+
+def write(path, data=b"x" * 2048, mtime=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f: f.write(data)
+    if mtime: os.utime(path, (mtime, mtime))
+
+def test_migrator_skips_files_still_being_written(tmp_path):
+    task_dir = tmp_path / "博主图集" / "alice"
+    (task_dir / "history.txt").parent.mkdir(parents=True)
+    (task_dir / "history.txt").write_text("done\n", encoding="utf-8")
+    old = time.time() - 3600
+    write(str(task_dir / "图片" / "done.jpg"))
+    write(str(task_dir / "图片" / "legacy.jpg"), mtime=old)   # 早期遗留、未进 history 的文件
+    write(str(task_dir / "图片" / "writing.jpg"))             # 下载中：刚修改且未进 history
+
+    migrator = LayoutMigrator(emit=lambda *a: None)
+    migrator.start("hash", root=str(tmp_path))
+    migrator.thread.join()
+
+    for f_id in ("done", "legacy"):
+        assert os.path.exists(media_dest(str(task_dir), "img", f_id, layout="hash"))
+    assert os.path.exists(task_dir / "图片" / "writing.jpg")
+    assert (migrator.moved, migrator.skipped) == (2, 1)
+
+def test_pack_member_name_ignores_layout(tmp_path, cfg):
+    task_dir = str(tmp_path / "alice")
+    cfg(storage_mode="pack")
+    dm = DownloadManager({}, max_threads=1)
+    hashed = media_dest(task_dir, "img", "123", layout="hash")
+    store, name = dm._pack_target(hashed)
+    assert name == "图片/123.jpg"
+    assert dm._pack_target(media_dest(task_dir, "img", "123", layout="flat"))[1] == name
+    dm.executor.shutdown()
+
+    src = str(tmp_path / "src.jpg")
+    write(src)
+    store = PackStore(task_dir)
+    store.add(name, src)
+    # 重新加载索引后仍按同一成员名找到，按当前分层还原到对应子目录
+    reopened = PackStore(task_dir)
+    assert reopened.contains("图片/123.jpg")
+    assert reopened.export(place=lambda n: pack_member_path(task_dir, n, layout="hash")) == 1
+    assert os.path.getsize(hashed) == 2048
@@ -0,0 +1,49 @@
+"""
+GraphQL 端点限流额度（user-029 x-rate-limit-* 响应头）
+"""
+import time
+
+from spider_core import RateLimitBudget
+
+EP = "UserMedia"
+
+def headers(limit, remaining, reset):
+    return {"x-rate-limit-limit": str(limit), "x-rate-limit-remaining": str(remaining), "x-rate-limit-reset": str(int(reset))}
+
+def test_update_parses_rate_limit_headers():
+    budget = RateLimitBudget()
+    reset = time.time() + 120
+    budget.update(EP, headers(150, 149, reset))
+    assert budget.budgets[EP] == {"limit": 150, "remaining": 149, "reset": int(reset)}
+    snap = budget.snapshot(EP)
+    assert snap["remaining"] == 149 and 110 <= snap["reset_in"] <= 120
+
+def test_update_ignores_missing_or_malformed_headers():
+    budget = RateLimitBudget()
+    budget.update(EP, {"x-rate-limit-remaining": "5"})
+    budget.update(EP, headers(150, "abc", time.time() + 60))
+    budget.update(EP, {})
+    assert EP not in budget.budgets
+    assert budget.park_seconds(EP) == 0 and budget.pace_seconds(EP) == 0
+
+def test_parks_until_reset_when_reserve_reached():
+    budget = RateLimitBudget(reserve=2)
+    budget.update(EP, headers(150, 2, time.time() + 30))
+    assert 29 <= budget.park_seconds(EP) <= 31
+    # 额度还有富余时不停靠
+    budget.update(EP, headers(150, 100, time.time() + 30))
+    assert budget.park_seconds(EP) == 0
+
+def test_budget_recovers_after_reset():
+    budget = RateLimitBudget()
+    budget.update(EP, headers(150, 0, time.time() - 1))
+    assert budget.park_seconds(EP) == 0
+    assert EP not in budget.budgets
+
+def test_paces_remaining_requests_until_reset():
+    budget = RateLimitBudget(reserve=2, slow_ratio=0.2)
+    budget.update(EP, headers(100, 50, time.time() + 60))
+    assert budget.pace_seconds(EP) == 0
+    # 剩余 12 个，预留 2 个：60 秒均摊给 10 个请求
+    budget.update(EP, headers(100, 12, time.time() + 60))
+    assert 5.5 <= budget.pace_seconds(EP) <= 6.1
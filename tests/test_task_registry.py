@@ -0,0 +1,94 @@
+"""
+任务登记表与调度（user-035 登记表 / user-038 sjf 代价分与老化）：纯数据结构，不需要浏览器
+"""
+import time
+
+import pytest
+
+from spider_core import CrawlerEngine, TaskRegistry
+
+def drain(registry):
+    out = []
+    while True:
+        tid = registry.pop_next()
+        if tid is None: return out
+        out.append(tid)
+
+def test_fifo_within_priority_and_priority_first():
+    reg = TaskRegistry()
+    reg.enqueue(["a", "b", "c", "d"])
+    reg.set_priority("c", 5)
+    reg.set_priority("d", -1)
+    assert drain(reg) == ["c", "a", "b", "d"]
+
+def test_sjf_scorer_orders_by_cost():
+    reg = TaskRegistry()
+    costs = {"big": 500, "small": 5, "mid": 50}
+    reg.scorer = lambda tid, at: costs[tid]
+    reg.enqueue(["big", "small", "mid"])
+    assert drain(reg) == ["small", "mid", "big"]
+
+def test_stale_heap_entries_are_skipped():
+    reg = TaskRegistry()
+    reg.enqueue(["a", "b", "c"])
+    reg.set_priority("c", 1)        # 旧的调度键留在堆里
+    reg.set_priority("c", 0)
+    reg.remove("a")
+    reg.set_state("b", "pending")   # 离开排队后不应再被取出
+    reg.pause("c")                  # 暂停与状态正交，仍按顺序出队
+    assert drain(reg) == ["c"]
+    assert not reg.has_queued()
+
+def test_launching_running_transitions():
+    reg = TaskRegistry()
+    changes = []
+    reg.subscribe(changes.extend)
+    reg.enqueue(["a", "b"])
+    assert reg.pop_next() == "a" and reg.state("a") == "launching"
+    assert reg.set_state("a", "running")
+    assert (reg.count("queued"), reg.count("launching"), reg.count("running")) == (1, 0, 1)
+    reg.reset_active()
+    assert reg.ids("pending") == ["a", "b"]
+    assert ("a", "launching", "running") in changes
+    reg.remove("a")
+    assert not reg.set_state("a", "running")  # 已删除的任务不会被重新登记
+    assert "a" not in reg
+
+def test_partial_and_error_can_requeue_with_reason_cleared():
+    reg = TaskRegistry()
+    reg.add(["a", "b"])
+    reg.set_state("a", "error", "boom")
+    reg.set_state("b", "partial")
+    assert reg.errors == {"a": "boom", "b": "预算用尽"}
+    assert reg.enqueue(["a", "b"]) == ["a", "b"]
+    assert reg.errors == {}
+
+@pytest.fixture
+def engine(cfg):
+    cfg(schedule_policy="sjf", schedule_aging=1.0)
+    eng = CrawlerEngine()
+    eng.cost_cache.update({"big": 1000.0, "small": 10.0})
+    yield eng
+    eng.log_sink.flush()
+
+def test_sjf_aging_prevents_starvation(engine, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    reg = engine.registry
+    reg.enqueue(["big"])
+    now[0] += 2000            # 大任务已排队 2000 秒，抵扣超过两者的耗时差
+    reg.enqueue(["small"])
+    assert reg.pop_next() == "big"
+
+def test_rescore_keeps_original_enqueue_time(engine, cfg, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cfg(schedule_policy="fifo")
+    reg = engine.registry
+    reg.enqueue(["big"])
+    now[0] += 2000
+    reg.enqueue(["small"])
+    cfg(schedule_policy="sjf")
+    reg.rescore()             # 重新评分时老化仍从原始入队时间算起
+    assert reg.enqueued_at == {"big": 1000.0, "small": 3000.0}
+    assert drain(reg) == ["big", "small"]
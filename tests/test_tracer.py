@@ -0,0 +1,55 @@
+"""
+Chrome trace-event 追踪输出（user-047 时间线区间 / 媒体阶段）
+"""
+import json
+
+from spider_core import Tracer
+
+def read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def test_json_trace_is_a_valid_event_array(tmp_path):
+    path = str(tmp_path / "trace.json")
+    tracer = Tracer(interval=60)
+    tracer.open(path)
+    assert tracer.enabled
+    tracer.span("scroll", "alice", 100, 350, step=1)
+    tracer.flush()
+    tracer.span("page", "bob", 400, 300)
+    tracer.close()
+    assert not tracer.enabled
+
+    events = read_json(path)
+    spans = [e for e in events if e["ph"] == "X"]
+    assert [(e["name"], e["ts"], e["dur"]) for e in spans] == [("scroll", 100, 250), ("page", 400, 0)]
+    assert spans[0]["args"] == {"task": "alice", "step": 1}
+    # 每个任务一条泳道，并带泳道名元数据
+    lanes = {e["args"]["name"]: e["tid"] for e in events if e["name"] == "thread_name"}
+    assert lanes == {"任务 alice": spans[0]["tid"], "任务 bob": spans[1]["tid"]}
+    assert spans[0]["tid"] != spans[1]["tid"]
+    assert any(e["name"] == "process_name" for e in events)
+
+def test_jsonl_trace_writes_media_stages(tmp_path):
+    path = str(tmp_path / "trace.jsonl")
+    tracer = Tracer(interval=60)
+    tracer.open(path)
+    marks = {"discovered": 10, "queued": 20, "started": 25, "running": 30, "downloaded": 90, "recorded": 95}
+    tracer.media("alice", "m1", marks, "success")
+    tracer.close()
+
+    with open(path, "r", encoding="utf-8") as f:
+        events = [json.loads(line) for line in f]
+    media = [e for e in events if e.get("cat") == "media"]
+    assert media[0] == {"name": "media", "cat": "media", "ph": "b", "id": "m1", "ts": 10, "pid": media[0]["pid"],
+                        "tid": media[0]["tid"], "args": {"task": "alice", "result": "success"}}
+    assert media[-1]["ph"] == "e" and media[-1]["name"] == "media"
+    stages = [(e["name"], e["ph"], e["ts"]) for e in media[1:-1]]
+    assert stages == [("dispatch", "b", 10), ("dispatch", "e", 20), ("queue_wait", "b", 20), ("queue_wait", "e", 25),
+                      ("download", "b", 30), ("download", "e", 90), ("record", "b", 90), ("record", "e", 95)]
+
+def test_closed_tracer_drops_buffered_events():
+    tracer = Tracer(interval=60)
+    tracer.span("scroll", "alice", 0, 1)
+    tracer.flush()
+    assert not tracer.buffer
@@ -0,0 +1,79 @@
+"""
+定时同步的监视列表（user-040 到期调度 / 失败重试 / 持久化）
+"""
+import json
+import time
+import asyncio
+
+import pytest
+
+from spider_core import Watchlist, TaskRegistry
+
+HOUR = 3600
+
+@pytest.fixture
+def watchlist(cfg, tmp_path):
+    cfg(save_path=str(tmp_path / "downloads"), watch_jitter=0)
+    return Watchlist(TaskRegistry(), path=str(tmp_path / "watchlist.json"))
+
+def test_new_accounts_are_due_immediately(watchlist):
+    watchlist.watch(["alice", "bob"], 24)
+    assert sorted(watchlist.due()) == ["alice", "bob"]
+    assert watchlist.next_due_in() <= 0
+
+def test_due_orders_by_next_due_and_skips_future(watchlist):
+    watchlist.watch(["alice", "bob", "carol"], 24)
+    now = time.time()
+    watchlist.entries["alice"]["next_due"] = now - 10
+    watchlist.entries["bob"]["next_due"] = now - 100
+    watchlist.entries["carol"]["next_due"] = now + HOUR
+    assert watchlist.due(now) == ["bob", "alice"]
+    assert watchlist.due(now + 2 * HOUR) == ["bob", "alice", "carol"]
+
+def test_successful_run_waits_one_interval(watchlist):
+    watchlist.watch(["alice"], 6)
+    before = time.time()
+    assert watchlist.mark_run("alice")
+    e = watchlist.entries["alice"]
+    assert e["last_run"] >= before
+    assert e["next_due"] == pytest.approx(e["last_run"] + 6 * HOUR)
+    assert watchlist.due() == []
+
+def test_failed_run_retries_within_an_hour(watchlist):
+    watchlist.watch(["alice"], 24)
+    before = time.time()
+    assert watchlist.mark_run("alice", ok=False)
+    e = watchlist.entries["alice"]
+    assert e["last_run"] == 0  # 失败不算一次完整同步
+    assert before + HOUR <= e["next_due"] <= time.time() + HOUR
+    assert not watchlist.mark_run("bob")  # 未监视的账号不改动
+
+def test_save_and_load_round_trip(watchlist):
+    watchlist.registry.add(["alice", "bob"], budget={"max_media": 10})
+    watchlist.registry.set_priority("alice", 5)
+    watchlist.watch(["alice"], 12)
+    watchlist.mark_run("alice", ok=False)
+    watchlist.save()
+
+    restored = Watchlist(TaskRegistry(), path=watchlist.path)
+    assert restored.load() == 2
+    assert restored.entries == watchlist.entries
+    assert restored.registry.priority.get("alice") == 5
+    assert restored.registry.budgets.get("bob") == {"max_media": 10}
+
+def test_engine_persists_failed_run(engine, watchlist):
+    """调度器无人值守运行：任务失败后的重试时间必须落盘，重启后不会立刻重跑也不会被遗忘"""
+    engine.watchlist = watchlist
+    engine.registry = watchlist.registry
+    engine.registry.add(["alice"])
+    watchlist.watch(["alice"], 24)
+    async def failed(tid): return "FAILED"
+    engine._mission_body_logic = failed
+
+    before = time.time()
+    asyncio.run(engine._wrapped_executor("alice"))
+
+    with open(watchlist.path, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    assert before + HOUR <= saved["watch"]["alice"]["next_due"] <= time.time() + HOUR
+    assert saved["watch"]["alice"]["last_run"] == 0
@@ -0,0 +1,67 @@
+"""
+增量同步水位线（user-028 水位线 / user-039 未完整运行留下的缺口）
+"""
+import json
+import asyncio
+
+import pytest
+
+from timeline_stubs import make_page, StubRequestContext, StubTimelineResponse, StubPage, install_stub_browser
+
+HEAD = make_page([100, 99], "c1")
+PAGES = {"c1": make_page([98, 96], "c2"), "c2": make_page([94, 90], "c3"), "c3": make_page([80], "c4"), "c4": make_page([70], None)}
+
+@pytest.fixture
+def save_dir(cfg, tmp_path):
+    cfg(save_path=str(tmp_path), incremental_sync=True)
+    path = tmp_path / "博主图集" / "alice"
+    path.mkdir(parents=True)
+    return path
+
+def write_state(save_dir, data):
+    (save_dir / "sync_state.json").write_text(json.dumps(data), encoding="utf-8")
+
+def read_state(save_dir):
+    return json.loads((save_dir / "sync_state.json").read_text(encoding="utf-8"))
+
+def run_mission(engine):
+    ctx = StubRequestContext(PAGES)
+    install_stub_browser(engine, StubPage(), ctx, lambda p: p.emit(StubTimelineResponse(HEAD)))
+    return asyncio.run(engine._mission_body_logic("alice")), ctx
+
+def test_stops_at_watermark_and_advances_it(engine, save_dir):
+    write_state(save_dir, {"watermark": {"key": 95, "top_entries": []}})
+    result, ctx = run_mission(engine)
+    assert result == "FINISHED"
+    assert ctx.cursors == ["c1", "c2"]  # c2 这页越过了水位线 95，不再往下翻
+    assert engine._commit_watermark("alice")
+    assert read_state(save_dir)["watermark"]["key"] == 100
+
+def test_failed_downloads_keep_the_old_watermark(engine, save_dir):
+    write_state(save_dir, {"watermark": {"key": 95, "top_entries": []}})
+    assert run_mission(engine)[0] == "FINISHED"
+    engine.dl_manager.failed["alice"] = 1
+    assert not engine._commit_watermark("alice")
+    assert read_state(save_dir)["watermark"]["key"] == 95
+    assert "alice" in engine.pending_watermarks  # 保留给断点 / 下次运行
+
+def test_run_is_marked_incomplete_until_cleared(engine, save_dir):
+    write_state(save_dir, {})
+    engine.registry.add(["alice"], budget={"max_steps": 1})
+    assert run_mission(engine)[0] == "PARTIAL"
+    assert read_state(save_dir)["incomplete"] is True
+    engine._clear_checkpoint(str(save_dir))
+    assert "incomplete" not in read_state(save_dir)
+
+def test_gap_disables_old_image_stop(engine, cfg):
+    cfg(stop_thresh=10)
+    state = {"crossed": False, "streak": 50, "complete": False, "gap": True}
+    assert not engine._should_stop(state, "alice")
+    state["gap"] = False
+    assert engine._should_stop(state, "alice") and state["complete"]
+
+def test_gap_is_detected_from_previous_incomplete_run(engine, save_dir, cfg):
+    cfg(stop_thresh=1)
+    write_state(save_dir, {"incomplete": True, "watermark": {"key": 50, "top_entries": []}})
+    assert run_mission(engine)[0] == "FINISHED"
+    assert engine.pending_watermarks["alice"][1]["gap"] is True
@@ -0,0 +1,91 @@
+"""
+测试用的时间线桩：GraphQL 时间线页面、APIRequestContext 与浏览器页面（不启动浏览器）
+"""
+import json
+import asyncio
+from urllib.parse import urlsplit, parse_qsl
+
+TEMPLATE_URL = "https://x.com/i/api/graphql/abc123/UserMedia?variables=%7B%22userId%22%3A%2242%22%2C%22count%22%3A20%7D&features=%7B%7D"
+
+def make_page(entries, cursor):
+    """构造一页时间线响应：若干推文条目 + cursor-bottom"""
+    items = [{"entryId": f"tweet-{e}", "sortIndex": str(e), "content": {}} for e in entries]
+    if cursor: items.append({"entryId": f"cursor-bottom-{cursor}", "content": {"cursorType": "Bottom", "value": cursor}})
+    return {"data": {"user": {"result": {"timeline": {"instructions": [{"type": "TimelineAddEntries", "entries": items}]}}}}}
+
+class StubResponse:
+    def __init__(self, status, body=None, headers=None):
+        self.status = status
+        self.ok = 200 <= status < 300
+        self.headers = headers or {}
+        self._body = body
+
+    async def json(self):
+        return self._body
+
+class StubRequestContext:
+    """按请求里的 cursor 返回预置页面；responses 中的整数表示直接返回该 HTTP 状态码"""
+    def __init__(self, pages, responses=None):
+        self.pages = pages
+        self.responses = list(responses or [])
+        self.cursors = []
+
+    async def get(self, url, headers=None, timeout=None):
+        variables = json.loads(dict(parse_qsl(urlsplit(url).query))["variables"])
+        self.cursors.append(variables.get("cursor"))
+        if self.responses:
+            status = self.responses.pop(0)
+            if status != 200: return StubResponse(status)
+        return StubResponse(200, self.pages[variables.get("cursor")])
+
+class StubTimelineResponse:
+    """页面自己加载的时间线响应（由页面的 response 监听器收到）"""
+    def __init__(self, body, delay=0):
+        self.url = TEMPLATE_URL
+        self.headers = {}
+        self.request = self
+        self.method = "GET"
+        self._body = body
+        self._delay = delay
+
+    async def all_headers(self):
+        return {}
+
+    async def json(self):
+        if self._delay: await asyncio.sleep(self._delay)
+        return self._body
+
+class StubPage:
+    url = "about:blank"
+
+    def __init__(self):
+        self.listeners = []
+
+    def on(self, event, fn):
+        self.listeners.append(fn)
+
+    def remove_listener(self, event, fn):
+        if fn in self.listeners: self.listeners.remove(fn)
+
+    def is_closed(self):
+        return False
+
+    async def wait_for_selector(self, *args, **kwargs):
+        pass
+
+    def emit(self, response):
+        for fn in list(self.listeners): fn(response)
+
+def install_stub_browser(engine, page, ctx, on_goto=None):
+    """替换引擎的上下文 / 页面池 / 导航：任务拿到 page，游标翻页走 ctx，导航时调用 on_goto(page)"""
+    async def ensure_context(profile):
+        return type("Ctx", (), {"request": ctx})()
+    async def acquire(tid, profile, context):
+        return page, False
+    async def release(tid, recycle=False):
+        pass
+    async def goto(p, url, label):
+        if on_goto: on_goto(p)
+        return True
+    engine._ensure_context, engine.resilient_goto = ensure_context, goto
+    engine.page_pool.acquire, engine.page_pool.release = acquire, release
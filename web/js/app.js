@@ -7,6 +7,7 @@
 const state = {
     engineRunning: false,
     tasks: [],
+    taskMap: new Map(),  // 任务 id -> 状态条目（按后端推送的增量维护）
     settings: {},      // 原始配置（已保存到硬盘的）
     draftSettings: {}   // 预览配置（尚未保存的）
 };
@@ -26,7 +27,8 @@ document.addEventListener('DOMContentLoaded', async () => {
     // 加载设置
     await loadSettings();
 
-    // 检查登录状态
+    // 加载账号列表并检查登录状态
+    await loadProfiles();
     await checkLoginStatus();
 
     // 获取引擎状态
@@ -34,6 +36,8 @@ document.addEventListener('DOMContentLoaded', async () => {
     
     // 刷新任务列表
     await refreshTaskList();
+    await refreshWatchCount();
+    setInterval(refreshDiagnostics, 3000);
 
     console.log('X-Spider GUI 初始化完成');
 });
@@ -55,6 +59,8 @@ function bindEvents() {
     });
 
     // 快捷按钮
+    document.getElementById('btn-watch-task').addEventListener('click', watchTasks);
+    document.getElementById('watch-count').addEventListener('click', showWatchlist);
     document.getElementById('btn-add-bookmarks').addEventListener('click', addBookmarks);
     document.getElementById('btn-add-likes').addEventListener('click', addLikes);
 
@@ -68,6 +74,9 @@ function bindEvents() {
     // 设置页相关
     document.getElementById('btn-login').addEventListener('click', runLogin);
     document.getElementById('btn-export').addEventListener('click', exportCookies);
+    document.getElementById('btn-add-profile').addEventListener('click', addProfile);
+    document.getElementById('btn-set-owner').addEventListener('click', setOwnerProfile);
+    document.getElementById('setting-profile').addEventListener('change', checkLoginStatus);
     document.getElementById('btn-select-path').addEventListener('click', selectFolder);
     document.getElementById('btn-reset-settings').addEventListener('click', resetSettings);
     
@@ -92,6 +101,23 @@ function bindSettingsEvents() {
         updateSetting('browser_type', e.target.value);
     });
 
+    // 调度策略
+    document.getElementById('setting-schedule').addEventListener('change', (e) => {
+        updateSetting('schedule_policy', e.target.value);
+    });
+    document.getElementById('setting-watch-interval').addEventListener('change', (e) => {
+        updateSetting('watch_interval_hours', parseFloat(e.target.value) || 24);
+    });
+    document.getElementById('setting-watch-rate').addEventListener('change', (e) => {
+        updateSetting('watch_rate_per_hour', parseInt(e.target.value) || 60);
+    });
+    document.getElementById('setting-dir-layout').addEventListener('change', (e) => {
+        updateSetting('dir_layout', e.target.value);
+    });
+    document.getElementById('setting-shard-workers').addEventListener('change', (e) => {
+        updateSetting('shard_workers', Math.max(1, parseInt(e.target.value) || 1));
+    });
+
     // 开关类设置
     document.getElementById('setting-dl-images').addEventListener('change', (e) => {
         updateSetting('dl_images', e.target.checked);
@@ -112,6 +138,11 @@ function bindSettingsEvents() {
     document.getElementById('setting-use-tmp-files').addEventListener('change', (e) => {
         updateSetting('use_tmp_files', e.target.checked);
     });
+    document.getElementById('setting-diagnostics').addEventListener('change', (e) => {
+        updateSetting('diagnostics', e.target.checked);
+    });
+    document.getElementById('btn-capture-profile').addEventListener('click', captureProfile);
+    document.getElementById('btn-capture-memory').addEventListener('click', captureMemory);
 
     // 数字输入（包括阈值）
     document.getElementById('setting-max-video-size').addEventListener('change', (e) => {
@@ -169,6 +200,12 @@ async function loadSettings() {
 function applySettingsToUI(settings) {
     document.getElementById('setting-path').value = settings.save_path || '';
     document.getElementById('setting-browser').value = settings.browser_type || 'Edge';
+    document.getElementById('setting-schedule').value = settings.schedule_policy || 'fifo';
+    document.getElementById('setting-watch-interval').value = settings.watch_interval_hours || 24;
+    document.getElementById('setting-watch-rate').value = settings.watch_rate_per_hour || 60;
+    document.getElementById('setting-shard-workers').value = settings.shard_workers || 1;
+    document.getElementById('setting-dir-layout').value = settings.dir_layout || 'flat';
+    document.getElementById('setting-diagnostics').checked = settings.diagnostics === true;
     document.getElementById('setting-dl-images').checked = settings.dl_images !== false;
     document.getElementById('setting-dl-gifs').checked = settings.dl_gifs === true;
     document.getElementById('setting-max-video-size').value = settings.max_video_size || 5;
@@ -232,12 +269,18 @@ function hideActionBar() {
 
 async function confirmSettings() {
     try {
-        // 将草稿箱内容全量同步到后端
-        const keys = Object.keys(state.draftSettings);
-        for (const key of keys) {
-            // 只有当值确实发生变化时才更新（可选优化）
-            if (state.draftSettings[key] !== state.settings[key]) {
-                await eel.update_setting(key, state.draftSettings[key])();
+        // 草稿箱中变化的项一次性提交（后端合并为一次写盘）
+        const changes = {};
+        for (const key of Object.keys(state.draftSettings)) {
+            if (JSON.stringify(state.draftSettings[key]) !== JSON.stringify(state.settings[key])) {
+                changes[key] = state.draftSettings[key];
+            }
+        }
+        if (Object.keys(changes).length) {
+            const result = await eel.update_settings(changes)();
+            if (!result.success) {
+                showToast(result.error, 'danger');
+                return;
             }
         }
         
@@ -274,6 +317,12 @@ async function resetSettings() {
         "dl_images": true,
         "dl_gifs": true,
         "browser_type": "Edge",
+        "schedule_policy": "fifo",
+        "watch_interval_hours": 24,
+        "watch_rate_per_hour": 60,
+        "shard_workers": 1,
+        "dir_layout": "flat",
+        "diagnostics": false,
         "create_link_file": true,
         "use_tmp_files": true,
         "deep_scan": false,
@@ -319,6 +368,41 @@ function showToast(msg, type = 'success') {
     }, 3000);
 }
 
+// 诊断模式：循环延迟读数与按需快照
+async function refreshDiagnostics() {
+    const label = document.getElementById('diag-lag');
+    if (!state.settings.diagnostics) {
+        label.textContent = '';
+        return;
+    }
+    try {
+        const d = await eel.get_diagnostics()();
+        label.textContent = d.enabled ? `延迟 p99 ${d.lag_p99_ms}ms` : '';
+        label.title = d.slow.map(s => `${s.count}× 最长 ${s.max_ms}ms  ${s.site}`).join('\n') || '暂无阻塞记录';
+    } catch (e) {
+        console.error('获取诊断状态失败:', e);
+    }
+}
+
+async function captureProfile() {
+    try {
+        const result = await eel.capture_profile(10)();
+        if (result.success) showToast('开始 10 秒性能采样，完成后见日志', 'info');
+        else showToast(result.error, 'warning');
+    } catch (e) {
+        console.error('性能采样失败:', e);
+    }
+}
+
+async function captureMemory() {
+    try {
+        const result = await eel.capture_memory_snapshot()();
+        showToast(result.started ? '已开始内存追踪，稍后再次点击获取快照' : '内存快照已保存', 'info');
+    } catch (e) {
+        console.error('内存快照失败:', e);
+    }
+}
+
 // ================= 主题系统 =================
 function initTheme() {
     // 优先尝试从本地存储或默认值初始化，不依赖还未加载的 state.settings
@@ -372,9 +456,60 @@ async function selectFolder() {
 }
 
 // ================= 登录相关 =================
+function selectedProfile() {
+    return document.getElementById('setting-profile').value || 'default';
+}
+
+async function loadProfiles(selected) {
+    try {
+        const profiles = await eel.get_profiles()();
+        state.profiles = profiles;
+        const select = document.getElementById('setting-profile');
+        select.innerHTML = profiles.map(p => 
+            `<option value="${p.name}">${p.owner ? '👑 ' : ''}${p.name}${p.logged_in ? '' : ' (未登录)'}</option>`
+        ).join('');
+        if (selected) select.value = selected;
+    } catch (e) {
+        console.error('加载账号列表失败:', e);
+    }
+}
+
+async function addProfile() {
+    const name = prompt('请输入新账号名称（字母、数字、_ 或 -）：');
+    if (!name) return;
+    try {
+        const result = await eel.add_profile(name.trim())();
+        if (result.success) {
+            await loadProfiles(name.trim());
+            await checkLoginStatus();
+            showToast(`账号 ${name.trim()} 已添加，请点击登录`, 'info');
+        } else {
+            showAlert('添加失败', result.error);
+        }
+    } catch (e) {
+        console.error('添加账号失败:', e);
+    }
+}
+
+async function setOwnerProfile() {
+    const name = selectedProfile();
+    try {
+        const result = await eel.set_owner_profile(name)();
+        if (result.success) {
+            await loadProfiles(name);
+            showToast(`喜欢/书签将使用账号 ${name} 采集`, 'success');
+        } else {
+            showAlert('设置失败', result.error);
+        }
+    } catch (e) {
+        console.error('设置所属账号失败:', e);
+    }
+}
+
 async function checkLoginStatus() {
     try {
-        const loggedIn = await eel.check_login_status()();
+        const profile = (state.profiles || []).find(p => p.name === selectedProfile());
+        const loggedIn = profile ? profile.logged_in : await eel.check_login_status()();
         const btn = document.getElementById('btn-login');
         if (loggedIn) {
             btn.innerHTML = '<i class="bi bi-arrow-repeat"></i>';
@@ -391,7 +526,7 @@ async function checkLoginStatus() {
 async function runLogin() {
     try {
         addLog('🔑 正在启动登录向导...', 'info');
-        const result = await eel.run_login()();
+        const result = await eel.run_login(selectedProfile())();
         if (!result.success) {
             showAlert('错误', result.error);
         } else {
@@ -405,7 +540,7 @@ async function runLogin() {
 async function exportCookies() {
     try {
         addLog('📤 正在导出 Cookie...', 'info');
-        const result = await eel.export_cookies()();
+        const result = await eel.export_cookies(selectedProfile())();
         if (result.success) {
             showAlert('成功', 'Cookie 已导出到 cookies_backup.json');
         } else {
@@ -476,16 +611,27 @@ async function stopEngine() {
 }
 
 // ================= 任务管理 =================
+function readTaskBudget() {
+    // 预算输入框（留空 = 不限制），MB / 分钟换算为字节 / 秒
+    const num = (id) => Math.max(0, parseFloat(document.getElementById(id).value) || 0);
+    const budget = {
+        max_media: num('budget-media'),
+        max_bytes: Math.round(num('budget-mb') * 1024 * 1024),
+        max_seconds: Math.round(num('budget-minutes') * 60),
+        max_steps: num('budget-steps')
+    };
+    return Object.values(budget).some(v => v > 0) ? budget : null;
+}
+
 async function addTasks() {
     const input = document.getElementById('task-input');
     const value = input.value.trim();
     if (!value) return;
 
     try {
-        const result = await eel.add_tasks(value)();
+        const result = await eel.add_tasks(value, readTaskBudget())();
         if (result.success) {
             input.value = '';
-            await refreshTaskList();
         } else {
             showAlert('添加失败', result.error);
         }
@@ -494,14 +640,84 @@ async function addTasks() {
     }
 }
 
-async function addBookmarks() {
+async function watchTasks() {
+    const input = document.getElementById('task-input');
+    const value = input.value.trim();
+    if (!value) return;
+
     try {
-        const result = await eel.add_my_bookmarks()();
+        const result = await eel.watch_accounts(value)();
         if (result.success) {
-            await refreshTaskList();
+            input.value = '';
+            showToast(`${result.count} 个账号已加入定时同步`, 'success');
         } else {
             showAlert('添加失败', result.error);
         }
+    } catch (e) {
+        console.error('加入定时同步失败:', e);
+    }
+}
+
+async function refreshWatchCount() {
+    try {
+        const items = await eel.get_watchlist()();
+        updateWatchCount(items.length, items.length ? items[0].next_due - Date.now() / 1000 : null);
+    } catch (e) {
+        console.error('获取定时同步列表失败:', e);
+    }
+}
+
+function updateWatchCount(count, nextDueIn) {
+    const badge = document.getElementById('watch-count');
+    badge.textContent = `⏰ ${count}`;
+    badge.title = count === 0 ? '定时同步账号（点击查看）' :
+                  nextDueIn > 0 ? `定时同步 ${count} 个账号，最早 ${formatDuration(Math.round(nextDueIn))} 后到期` :
+                  `定时同步 ${count} 个账号，有账号已到期等待执行`;
+}
+
+async function showWatchlist() {
+    try {
+        const items = await eel.get_watchlist()();
+        const container = document.getElementById('watch-list');
+        if (items.length === 0) {
+            container.innerHTML = '<p class="text-center text-muted py-4">暂无定时同步账号，在输入框填写账号后点击「定时同步」</p>';
+        } else {
+            container.innerHTML = items.map(item => `
+                <div class="history-item">
+                    <div class="history-item-info">
+                        <i class="bi bi-alarm history-item-icon"></i>
+                        <div>
+                            <div class="history-item-name">@${item.id}</div>
+                            <div class="history-item-type">每 ${item.interval} 小时 · 下次 ${new Date(item.next_due * 1000).toLocaleString()}${item.last_run ? ` · 上次 ${new Date(item.last_run * 1000).toLocaleString()}` : ''}</div>
+                        </div>
+                    </div>
+                    <button class="btn btn-sm btn-outline-danger" onclick="unwatchAccount('${item.id}')" title="取消定时同步">
+                        <i class="bi bi-x-lg"></i>
+                    </button>
+                </div>
+            `).join('');
+        }
+        bootstrap.Modal.getOrCreateInstance(document.getElementById('watchModal')).show();
+    } catch (e) {
+        console.error('获取定时同步列表失败:', e);
+    }
+}
+
+async function unwatchAccount(id) {
+    try {
+        await eel.unwatch_account(id)();
+        await showWatchlist();
+    } catch (e) {
+        console.error('取消定时同步失败:', e);
+    }
+}
+
+async function addBookmarks() {
+    try {
+        const result = await eel.add_my_bookmarks()();
+        if (!result.success) {
+            showAlert('添加失败', result.error);
+        }
     } catch (e) {
         console.error('添加书签任务失败:', e);
     }
@@ -510,9 +726,7 @@ async function addBookmarks() {
 async function addLikes() {
     try {
         const result = await eel.add_my_likes()();
-        if (result.success) {
-            await refreshTaskList();
-        } else {
+        if (!result.success) {
             showAlert('添加失败', result.error);
         }
     } catch (e) {
@@ -523,7 +737,6 @@ async function addLikes() {
 async function deleteTask(taskId) {
     try {
         await eel.delete_task(taskId)();
-        await refreshTaskList();
     } catch (e) {
         console.error('删除任务失败:', e);
     }
@@ -532,7 +745,6 @@ async function deleteTask(taskId) {
 async function pauseTask(taskId) {
     try {
         await eel.pause_single_task(taskId)();
-        await refreshTaskList();
     } catch (e) {
         console.error('暂停任务失败:', e);
     }
@@ -541,16 +753,40 @@ async function pauseTask(taskId) {
 async function resumeTask(taskId) {
     try {
         await eel.start_single_task(taskId)();
-        await refreshTaskList();
     } catch (e) {
         console.error('恢复任务失败:', e);
     }
 }
 
+async function bumpTaskPriority(taskId, step = 1) {
+    const task = state.taskMap.get(taskId);
+    const priority = ((task && task.priority) || 0) + step;
+    try {
+        const result = await eel.set_task_priority(taskId, priority)();
+        if (!result.success) showToast(result.error, 'warning');
+    } catch (e) {
+        console.error('设置优先级失败:', e);
+    }
+}
+
+function formatDuration(seconds) {
+    if (seconds < 60) return `${seconds} 秒`;
+    if (seconds < 3600) return `${Math.round(seconds / 60)} 分钟`;
+    return `${(seconds / 3600).toFixed(1)} 小时`;
+}
+
+function formatBudget(budget) {
+    const parts = [];
+    if (budget.max_media) parts.push(`${budget.max_media} 个`);
+    if (budget.max_bytes) parts.push(`${Math.round(budget.max_bytes / 1024 / 1024)} MB`);
+    if (budget.max_seconds) parts.push(formatDuration(budget.max_seconds));
+    if (budget.max_steps) parts.push(`${budget.max_steps} 页`);
+    return parts.join(' / ');
+}
+
 async function clearAllTasks() {
     try {
         await eel.clear_all_tasks()();
-        await refreshTaskList();
     } catch (e) {
         console.error('清空任务失败:', e);
     }
@@ -559,8 +795,7 @@ async function clearAllTasks() {
 async function refreshTaskList() {
     try {
         const tasks = await eel.get_queue_status()();
-        state.tasks = tasks;
-        renderTaskList(tasks);
+        setTaskList(tasks);
     } catch (e) {
         console.error('刷新任务列表失败:', e);
     }
@@ -582,62 +817,144 @@ function renderTaskList(tasks) {
         return;
     }
 
-    container.innerHTML = tasks.map(task => {
-        const statusClass = task.status;
-        const statusEmoji = task.status === 'running' ? '▶️' : 
-                           task.status === 'queued' ? '⏳' : 
-                           task.status === 'paused' ? '⏸️' : 
-                           task.status === 'pending' ? '📋' : 
-                           task.status === 'error' ? '❌' : '❓';
-        const statusText = task.status === 'running' ? '运行中' : 
-                          task.status === 'queued' ? '排队中' : 
-                          task.status === 'paused' ? '已暂停' : 
-                          task.status === 'pending' ? '待启动' : 
-                          task.status === 'error' ? '任务异常' : task.status;
-        const displayName = task.id === 'MY_LIKES' ? '❤️ 我的喜欢' : 
-                           task.id === 'MY_BOOKMARKS' ? '🔖 我的书签' : 
-                           `@${task.id}`;
-        
-        // 根据状态显示不同的控制按钮
-        const isRunningOrQueued = task.status === 'running' || task.status === 'queued';
-        const isError = task.status === 'error';
-        
-        let controlBtn = '';
-        if (isRunningOrQueued) {
-            controlBtn = `<button class="btn btn-outline-warning btn-sm" onclick="pauseTask('${task.id}')" title="暂停">
-                               <i class="bi bi-pause-fill"></i>
-                           </button>`;
-        } else if (isError) {
-            controlBtn = `<button class="btn btn-outline-warning restart-btn btn-sm" onclick="resumeTask('${task.id}')" title="重启任务">
-                               <i class="bi bi-arrow-clockwise"></i>
-                           </button>`;
-        } else {
-            controlBtn = `<button class="btn btn-outline-success btn-sm" onclick="resumeTask('${task.id}')" title="开始">
-                               <i class="bi bi-play-fill"></i>
-                           </button>`;
-        }
+    container.innerHTML = tasks.map(renderTaskItem).join('');
+}
 
-        return `
-            <div class="task-item" data-id="${task.id}">
-                <div class="task-info">
-                    <div class="task-status ${statusClass}"></div>
-                    <div class="task-details">
-                        <span class="task-name">${displayName}</span>
-                        <div class="task-meta">
-                            <span class="task-state">${statusEmoji} ${statusText}</span>
-                            ${task.progress > 0 ? `<span class="task-count">已下载 ${task.progress} 个</span>` : ''}
-                        </div>
+function renderTaskItem(task) {
+    const statusClass = task.status;
+    const statusEmoji = task.status === 'running' ? '▶️' : 
+                       task.status === 'queued' ? '⏳' : 
+                       task.status === 'throttled' ? '🚦' : 
+                       task.status === 'paused' ? '⏸️' : 
+                       task.status === 'pending' ? '📋' : 
+                       task.status === 'partial' ? '🧮' : 
+                       task.status === 'error' ? '❌' : '❓';
+    const statusText = task.status === 'running' ? '运行中' : 
+                      task.status === 'queued' ? '排队中' : 
+                      task.status === 'throttled' ? '限流等待' : 
+                      task.status === 'paused' ? '已暂停' : 
+                      task.status === 'pending' ? '待启动' : 
+                      task.status === 'partial' ? '部分完成' : 
+                      task.status === 'error' ? '任务异常' : task.status;
+    const displayName = task.id === 'MY_LIKES' ? '❤️ 我的喜欢' : 
+                       task.id === 'MY_BOOKMARKS' ? '🔖 我的书签' : 
+                       `@${task.id}`;
+    
+    // 根据状态显示不同的控制按钮
+    const isRunningOrQueued = task.status === 'running' || task.status === 'queued' || task.status === 'throttled';
+    const isError = task.status === 'error';
+    const isPartial = task.status === 'partial';
+    
+    let controlBtn = '';
+    if (isRunningOrQueued) {
+        controlBtn = `<button class="btn btn-outline-warning btn-sm" onclick="pauseTask('${task.id}')" title="暂停">
+                           <i class="bi bi-pause-fill"></i>
+                       </button>`;
+    } else if (isError) {
+        controlBtn = `<button class="btn btn-outline-warning restart-btn btn-sm" onclick="resumeTask('${task.id}')" title="重启任务">
+                           <i class="bi bi-arrow-clockwise"></i>
+                       </button>`;
+    } else if (isPartial) {
+        controlBtn = `<button class="btn btn-outline-success btn-sm" onclick="resumeTask('${task.id}')" title="${task.error || '预算用尽'}，点击继续">
+                           <i class="bi bi-skip-end-fill"></i>
+                       </button>`;
+    } else {
+        controlBtn = `<button class="btn btn-outline-success btn-sm" onclick="resumeTask('${task.id}')" title="开始">
+                           <i class="bi bi-play-fill"></i>
+                       </button>`;
+    }
+
+    return `
+        <div class="task-item" data-id="${task.id}">
+            <div class="task-info">
+                <div class="task-status ${statusClass}"></div>
+                <div class="task-details">
+                    <span class="task-name">${displayName}</span>
+                    <div class="task-meta">
+                        <span class="task-state">${statusEmoji} ${statusText}</span>
+                        ${task.progress > 0 ? `<span class="task-count task-progress">已下载 ${task.progress} 个</span>` : ''}
+                        ${task.priority ? `<span class="task-count" title="优先级越高越先执行">优先级 ${task.priority}</span>` : ''}
+                        ${task.watch_interval ? `<span class="task-count" title="定时同步账号">⏰ 每 ${task.watch_interval} 小时</span>` : ''}
+                        ${task.budget ? `<span class="task-count" title="单任务预算">预算 ${formatBudget(task.budget)}</span>` : ''}
+                        ${task.est_cost !== undefined ? `<span class="task-count" title="按历史估算的耗时 (短任务优先调度)">预计 ${formatDuration(task.est_cost)}</span>` : ''}
+                        ${task.rate_limit ? `<span class="task-count" title="接口剩余额度 (${task.rate_limit.reset_in}s 后重置)">额度 ${task.rate_limit.remaining}/${task.rate_limit.limit}</span>` : ''}
                     </div>
                 </div>
-                <div class="task-actions">
-                    ${controlBtn}
-                    <button class="btn btn-outline-danger btn-sm" onclick="deleteTask('${task.id}')" title="删除">
-                        <i class="bi bi-trash"></i>
-                    </button>
-                </div>
             </div>
-        `;
-    }).join('');
+            <div class="task-actions">
+                <button class="btn btn-outline-secondary btn-sm" onclick="bumpTaskPriority('${task.id}')" title="提高优先级 (右键降低)"
+                        oncontextmenu="event.preventDefault(); bumpTaskPriority('${task.id}', -1)">
+                    <i class="bi bi-arrow-up-circle"></i>
+                </button>
+                ${controlBtn}
+                <button class="btn btn-outline-danger btn-sm" onclick="deleteTask('${task.id}')" title="删除">
+                    <i class="bi bi-trash"></i>
+                </button>
+            </div>
+        </div>
+    `;
+}
+
+// ================= 任务列表增量更新 =================
+// 与后端登记表的分组顺序一致：待启动 / 运行中 / 排队中 / 等待槽位 / 异常
+const STATE_ORDER = { pending: 0, running: 1, queued: 2, launching: 3, partial: 4, error: 5 };
+
+function sortedTasks() {
+    // 同组内高优先级在前（排队组的完整顺序以后端全量快照为准）
+    return Array.from(state.taskMap.values())
+        .sort((a, b) => ((STATE_ORDER[a.state] ?? 0) - (STATE_ORDER[b.state] ?? 0)) ||
+                        ((b.priority || 0) - (a.priority || 0)));
+}
+
+function setTaskList(tasks) {
+    state.taskMap = new Map(tasks.map(t => [t.id, t]));
+    state.tasks = sortedTasks();
+    renderTaskList(state.tasks);
+}
+
+function patchTaskRow(task) {
+    const row = document.querySelector(`.task-item[data-id="${task.id}"]`);
+    if (row) row.outerHTML = renderTaskItem(task);
+}
+
+function applyTaskDelta(delta) {
+    if (delta.full) {
+        setTaskList(delta.full);
+        return;
+    }
+    // 新增 / 删除 / 分组变化需要重排整个列表，其余只就地替换对应行
+    let structural = false;
+    const patched = [];
+    (delta.remove || []).forEach(id => {
+        if (state.taskMap.delete(id)) structural = true;
+    });
+    (delta.upsert || []).forEach(task => {
+        const old = state.taskMap.get(task.id);
+        if (old && old.state === task.state) {
+            state.taskMap.set(task.id, task);
+            patched.push(task);
+        } else {
+            // 分组变化时移到末尾，与后端登记表的移动语义一致
+            state.taskMap.delete(task.id);
+            state.taskMap.set(task.id, task);
+            structural = true;
+        }
+    });
+    Object.entries(delta.progress || {}).forEach(([id, count]) => {
+        const task = state.taskMap.get(id);
+        if (!task) return;
+        task.progress = count;
+        const el = document.querySelector(`.task-item[data-id="${id}"] .task-progress`);
+        if (el) el.textContent = `已下载 ${count} 个`;
+        else patched.push(task);
+    });
+
+    if (structural) {
+        state.tasks = sortedTasks();
+        renderTaskList(state.tasks);
+    } else {
+        patched.forEach(patchTaskRow);
+    }
 }
 
 // ================= 历史记录 =================
@@ -780,18 +1097,28 @@ async function clearAllHistory() {
 }
 
 // ================= 日志相关 =================
-function addLog(message, level = 'info') {
-    const container = document.getElementById('log-container');
-    const time = new Date().toLocaleTimeString('zh-CN', { hour12: false });
-    
+function createLogEntry(message, level = 'info', time = null) {
+    time = time || new Date().toLocaleTimeString('zh-CN', { hour12: false });
     const entry = document.createElement('div');
     entry.className = 'log-entry';
     entry.innerHTML = `
         <span class="log-time">[${time}]</span>
         <span class="log-message ${level}">${message}</span>
     `;
+    return entry;
+}
+
+function addLog(message, level = 'info') {
+    addLogBatch([[null, message, level]]);
+}
+
+// 批量追加日志：[[时间, 内容, 级别], ...]，一次布局、一次滚动
+function addLogBatch(batch) {
+    const container = document.getElementById('log-container');
+    const fragment = document.createDocumentFragment();
+    batch.forEach(([time, message, level]) => fragment.appendChild(createLogEntry(message, level, time)));
     
-    container.appendChild(entry);
+    container.appendChild(fragment);
     container.scrollTop = container.scrollHeight;
     
     // 限制日志数量 (最新 400 条)
@@ -818,31 +1145,30 @@ function onLog(message, level) {
     addLog(message, level);
 }
 
+// 日志管道的批量推送
+eel.expose(onLogs);
+function onLogs(batch) {
+    addLogBatch(batch);
+}
+
 eel.expose(onTaskUpdate);
 function onTaskUpdate(tasks) {
-    state.tasks = tasks;
-    renderTaskList(tasks);
+    setTaskList(tasks);
 }
 
-eel.expose(onProgress);
-function onProgress(taskId, count) {
-    const taskItem = document.querySelector(`.task-item[data-id="${taskId}"]`);
-    if (taskItem) {
-        const progressEl = taskItem.querySelector('.task-progress');
-        if (progressEl) {
-            progressEl.textContent = `已下载 ${count} 个`;
-        }
-    }
+// 后端推送总线按固定频率合并的增量批次
+eel.expose(onTaskDelta);
+function onTaskDelta(delta) {
+    applyTaskDelta(delta);
+}
+
+// 定时同步列表变化（加入 / 取消 / 运行后推算下次到期）
+eel.expose(onWatchlist);
+function onWatchlist(count, nextDueIn) {
+    updateWatchCount(count, nextDueIn);
 }
 
 eel.expose(onEngineStatus);
 function onEngineStatus(running) {
     updateEngineUI(running);
 }
-
-// 定期刷新任务列表
-setInterval(() => {
-    if (state.engineRunning) {
-        refreshTaskList();
-    }
-}, 3000);